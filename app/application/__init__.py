@@ -4,24 +4,45 @@ from flask_jwt_extended import JWTManager
 
 from application.users.views import users as user_bp
 from application.boards.views import boards as boards_bp
-from application.database import mongo
+from application.database import init_mongo
+from application.profiler import command_profiler
+from application.metrics import metrics
+from application.indexes import init_indexes
+from application.boards.task_collection import init_task_storage
 from application.mail import mailing
+from application.users.outbox import mail_outbox
+from application.users.identity import identity_cache
+from application.users.hashing import password_hasher
+from application.users.token import token_service
+from application.users.refresh import token_refresher
+from application.boards.events import board_events
 
 
 from application.config import Config
+from application.helpers import MongoJSONProvider
 
 
 def create_app(default_config=Config):
     """Define the Flask Application"""
 
     app = Flask(__name__)
-
+    app.json = MongoJSONProvider(app)
 
     app.config.from_object(default_config)
-    mongo.init_app(app)
+    init_mongo(app)
+    metrics.init_app(app)
+    command_profiler.init_app(app)
+    init_indexes(app)
+    init_task_storage(app)
     mailing.init_app(app)
+    mail_outbox.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    token_service.init_app(app)
+    board_events.init_app(app)
 
     JWTManager(app)
+    token_refresher.init_app(app)
 
     app.register_blueprint(user_bp)
     app.register_blueprint(boards_bp)
@@ -0,0 +1,157 @@
+"""
+Bulk task operations.
+
+The tasks:batch endpoint takes an ordered list of operations on one
+board's tasks:
+
+    {"op": "create", "column": <column>, "task": <add_task payload>}
+    {"op": "update", "column": <column>, "task_id": <id>, "task": <update_task payload>}
+    {"op": "move",   "column": <column>, "task_id": <id>, "to": <column>}
+    {"op": "delete", "column": <column>, "task_id": <id>}
+
+A column is given by name, or by _id as {"$oid": ...}. An update
+whose task payload has no status leaves the task in its column. An
+operation naming its two columns in different forms has both looked
+up by _id before the batch is applied.
+
+Board.apply_task_batch applies the whole list as a single ordered
+bulk_write on the board.
+"""
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+from application.boards.diff import TaskDiff, column_field, to_object_id
+from application.boards.events import board_event
+
+
+OPERATIONS = ("create", "update", "move", "delete")
+
+# Outcomes of a single operation, as reported by apply_task_batch.
+APPLIED = "applied"
+FAILED = "failed"
+CONFLICT = "conflict"
+SKIPPED = "skipped"
+
+# Times the rest of an unconditional batch is retried after another
+# write to the board got in between two of its operations.
+BATCH_RETRIES = 3
+
+
+def column_reference(value):
+    """A column given by name, or by _id in the {"$oid": ...} shape."""
+    if isinstance(value, dict):
+        return to_object_id(value)
+    if isinstance(value, str) and value:
+        return value
+    raise ValueError("a column must be a name or an {\"$oid\": ...} ID")
+
+
+class TaskOperation:
+    """
+    One operation of a batch. For create, task is the new task, with
+    its ObjectIds already assigned. For update and move, task_diff is
+    the change to the task; a move's diff leaves the task as it is.
+    """
+
+    def __init__(self, op, column, task_id=None, task=None, task_diff=None):
+        self.op = op
+        self.column = column
+        self.task_id = task_id
+        self.task = task
+        self.task_diff = task_diff
+
+    @classmethod
+    def from_payload(cls, data):
+        """
+        Build the operation from one entry of a tasks:batch request.
+        Raises ValueError, with a message for the client, for an
+        operation that can't be understood.
+        """
+        if not isinstance(data, dict) or data.get("op") not in OPERATIONS:
+            raise ValueError(f"'op' must be one of {', '.join(OPERATIONS)}")
+
+        op = data["op"]
+        try:
+            column = column_reference(data.get("column"))
+
+            if op == "create":
+                task = dict(data["task"], _id=ObjectId())
+                task["subtasks"] = [
+                    dict(subtask, _id=ObjectId())
+                    for subtask in task.get("subtasks", [])
+                ]
+                return cls(op, column, task_id=task["_id"], task=task)
+
+            task_id = to_object_id(data["task_id"])
+
+            if op == "update":
+                status = data["task"].get("status")
+                task_diff = TaskDiff.from_payload(
+                    data["task"],
+                    status=column_reference(status) if status is not None else column)
+            elif op == "move":
+                task_diff = TaskDiff.move(column_reference(data.get("to")))
+            else:
+                task_diff = None
+
+            return cls(op, column, task_id=task_id, task_diff=task_diff)
+        except KeyError as e:
+            raise ValueError(f"'{e.args[0]}' is required for {op}")
+        except (InvalidId, TypeError):
+            raise ValueError(f"an ID given for {op} is not valid")
+
+    def mixes_column_forms(self):
+        """
+        True for an update or move whose column and target column are
+        given one by name and the other by _id, which can only be
+        compared once both are given by _id.
+        """
+        if self.task_diff is None:
+            return False
+        return column_field(self.column) != column_field(self.task_diff.status)
+
+    def resolve_columns(self, column_ids):
+        """
+        Give the column and target column by _id, looking names up in
+        column_ids (name to _id). A name the board doesn't have is left
+        as it is, so the operation's write matches nothing.
+        """
+        self.column = column_ids.get(self.column, self.column)
+        self.task_diff.status = column_ids.get(self.task_diff.status, self.task_diff.status)
+
+    def result(self, index, status):
+        """The entry reported for this operation in a batch's results."""
+        result = {"index": index, "op": self.op, "status": status, "task_id": self.task_id}
+        if self.op == "create" and status == APPLIED:
+            result["task"] = self.task
+        return result
+
+    def to_event(self):
+        """The board event recorded for this operation."""
+        if self.op == "create":
+            return board_event("task_added", column=self.column, task=self.task)
+        if self.op == "delete":
+            return board_event("task_removed", column=self.column, task_id=self.task_id)
+        return self.task_diff.to_event(self.column, self.task_id)
+
+
+def parse_operations(payload, limit):
+    """
+    The TaskOperations of a tasks:batch request body, in order.
+    Raises ValueError for a malformed body or operation, naming the
+    index of the operation at fault.
+    """
+    operations = payload.get("operations") if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("'operations' must be a non-empty list")
+    if len(operations) > limit:
+        raise ValueError(f"A batch can hold at most {limit} operations")
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        try:
+            parsed.append(TaskOperation.from_payload(operation))
+        except ValueError as e:
+            raise ValueError(f"Operation {index}: {e}")
+    return parsed
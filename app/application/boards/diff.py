@@ -0,0 +1,345 @@
+"""
+Task diff engine.
+
+Works out the complete change described by an update_task payload
+(title, description, subtask adds, removes and renames, and a move
+to another column) and expresses it as a single pipeline-style update,
+so the whole change is applied to the board in one atomic write.
+"""
+
+from bson.objectid import ObjectId
+
+
+def to_object_id(value):
+    """
+    Convert an ID sent by the client into an ObjectId.
+    The client echoes IDs back in the {"$oid": ...} shape it received.
+    """
+    if isinstance(value, dict):
+        value = value.get("$oid")
+    return ObjectId(value)
+
+
+def column_field(column):
+    """
+    The field a column reference is matched against: a column is
+    addressed either by its _id (an ObjectId) or by its name.
+    """
+    return "_id" if isinstance(column, ObjectId) else "name"
+
+
+class TaskDiff:
+    """
+    The full change to a single task.
+
+    subtasks_to_keep holds the IDs of existing subtasks present in the
+    payload; any other existing subtask is removed. subtask_titles maps
+    each kept subtask to its (possibly renamed) title. subtasks_to_add
+    holds the new subtasks, with their ObjectIds already assigned.
+    status is the column the task ends up in, by name or by _id.
+    """
+
+    def __init__(self, title, description, status,
+                 subtasks_to_keep, subtask_titles, subtasks_to_add):
+        self.title = title
+        self.description = description
+        self.status = status
+        self.subtasks_to_keep = subtasks_to_keep
+        self.subtask_titles = subtask_titles
+        self.subtasks_to_add = subtasks_to_add
+
+    @classmethod
+    def from_payload(cls, data, status=None):
+        """
+        Build the diff from the JSON body of an update_task request.
+        status, when given, overrides the payload's status, e.g. with
+        the _id of the column the task is moving to.
+        """
+        subtasks_to_keep = []
+        subtask_titles = {}
+        subtasks_to_add = []
+
+        for subtask in data.get("subtasks", []):
+            if subtask.get("_id") is None:
+                new_subtask = dict(subtask)
+                new_subtask["_id"] = ObjectId()
+                subtasks_to_add.append(new_subtask)
+            else:
+                subtask_id = to_object_id(subtask["_id"])
+                subtasks_to_keep.append(subtask_id)
+                subtask_titles[subtask_id] = subtask["title"]
+
+        if status is None:
+            status = data["status"]
+
+        return cls(data["title"], data["description"], status,
+                   subtasks_to_keep, subtask_titles, subtasks_to_add)
+
+    @classmethod
+    def move(cls, status):
+        """A diff that only moves the task to the column status."""
+        return cls(None, None, status, None, {}, [])
+
+    def moves_task(self, column_name):
+        """Return True if the task leaves the column it currently sits in."""
+        return self.status != column_name
+
+    def to_event(self, column_name, task_id):
+        """
+        The board event describing this diff: "task_moved" if the task
+        leaves column_name, "task_updated" otherwise. Kept subtasks are
+        listed with their titles; removed subtasks are those missing.
+        A diff built by move only names the columns.
+        """
+        event = {
+            "type": "task_moved" if self.moves_task(column_name) else "task_updated",
+            "_id": ObjectId(),
+            "column": column_name,
+            "task_id": ObjectId(task_id)
+        }
+
+        if self.subtasks_to_keep is not None:
+            event["title"] = self.title
+            event["description"] = self.description
+            event["subtasks"] = [
+                {"_id": subtask_id, "title": title}
+                for subtask_id, title in self.subtask_titles.items()
+            ]
+            event["subtasks_added"] = self.subtasks_to_add
+
+        if self.moves_task(column_name):
+            event["from"] = column_name
+            event["to"] = self.status
+        return event
+
+    def _edited_task(self):
+        """
+        Expression rewriting the task bound to $$task.
+        Subtasks missing from the payload are dropped, kept subtasks
+        take their title from the payload and new subtasks are appended.
+        A diff built by move leaves the task as it is.
+        """
+        if self.subtasks_to_keep is None:
+            return "$$task"
+
+        renames = [
+            {"_id": subtask_id, "title": title}
+            for subtask_id, title in self.subtask_titles.items()
+        ]
+
+        changes = {
+            "title": {"$literal": self.title},
+            "description": {"$literal": self.description},
+            "subtasks": {
+                "$concatArrays": [
+                    {
+                        "$map": {
+                            "input": {
+                                "$filter": {
+                                    "input": {"$ifNull": ["$$task.subtasks", []]},
+                                    "as": "subtask",
+                                    "cond": {
+                                        "$in": [
+                                            "$$subtask._id",
+                                            {"$literal": self.subtasks_to_keep}
+                                        ]
+                                    }
+                                }
+                            },
+                            "as": "subtask",
+                            "in": {
+                                "$mergeObjects": [
+                                    "$$subtask",
+                                    {
+                                        "$arrayElemAt": [
+                                            {
+                                                "$filter": {
+                                                    "input": {"$literal": renames},
+                                                    "as": "rename",
+                                                    "cond": {
+                                                        "$eq": ["$$rename._id", "$$subtask._id"]
+                                                    }
+                                                }
+                                            },
+                                            0
+                                        ]
+                                    }
+                                ]
+                            }
+                        }
+                    },
+                    {"$literal": self.subtasks_to_add}
+                ]
+            }
+        }
+
+        return {"$mergeObjects": ["$$task", changes]}
+
+    def to_task_pipeline(self, column_name, column_id=None, position=None):
+        """
+        Return the update pipeline applying this diff to a task stored
+        as its own document (the "collection" task storage layout).
+        When the task moves, column_id and position place it in the
+        column it moves to.
+        """
+        moving = self.moves_task(column_name)
+        pipeline = [
+            {
+                "$replaceWith": {
+                    "$let": {
+                        "vars": {"task": "$$ROOT"},
+                        "in": self._edited_task()
+                    }
+                }
+            }
+        ]
+
+        if moving:
+            pipeline.append({
+                "$set": {
+                    "column_id": column_id,
+                    "position": position
+                }
+            })
+        return pipeline
+
+    def to_pipeline(self, column_name, task_id):
+        """
+        Return the update pipeline applying this diff to the task
+        task_id in the column column_name.
+        """
+        task_id = ObjectId(task_id)
+        is_source = {
+            "$eq": [f"$$column.{column_field(column_name)}", {"$literal": column_name}]
+        }
+
+        if not self.moves_task(column_name):
+            columns = {
+                "$map": {
+                    "input": "$columns",
+                    "as": "column",
+                    "in": {
+                        "$cond": [
+                            is_source,
+                            {
+                                "$mergeObjects": [
+                                    "$$column",
+                                    {
+                                        "tasks": {
+                                            "$map": {
+                                                "input": "$$column.tasks",
+                                                "as": "task",
+                                                "in": {
+                                                    "$cond": [
+                                                        {"$eq": ["$$task._id", task_id]},
+                                                        self._edited_task(),
+                                                        "$$task"
+                                                    ]
+                                                }
+                                            }
+                                        }
+                                    }
+                                ]
+                            },
+                            "$$column"
+                        ]
+                    }
+                }
+            }
+            return [{"$set": {"columns": columns}}]
+
+        current_task = {
+            "$let": {
+                "vars": {
+                    "column": {
+                        "$arrayElemAt": [
+                            {
+                                "$filter": {
+                                    "input": "$columns",
+                                    "as": "column",
+                                    "cond": is_source
+                                }
+                            },
+                            0
+                        ]
+                    }
+                },
+                "in": {
+                    "$arrayElemAt": [
+                        {
+                            "$filter": {
+                                "input": "$$column.tasks",
+                                "as": "task",
+                                "cond": {"$eq": ["$$task._id", task_id]}
+                            }
+                        },
+                        0
+                    ]
+                }
+            }
+        }
+
+        moved_task = {
+            "$let": {
+                "vars": {"task": current_task},
+                "in": self._edited_task()
+            }
+        }
+
+        columns = {
+            "$let": {
+                "vars": {"moved": moved_task},
+                "in": {
+                    "$map": {
+                        "input": "$columns",
+                        "as": "column",
+                        "in": {
+                            "$switch": {
+                                "branches": [
+                                    {
+                                        "case": is_source,
+                                        "then": {
+                                            "$mergeObjects": [
+                                                "$$column",
+                                                {
+                                                    "tasks": {
+                                                        "$filter": {
+                                                            "input": "$$column.tasks",
+                                                            "as": "task",
+                                                            "cond": {"$ne": ["$$task._id", task_id]}
+                                                        }
+                                                    }
+                                                }
+                                            ]
+                                        }
+                                    },
+                                    {
+                                        "case": {
+                                            "$eq": [
+                                                f"$$column.{column_field(self.status)}",
+                                                {"$literal": self.status}
+                                            ]
+                                        },
+                                        "then": {
+                                            "$mergeObjects": [
+                                                "$$column",
+                                                {
+                                                    "tasks": {
+                                                        "$concatArrays": [
+                                                            {"$ifNull": ["$$column.tasks", []]},
+                                                            ["$$moved"]
+                                                        ]
+                                                    }
+                                                }
+                                            ]
+                                        }
+                                    }
+                                ],
+                                "default": "$$column"
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        return [{"$set": {"columns": columns}}]
@@ -0,0 +1,286 @@
+"""
+Board change events.
+
+Every Board write records a compact description of what it changed
+(task added, task moved, subtasks renamed, columns removed, ...) in
+the board's last_event field, in the same write that bumps the
+board's revision. Subscribers, such as the /api/boards/<id>/events
+SSE stream, receive those events as {"type": ..., "revision": ...,
+...} dicts.
+
+Two backends deliver them:
+
+change_stream: one MongoDB change stream per process, matching only
+    the boards the process has subscribers for and projected down to
+    last_event and revision, fans events out to the subscribers of
+    each board. A process sees those boards' writes, whichever process
+    made them, and the stream is reopened, resuming where it left
+    off, when a board gains its first subscriber or loses its last.
+    Needs a replica set (a single-node one will do).
+local: the Board write methods publish straight to the subscribers
+    in the same process. Used when change streams are unavailable;
+    with several gunicorn workers a subscriber only sees the writes
+    made by its own worker.
+
+BOARD_EVENTS_BACKEND picks one, or "auto" (the default) uses change
+streams when the server supports them and falls back to local.
+
+A write too large to describe, such as an import of tasks, records a
+"resync" event, telling subscribers to fetch the board again.
+
+Each subscriber holds a server thread (or greenlet) for as long as its
+stream is open, so a process takes at most BOARD_EVENTS_MAX_STREAMS
+subscribers at a time (100 by default, fewer under gunicorn's gthread
+workers, see gunicorn.conf.py); subscribe refuses any more.
+"""
+
+import queue
+import threading
+
+from bson.objectid import ObjectId
+from pymongo.errors import PyMongoError
+
+from application.database import mongo
+
+
+BACKEND_AUTO = "auto"
+BACKEND_LOCAL = "local"
+BACKEND_CHANGE_STREAM = "change_stream"
+
+# Only the fields an event is built from are sent over the change stream,
+# never the board's columns. change_stream_pipeline adds the boards.
+CHANGE_STREAM_PIPELINE = [
+    {
+        "$match": {
+            "$or": [
+                {
+                    "operationType": "update",
+                    "updateDescription.updatedFields.last_event": {"$exists": True}
+                },
+                {"operationType": "delete"}
+            ]
+        }
+    },
+    {
+        "$project": {
+            "operationType": 1,
+            "documentKey": 1,
+            "updateDescription.updatedFields.last_event": 1,
+            "updateDescription.updatedFields.revision": 1
+        }
+    }
+]
+
+
+def change_stream_pipeline(board_ids):
+    """CHANGE_STREAM_PIPELINE, matching only the boards with these _ids."""
+    return [
+        {"$match": {"documentKey._id": {"$in": [
+            ObjectId(board_id) for board_id in board_ids if ObjectId.is_valid(board_id)
+        ]}}}
+    ] + CHANGE_STREAM_PIPELINE
+
+
+class Subscription:
+    """
+    A subscriber's queue of events for one board.
+
+    If the subscriber falls more than max_size events behind, the
+    queue is emptied and a single "resync" event takes its place,
+    telling the client to re-fetch the board.
+    """
+
+    def __init__(self, bus, board_id, max_size):
+        self.bus = bus
+        self.board_id = board_id
+        self._queue = queue.Queue(maxsize=max_size)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._drain()
+            self._queue.put_nowait({"type": "resync", "revision": event.get("revision")})
+
+    def get(self, timeout=None):
+        """Return the next event, or None if none arrives within timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class BoardEventBus:
+    """Fan-out of board change events to per-board subscribers."""
+
+    def __init__(self, app=None):
+        self.configured_backend = BACKEND_AUTO
+        self.heartbeat = 15
+        self.queue_size = 100
+        self.max_streams = 100
+        self.logger = None
+        self._backend = None
+        self._subscribers = {}
+        self._subscription_count = 0
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stopped = threading.Event()
+        # Set when the boards with subscribers change, so the watcher
+        # reopens its stream to match them.
+        self._boards_changed = threading.Event()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.configured_backend = app.config.get("BOARD_EVENTS_BACKEND", BACKEND_AUTO)
+        self.heartbeat = app.config.get("BOARD_EVENTS_HEARTBEAT", self.heartbeat)
+        self.queue_size = app.config.get("BOARD_EVENTS_QUEUE_SIZE", self.queue_size)
+        self.max_streams = app.config.get("BOARD_EVENTS_MAX_STREAMS", self.max_streams)
+        self.logger = app.logger
+        self._backend = None
+
+    @property
+    def backend(self):
+        """
+        The backend in use. With "auto", the server is asked once,
+        on first use, whether it supports change streams.
+        """
+        if self._backend is None:
+            if self.configured_backend == BACKEND_AUTO:
+                self._backend = (BACKEND_CHANGE_STREAM
+                                 if self._supports_change_streams()
+                                 else BACKEND_LOCAL)
+            else:
+                self._backend = self.configured_backend
+        return self._backend
+
+    def subscribe(self, board_id):
+        """
+        Start receiving the events of a board. Close the subscription
+        when done. Returns None if this process already has
+        max_streams subscriptions open.
+        """
+        subscription = Subscription(self, str(board_id), self.queue_size)
+        with self._lock:
+            if self._subscription_count >= self.max_streams:
+                return None
+            self._subscription_count += 1
+            if subscription.board_id not in self._subscribers:
+                self._boards_changed.set()
+            self._subscribers.setdefault(subscription.board_id, set()).add(subscription)
+
+        if self.backend == BACKEND_CHANGE_STREAM:
+            self._start_watcher()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.board_id, set())
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._subscription_count -= 1
+            if not subscriptions and subscription.board_id in self._subscribers:
+                del self._subscribers[subscription.board_id]
+                self._boards_changed.set()
+
+    def publish(self, board_id, event, revision):
+        """
+        Called by the Board write methods after a successful write.
+        With change streams the event arrives through the stream instead.
+        """
+        if self.backend == BACKEND_LOCAL:
+            self._dispatch(str(board_id), dict(event, revision=revision))
+
+    def stop(self):
+        """Stop the change stream watcher, if one is running."""
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _dispatch(self, board_id, event):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(board_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def _supports_change_streams(self):
+        try:
+            hello = mongo.db.command("hello")
+        except PyMongoError as e:
+            self._warn("Board events fall back to local pub/sub: %s", e)
+            return False
+        # Change streams need a replica set or a sharded cluster (mongos).
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stopped.clear()
+            self._watcher = threading.Thread(
+                target=self._watch, name="board-events-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        """
+        Tail the change stream of the subscribed boards, until stopped.
+        It is reopened from where it left off after an error, or when
+        the subscribed boards change.
+        """
+        resume_token = None
+        while not self._stopped.is_set():
+            with self._lock:
+                self._boards_changed.clear()
+                board_ids = list(self._subscribers)
+            try:
+                with mongo.db.boards.watch(
+                        change_stream_pipeline(board_ids),
+                        resume_after=resume_token,
+                        max_await_time_ms=1000) as stream:
+                    while (stream.alive and not self._stopped.is_set()
+                           and not self._boards_changed.is_set()):
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is not None:
+                            self._dispatch_change(change)
+            except PyMongoError as e:
+                self._warn("Board events change stream interrupted: %s", e)
+                self._stopped.wait(1)
+
+    def _dispatch_change(self, change):
+        board_id = str(change["documentKey"]["_id"])
+
+        if change["operationType"] == "delete":
+            self._dispatch(board_id, {"type": "board_deleted", "revision": None})
+            return
+
+        fields = change["updateDescription"]["updatedFields"]
+        self._dispatch(board_id, dict(fields["last_event"], revision=fields.get("revision")))
+
+    def _warn(self, message, *args):
+        if self.logger is not None:
+            self.logger.warning(message, *args)
+
+
+def board_event(event_type, **data):
+    """
+    Build the event a Board write stores in last_event. Each event gets
+    its own _id, so two identical changes in a row still show up as an
+    update to last_event in the change stream.
+    """
+    return {"type": event_type, "_id": ObjectId(), **data}
+
+
+board_events = BoardEventBus()
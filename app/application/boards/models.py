@@ -1,4 +1,11 @@
 from application.database import mongo
+from application.boards.diff import to_object_id, column_field
+from application.boards.events import board_events, board_event
+from application.boards.batch import (
+    APPLIED, FAILED, CONFLICT, SKIPPED, BATCH_RETRIES
+)
+from exceptions.handlers import RevisionMismatchError
+from pymongo import ASCENDING, UpdateOne
 from pymongo.collection import ReturnDocument
 from bson.objectid import ObjectId
 
@@ -6,10 +13,144 @@ from bson.objectid import ObjectId
 from typing import List
 
 
+# Every write to a board bumps its revision, which backs the ETag
+# of get_board and list_boards. Boards written before revisions
+# existed count as revision 0.
+BUMP_REVISION_STAGE = {
+    "$set": {
+        "revision": {"$add": [{"$ifNull": ["$revision", 0]}, 1]}
+    }
+}
+
+# A task's status is the name of the column it sits in. It is filled in
+# whenever tasks are read rather than kept up to date on the tasks, so
+# renaming a column never rewrites them; any status stored on a task
+# is ignored.
+COLUMNS_WITH_TASK_STATUS = {
+    "$map": {
+        "input": {"$ifNull": ["$columns", []]},
+        "as": "column",
+        "in": {
+            "$mergeObjects": [
+                "$$column",
+                {
+                    "tasks": {
+                        "$map": {
+                            "input": {"$ifNull": ["$$column.tasks", []]},
+                            "as": "task",
+                            "in": {"$mergeObjects": ["$$task", {"status": "$$column.name"}]}
+                        }
+                    }
+                }
+            ]
+        }
+    }
+}
+
+# last_event only feeds the board events stream; it's never sent with the board.
+BOARD_PROJECTION = {"user": 1, "name": 1, "revision": 1, "columns": COLUMNS_WITH_TASK_STATUS}
+
+# A board as listed by get_boards.
+BOARD_LIST_PROJECTION = {"name": 1, "revision": 1, "columns": COLUMNS_WITH_TASK_STATUS}
+
+# Just enough of a board to report a write's new revision.
+REVISION_PROJECTION = {"revision": 1}
+
+BOARD_SUMMARY_PROJECTION = {
+    "name": 1,
+    "revision": 1,
+    "columns": {
+        "$map": {
+            "input": {"$ifNull": ["$columns", []]},
+            "as": "column",
+            "in": {
+                "_id": "$$column._id",
+                "name": "$$column.name",
+                "task_count": {"$size": {"$ifNull": ["$$column.tasks", []]}}
+            }
+        }
+    }
+}
+
+
+def column_array_filter(identifier, column):
+    """
+    The array filter matching a column, addressed by name or by _id,
+    to the identifier used in an update path (columns.$[identifier]).
+    """
+    return {f"{identifier}.{column_field(column)}": column}
+
+
+def task_projection(column_name, task_id):
+    """
+    Projection computing, server-side, the board's revision and the
+    single task task_id in column column_name (as "task"), with its
+    status, so a write can return just that task. The column may be
+    given by name or _id.
+    """
+    return {
+        "revision": 1,
+        "task": {
+            "$let": {
+                "vars": {
+                    "column": {
+                        "$arrayElemAt": [
+                            {
+                                "$filter": {
+                                    "input": "$columns",
+                                    "as": "column",
+                                    "cond": {
+                                        "$eq": [
+                                            f"$$column.{column_field(column_name)}",
+                                            {"$literal": column_name}
+                                        ]
+                                    }
+                                }
+                            },
+                            0
+                        ]
+                    }
+                },
+                "in": {
+                    "$let": {
+                        "vars": {
+                            "task": {
+                                "$arrayElemAt": [
+                                    {
+                                        "$filter": {
+                                            "input": {"$ifNull": ["$$column.tasks", []]},
+                                            "as": "task",
+                                            "cond": {"$eq": ["$$task._id", ObjectId(task_id)]}
+                                        }
+                                    },
+                                    0
+                                ]
+                            }
+                        },
+                        "in": {
+                            "$cond": [
+                                {"$eq": [{"$type": "$$task"}, "missing"]},
+                                "$$REMOVE",
+                                {"$mergeObjects": ["$$task", {"status": "$$column.name"}]}
+                            ]
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
 class Board:
     """
     Model to represent a single board.
+
+    Tasks are embedded in the board's columns[].tasks arrays, unless
+    BOARD_TASK_STORAGE is "collection": then init_task_storage sets
+    task_collection, and the task methods hand over to it.
     """
+    task_collection = None
+
     def __init__(self, user, name, columns):
         self.user = user
         self.name = name
@@ -19,12 +160,16 @@ class Board:
         return {
             "user": self.user,
             "name": self.name,
-            "columns": self.columns
+            "columns": self.columns,
+            "revision": 1
         }
 
     def add_board(self):
         board = self._get_board()
 
+        if Board.task_collection is not None:
+            return Board.task_collection.add_board(board)
+
         board_insert = mongo.db.boards.insert_one(board)
         return board_insert.inserted_id
 
@@ -34,26 +179,101 @@ class Board:
 
     @staticmethod
     def find_board_by_id(id):
-        return mongo.db.boards.find_one({"_id": ObjectId(id)})
+        if Board.task_collection is not None:
+            return Board.task_collection.find_board_by_id(id)
+        return mongo.db.boards.find_one({"_id": ObjectId(id)}, BOARD_PROJECTION)
+
+    @staticmethod
+    def _board_filter(board_id, revision=None):
+        """
+        Filter matching a board by ID and, when a revision is given,
+        only while the board is still at that revision. Enforcing the
+        precondition in the update filter costs no extra round trip.
+        """
+        board_filter = {"_id": ObjectId(board_id)}
+        if revision is not None:
+            # Boards written before revisions existed have no field (revision 0).
+            board_filter["revision"] = revision if revision != 0 else None
+        return board_filter
+
+    @staticmethod
+    def _task_filter(board_id, revision, column, task_id):
+        """
+        _board_filter, also requiring the column (by name or _id) to hold
+        the task, so a write to a task that isn't there matches nothing
+        rather than bumping the revision for no change.
+        """
+        board_filter = Board._board_filter(board_id, revision)
+        board_filter["columns"] = {
+            "$elemMatch": {
+                column_field(column): column,
+                "tasks._id": ObjectId(task_id)
+            }
+        }
+        return board_filter
+
+    @staticmethod
+    def _published(board_id, event, board):
+        """
+        Publish the event a successful write recorded in last_event,
+        and pass the write's result through.
+        """
+        if board is not None:
+            board_events.publish(board_id, event, board.get("revision"))
+        return board
 
     @staticmethod
-    def update_board_columns(id, column_arr):
-        return mongo.db.boards.update_one(
-            {"_id": ObjectId(id)},
+    def _check_revision(board_id, revision):
+        """
+        Called when a conditional write matched nothing. Raise if that
+        was because the board has moved past the expected revision,
+        rather than because the board, column or task doesn't exist.
+        """
+        if revision is None:
+            return
+
+        current_revision = Board.get_revision(board_id)
+        if current_revision is not None and current_revision != revision:
+            raise RevisionMismatchError(board_id, current_revision)
+
+    @staticmethod
+    def update_board_columns(id, column_arr, revision=None,
+                             projection=BOARD_PROJECTION):
+        if Board.task_collection is not None:
+            return Board.task_collection.update_board_columns(
+                id, column_arr, revision, projection)
+
+        event = board_event("columns_added", columns=column_arr)
+
+        board = mongo.db.boards.find_one_and_update(
+            Board._board_filter(id, revision),
             {
                 "$push": {
                     "columns": {
                         "$each": column_arr
                     }
-                }
-            }
+                },
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
+            },
+            projection=projection,
+            return_document=ReturnDocument.AFTER
         )
+        if board is None:
+            Board._check_revision(id, revision)
+        return Board._published(id, event, board)
 
     @staticmethod
-    def remove_board_columns(id, column_arr):
+    def remove_board_columns(id, column_arr, revision=None,
+                             projection=BOARD_PROJECTION):
+        if Board.task_collection is not None:
+            return Board.task_collection.remove_board_columns(
+                id, column_arr, revision, projection)
 
-        return mongo.db.boards.update_one(
-            {"_id": ObjectId(id)},
+        event = board_event("columns_removed", names=column_arr)
+
+        board = mongo.db.boards.find_one_and_update(
+            Board._board_filter(id, revision),
             {
                 "$pull": {
                     "columns": {
@@ -61,118 +281,268 @@ class Board:
                             "$in": column_arr
                         }
                     }
-                }
-            }
+                },
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
+            },
+            projection=projection,
+            return_document=ReturnDocument.AFTER
         )
+        if board is None:
+            Board._check_revision(id, revision)
+        return Board._published(id, event, board)
+
+    @staticmethod
+    def get_boards(user_id, after=None, limit=None, summary=False):
+        """
+        Return a cursor over a user's boards, in _id order.
+
+        after and limit give cursor-based pagination: only boards with
+        an _id greater than after are returned, at most limit of them.
+        With summary, each board is projected down to its _id, name and
+        each column's _id, name and task count, computed server-side.
+        """
+        board_filter = {"user": ObjectId(user_id)}
+        if after is not None:
+            board_filter["_id"] = {"$gt": ObjectId(after)}
+
+        projection = BOARD_SUMMARY_PROJECTION if summary else BOARD_LIST_PROJECTION
+
+        boards = mongo.db.boards.find(
+            board_filter, projection
+        ).sort("_id", ASCENDING)
+
+        if limit is not None:
+            boards = boards.limit(limit)
+
+        if Board.task_collection is not None:
+            return Board.task_collection.get_boards(boards, summary)
+        return boards
 
     @staticmethod
-    def get_boards(user_id):
+    def get_revision(board_id):
+        """
+        Return the board's revision, or None if there is no such board.
+        Only the revision is fetched; the columns array is never read.
+        """
+        board = mongo.db.boards.find_one(
+            {"_id": ObjectId(board_id)},
+            {"revision": 1}
+        )
+        return board.get("revision", 0) if board is not None else None
+
+    @staticmethod
+    def get_column_ids(board_id):
+        """
+        Return the board's column _ids by column name, or None if there
+        is no such board. Only the columns' names and _ids are fetched.
+        """
+        board = mongo.db.boards.find_one(
+            {"_id": ObjectId(board_id)},
+            {"columns._id": 1, "columns.name": 1}
+        )
+        if board is None:
+            return None
+        return {column["name"]: column["_id"] for column in board.get("columns", [])}
+
+    @staticmethod
+    def get_board_revisions(user_id, after=None, limit=None):
+        """
+        Return the _id and revision of the boards get_boards would
+        return for the same arguments, without fetching their columns.
+        """
+        board_filter = {"user": ObjectId(user_id)}
+        if after is not None:
+            board_filter["_id"] = {"$gt": ObjectId(after)}
+
+        boards = mongo.db.boards.find(
+            board_filter, {"revision": 1}
+        ).sort("_id", ASCENDING)
+
+        if limit is not None:
+            boards = boards.limit(limit)
+        return boards
+
+    @staticmethod
+    def export_boards(user_id, batch_size):
+        """
+        Cursor over a user's boards in _id order, with each column's
+        _id and name but none of the tasks, batch_size boards at a time.
+        """
         return mongo.db.boards.find(
             {"user": ObjectId(user_id)},
+            {"name": 1, "columns._id": 1, "columns.name": 1},
+            batch_size=batch_size
+        ).sort("_id", ASCENDING)
+
+    @staticmethod
+    def export_tasks(board_id, batch_size):
+        """
+        Cursor over a board's tasks, column by column, each with its
+        column's _id as column_id and its status, batch_size tasks at
+        a time.
+        """
+        if Board.task_collection is not None:
+            return Board.task_collection.export_tasks(board_id, batch_size)
+
+        return mongo.db.boards.aggregate([
+            {"$match": {"_id": ObjectId(board_id)}},
+            {"$unwind": "$columns"},
+            {"$unwind": "$columns.tasks"},
             {
-                "user": 0
+                "$replaceRoot": {
+                    "newRoot": {
+                        "$mergeObjects": [
+                            {"column_id": "$columns._id"},
+                            "$columns.tasks",
+                            {"status": "$columns.name"}
+                        ]
+                    }
+                }
             }
+        ], batchSize=batch_size)
+
+    @staticmethod
+    def import_tasks(board_id, column_id, tasks):
+        """
+        Append tasks to the end of a column, given by _id, in one write.
+        Subscribers are told to resync rather than sent every task.
+        """
+        if Board.task_collection is not None:
+            return Board.task_collection.import_tasks(board_id, column_id, tasks)
+
+        event = board_event("resync", column_id=column_id, task_count=len(tasks))
+        board = mongo.db.boards.find_one_and_update(
+            {"_id": ObjectId(board_id), "columns._id": column_id},
+            {
+                "$push": {"columns.$.tasks": {"$each": tasks}},
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
+            },
+            projection=REVISION_PROJECTION,
+            return_document=ReturnDocument.AFTER
         )
+        Board._published(board_id, event, board)
 
     @staticmethod
     def get_board(board_id):
+        if Board.task_collection is not None:
+            return Board.task_collection.find_board_by_id(board_id)
         return mongo.db.boards.find_one(
-            {"_id": ObjectId(board_id)}
+            {"_id": ObjectId(board_id)},
+            BOARD_PROJECTION
         )
 
     @staticmethod
     def get_task(board_id, column_name, task_id):
-        return list(mongo.db.boards.aggregate([
-            {
-                "$match": {
-                    "_id": ObjectId(board_id)
-                }
-            },
-            {
-                "$unwind": "$columns"
-            },
-            {
-                "$match": {
-                    "columns.name": column_name
-                }
-            },
-            {
-                "$replaceRoot": {
-                    "newRoot": "$columns"
-                }
-            },
-            {
-                "$unwind": "$tasks"
-            }, 
-            {
-                "$match": {
-                    "tasks._id": ObjectId(task_id)
-                }
-            },
-            {
-                "$replaceRoot": {
-                    "newRoot": "$tasks"
-                }
-            }
-        ])
+        """
+        Return the task task_id of the column column_name as a
+        one-element list, or an empty list if there is no such task.
+        The task is picked out server-side by task_projection, in a
+        single find: only that task is sent back, and no column or
+        task is unwound.
+        """
+        if Board.task_collection is not None:
+            return Board.task_collection.get_task(board_id, column_name, task_id)
+
+        board = mongo.db.boards.find_one(
+            {"_id": ObjectId(board_id)},
+            task_projection(column_name, task_id)
         )
+        if board is None or board.get("task") is None:
+            return []
+        return [board["task"]]
 
     @staticmethod
     def update_task_add_subtasks(board_id, column_name,
-                                 task_id, subtask_data):
+                                 task_id, subtask_data, revision=None):
         """
         Update title and description of task.
         Push new subtasks into subtask array.
         subtask_data handles and array containing an arbitrary number of subtasks.
         """
+        if Board.task_collection is not None:
+            return Board.task_collection.update_task_add_subtasks(
+                board_id, column_name, task_id, subtask_data, revision)
+
+        event = board_event(
+            "subtasks_added", column=column_name,
+            task_id=ObjectId(task_id), subtasks=subtask_data)
 
-        return mongo.db.boards.find_one_and_update(
-                {"_id": ObjectId(board_id)},
+        updated_board = mongo.db.boards.find_one_and_update(
+                Board._task_filter(board_id, revision, column_name, task_id),
                 {
                     "$push": {
                         "columns.$[t].tasks.$[i].subtasks": {
                             "$each": subtask_data
                         }
-                    }
+                    },
+                    "$set": {"last_event": event},
+                    "$inc": {"revision": 1}
                 },
                 array_filters=[
-                    {"t.name": column_name},
+                    column_array_filter("t", column_name),
                     {"i._id": ObjectId(task_id)}
                 ],
+                projection=BOARD_PROJECTION,
                 return_document=ReturnDocument.AFTER
             )
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
 
     @staticmethod
-    def update_task_meta(board_id, column_name, task_id, 
-                         new_title, new_description):
+    def update_task_meta(board_id, column_name, task_id,
+                         new_title, new_description, revision=None):
         """Update title and description of task."""
-        return mongo.db.boards.find_one_and_update(
-            {"_id": ObjectId(board_id)},
+        if Board.task_collection is not None:
+            return Board.task_collection.update_task_meta(
+                board_id, column_name, task_id, new_title, new_description, revision)
+
+        event = board_event(
+            "task_updated", column=column_name, task_id=ObjectId(task_id),
+            title=new_title, description=new_description)
+
+        updated_board = mongo.db.boards.find_one_and_update(
+            Board._task_filter(board_id, revision, column_name, task_id),
             {
                 "$set": {
                     "columns.$[t].tasks.$[i].title": new_title,
-                    "columns.$[t].tasks.$[i].description": new_description
-                }
+                    "columns.$[t].tasks.$[i].description": new_description,
+                    "last_event": event
+                },
+                "$inc": {"revision": 1}
             },
              array_filters=[
-                    {"t.name": column_name},
+                    column_array_filter("t", column_name),
                     {"i._id": ObjectId(task_id)}
                 ],
+            projection=BOARD_PROJECTION,
             return_document=ReturnDocument.AFTER
         )
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
 
     @staticmethod
     def update_task_remove_subtasks(board_id, column_name,
-                                    task_id, subtasks_to_remove):
+                                    task_id, subtasks_to_remove, revision=None):
         """
         Update title and description of given task.
         Pull subtasks from the subtask array.
         If an ID of a given subtask is included in the array 'subtasks_to_remove',
         pull it from the array.
         """
+        if Board.task_collection is not None:
+            return Board.task_collection.update_task_remove_subtasks(
+                board_id, column_name, task_id, subtasks_to_remove, revision)
 
-        return mongo.db.boards.find_one_and_update(
-            {"_id": ObjectId(board_id)},
+        event = board_event(
+            "subtasks_removed", column=column_name,
+            task_id=ObjectId(task_id), subtask_ids=subtasks_to_remove)
+
+        updated_board = mongo.db.boards.find_one_and_update(
+            Board._task_filter(board_id, revision, column_name, task_id),
             {
                 "$pull": {
                     "columns.$[t].tasks.$[i].subtasks": {
@@ -180,43 +550,99 @@ class Board:
                             "$in": subtasks_to_remove
                         }
                     }
-                }
+                },
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
             },
             array_filters=[
-                {"t.name": column_name},
+                column_array_filter("t", column_name),
                 {"i._id": ObjectId(task_id)}
             ],
+            projection=BOARD_PROJECTION,
             return_document=ReturnDocument.AFTER
         )
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
     
     @staticmethod
-    def update_subtask_title(board_id, column_name, task_id, subtasks_to_update):
-        for subtask in subtasks_to_update:
-            mongo.db.boards.find_one_and_update(
-                {"_id": ObjectId(board_id)},
-                {
-                    "$set": {
-                        "columns.$[t].tasks.$[i].subtasks.$[j].title": subtask["title"]
-                    }
-                },
-                array_filters=[
-                    {"t.name": column_name},
-                    {"i._id": ObjectId(task_id)},
-                    {"j._id": ObjectId(subtask["_id"].get("$oid"))}
-                ]
-            )
-    
+    def update_subtask_title(board_id, column_name, task_id,
+                             subtasks_to_update, revision=None):
+        """
+        Rename any number of subtasks in a single write.
+        Each subtask gets its own array filter identifier (s0, s1, ...),
+        so the number of round trips stays the same however many
+        subtasks are renamed. Returns the updated board.
+        """
+        if not subtasks_to_update:
+            return Board.find_board_by_id(board_id)
+
+        if Board.task_collection is not None:
+            return Board.task_collection.update_subtask_title(
+                board_id, column_name, task_id, subtasks_to_update, revision)
 
-    def update_task_status(board_id, task_id, 
-                           prev_status, new_status, new_task):
+        new_titles = {}
+        array_filters = [
+            column_array_filter("t", column_name),
+            {"i._id": ObjectId(task_id)}
+        ]
 
-        mongo.db.boards.find_one_and_update(
+        # Key by subtask ID so a repeated subtask cannot produce two
+        # conflicting updates to the same path.
+        titles_by_id = {
+            to_object_id(subtask["_id"]): subtask["title"]
+            for subtask in subtasks_to_update
+        }
+
+        for index, (subtask_id, title) in enumerate(titles_by_id.items()):
+            identifier = f"s{index}"
+            new_titles[f"columns.$[t].tasks.$[i].subtasks.$[{identifier}].title"] = title
+            array_filters.append({f"{identifier}._id": subtask_id})
+
+        event = board_event(
+            "subtasks_renamed", column=column_name, task_id=ObjectId(task_id),
+            subtasks=[
+                {"_id": subtask_id, "title": title}
+                for subtask_id, title in titles_by_id.items()
+            ])
+        new_titles["last_event"] = event
+
+        updated_board = mongo.db.boards.find_one_and_update(
+            Board._task_filter(board_id, revision, column_name, task_id),
             {
-                "_id": ObjectId(board_id),
-                "columns.name": prev_status
+                "$set": new_titles,
+                "$inc": {"revision": 1}
             },
+            array_filters=array_filters,
+            projection=BOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
+
+
+    @staticmethod
+    def update_task_status(board_id, task_id,
+                           prev_status, new_status, new_task, revision=None):
+        """
+        Move a task to another column in a single atomic write:
+        pull it from prev_status and push new_task into new_status.
+        Either column may be given by name or by _id.
+        """
+        if Board.task_collection is not None:
+            return Board.task_collection.update_task_status(
+                board_id, task_id, prev_status, new_status, revision)
+
+        event = board_event(
+            "task_moved", task_id=ObjectId(task_id),
+            **{"from": prev_status, "to": new_status})
+        board_filter = Board._task_filter(board_id, revision, prev_status, task_id)
+        board_filter[f"columns.{column_field(new_status)}"] = new_status
+
+        updated_board = mongo.db.boards.find_one_and_update(
+            board_filter,
             {
-    
                 "$pull": {
                     "columns.$[t].tasks": {
                         "_id": ObjectId(task_id)
@@ -224,54 +650,281 @@ class Board:
                 },
                 "$push": {
                     "columns.$[i].tasks": new_task
-                }
+                },
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
             },
             array_filters=[
-                {"t.name": prev_status},
-                {"i.name": new_status}
-            ]
+                column_array_filter("t", prev_status),
+                column_array_filter("i", new_status)
+            ],
+            projection=BOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER
         )
-    
-        return mongo.db.boards.find_one_and_update(
-            {"_id": ObjectId(board_id)},
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
+
+    @staticmethod
+    def _column_rename_filter(board_id, column, new_name, revision):
+        """
+        Filter matching the board while it has the column and no other
+        column is already called new_name.
+        """
+        board_filter = Board._board_filter(board_id, revision)
+        board_filter["$and"] = [
+            {f"columns.{column_field(column)}": column},
+            {"columns.name": {"$ne": new_name}}
+        ]
+        return board_filter
+
+    @staticmethod
+    def rename_column(board_id, column, new_name, revision=None,
+                      projection=BOARD_PROJECTION):
+        """
+        Rename a column, given by name or _id, in a single write. Its
+        tasks take the new name as their status when next read; none is
+        rewritten. Returns None if there is no such column or another
+        column already has new_name.
+        """
+        if Board.task_collection is not None:
+            return Board.task_collection.rename_column(
+                board_id, column, new_name, revision, projection)
+
+        event = board_event("column_renamed", column=column, name=new_name)
+
+        updated_board = mongo.db.boards.find_one_and_update(
+            Board._column_rename_filter(board_id, column, new_name, revision),
             {
-                 "$set": {
-                    "columns.$[i].tasks.$[j].status": new_status
+                "$set": {
+                    "columns.$[c].name": new_name,
+                    "last_event": event
                 },
+                "$inc": {"revision": 1}
             },
-            array_filters=[
-                {"i.name": new_status},
-                {"j._id": ObjectId(task_id)}
+            array_filters=[column_array_filter("c", column)],
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
+
+    @staticmethod
+    def apply_task_diff(board_id, column_name, task_id, task_diff,
+                        revision=None, projection=BOARD_PROJECTION):
+        """
+        Apply every change described by a TaskDiff in one pipeline update.
+        Returns the board as it stands after the write, or None if the
+        task (or the column it is moving to) does not exist.
+        projection picks which parts of the board are returned.
+        """
+        if Board.task_collection is not None:
+            return Board.task_collection.apply_task_diff(
+                board_id, column_name, task_id, task_diff, revision, projection)
+
+        board_filter = Board._task_filter(board_id, revision, column_name, task_id)
+
+        if task_diff.moves_task(column_name):
+            board_filter[f"columns.{column_field(task_diff.status)}"] = task_diff.status
+
+        event = task_diff.to_event(column_name, task_id)
+
+        updated_board = mongo.db.boards.find_one_and_update(
+            board_filter,
+            task_diff.to_pipeline(column_name, task_id) + [
+                BUMP_REVISION_STAGE,
+                {"$set": {"last_event": {"$literal": event}}}
             ],
+            projection=projection,
             return_document=ReturnDocument.AFTER
         )
+        if updated_board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, updated_board)
 
     @staticmethod
-    def add_task_to_column(board_id, column_name, task_data): 
-          return mongo.db.boards.find_one_and_update(
-                {
-                    "_id": ObjectId(board_id),
-                    "columns.name": column_name
-                },
+    def add_task_to_column(board_id, column_name, task_data, revision=None,
+                           projection=BOARD_PROJECTION):
+        if Board.task_collection is not None:
+            return Board.task_collection.add_task_to_column(
+                board_id, column_name, task_data, revision, projection)
+
+        board_filter = Board._board_filter(board_id, revision)
+        board_filter[f"columns.{column_field(column_name)}"] = column_name
+
+        event = board_event("task_added", column=column_name, task=task_data)
+
+        board = mongo.db.boards.find_one_and_update(
+                board_filter,
                 {
                     "$push": {
                         "columns.$.tasks": task_data
-                    }
-                }
+                    },
+                    "$set": {"last_event": event},
+                    "$inc": {"revision": 1}
+                },
+                projection=projection,
+                return_document=ReturnDocument.AFTER
             )
+        if board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, board)
 
     @staticmethod
-    def remove_task_from_column(board_id, column_name, task_id):
-        return mongo.db.boards.find_one_and_update(
-            {
-                "_id": ObjectId(board_id),
-                "columns.name": column_name
-            },
+    def remove_task_from_column(board_id, column_name, task_id, revision=None,
+                                projection=BOARD_PROJECTION):
+        if Board.task_collection is not None:
+            return Board.task_collection.remove_task_from_column(
+                board_id, column_name, task_id, revision, projection)
+
+        board_filter = Board._task_filter(board_id, revision, column_name, task_id)
+
+        event = board_event(
+            "task_removed", column=column_name, task_id=ObjectId(task_id))
+
+        board = mongo.db.boards.find_one_and_update(
+            board_filter,
             {
                 "$pull": {
                     "columns.$.tasks": {
                         "_id": ObjectId(task_id)
                     }
-                }
+                },
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
+            },
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if board is None:
+            Board._check_revision(board_id, revision)
+        return Board._published(board_id, event, board)
+
+    @staticmethod
+    def _task_operation_request(board_id, revision, operation, event, previous_event=None):
+        """
+        The UpdateOne applying a TaskOperation to the board, only while
+        the board is at revision and, when previous_event is given, that
+        was the last event recorded. Updates, moves and deletes only
+        match when the task is in the column; a move also needs the
+        column it goes to.
+        """
+        board_filter = Board._board_filter(board_id, revision)
+        if previous_event is not None:
+            board_filter["last_event._id"] = previous_event["_id"]
+        update = {
+            "$set": {"last_event": event},
+            "$inc": {"revision": 1}
+        }
+
+        if operation.op == "create":
+            board_filter[f"columns.{column_field(operation.column)}"] = operation.column
+            update["$push"] = {"columns.$.tasks": operation.task}
+            return UpdateOne(board_filter, update)
+
+        board_filter["columns"] = {
+            "$elemMatch": {
+                column_field(operation.column): operation.column,
+                "tasks._id": operation.task_id
             }
+        }
+
+        if operation.op == "delete":
+            update["$pull"] = {"columns.$.tasks": {"_id": operation.task_id}}
+            return UpdateOne(board_filter, update)
+
+        task_diff = operation.task_diff
+        if task_diff.moves_task(operation.column):
+            board_filter[f"columns.{column_field(task_diff.status)}"] = task_diff.status
+
+        return UpdateOne(
+            board_filter,
+            task_diff.to_pipeline(operation.column, operation.task_id) + [
+                BUMP_REVISION_STAGE,
+                {"$set": {"last_event": {"$literal": event}}}
+            ]
         )
+
+    @staticmethod
+    def apply_task_batch(board_id, operations, revision=None):
+        """
+        Apply a list of TaskOperations in order, as one ordered
+        bulk_write on the board.
+
+        Each write is conditional on the revision the write before it
+        leaves the board at, and on the event that write records, so
+        once an operation matches nothing none after it can, even if
+        another write moves the board on to the revision a later one
+        expects. The writes that matched are then always the first ones
+        of the round, and their number gives the board's final revision.
+
+        The batch stops at the first operation that matches nothing.
+        When that operation's task or column doesn't exist it is
+        reported as failed. When another write got in first, an
+        unconditional batch carries on from the board's new revision,
+        up to BATCH_RETRIES times; a batch made conditional by revision
+        raises RevisionMismatchError if nothing was applied yet and
+        otherwise reports a conflict. Operations after the one that
+        stopped the batch are reported as skipped.
+
+        Returns the board's _id and final revision with one result per
+        operation, or None if the board does not exist.
+        """
+        if any(operation.mixes_column_forms() for operation in operations):
+            column_ids = Board.get_column_ids(board_id)
+            if column_ids is None:
+                return None
+            for operation in operations:
+                if operation.mixes_column_forms():
+                    operation.resolve_columns(column_ids)
+
+        if Board.task_collection is not None:
+            return Board.task_collection.apply_task_batch(board_id, operations, revision)
+
+        expected = revision if revision is not None else Board.get_revision(board_id)
+        if expected is None:
+            return None
+
+        events = [operation.to_event() for operation in operations]
+        results = []
+        retries = 0
+
+        while len(results) < len(operations):
+            pending = range(len(results), len(operations))
+            requests = [
+                Board._task_operation_request(
+                    board_id, expected + n, operations[i], events[i],
+                    events[i - 1] if n > 0 else None)
+                for n, i in enumerate(pending)
+            ]
+            matched = mongo.db.boards.bulk_write(requests, ordered=True).matched_count
+
+            for i in pending[:matched]:
+                expected += 1
+                board_events.publish(board_id, events[i], expected)
+                results.append(operations[i].result(i, APPLIED))
+
+            if len(results) == len(operations):
+                break
+
+            index = len(results)
+            current_revision = Board.get_revision(board_id)
+            if current_revision is None or current_revision == expected:
+                results.append(operations[index].result(index, FAILED))
+                break
+
+            if revision is not None or retries == BATCH_RETRIES:
+                if revision is not None and index == 0:
+                    raise RevisionMismatchError(board_id, current_revision)
+                results.append(operations[index].result(index, CONFLICT))
+                break
+
+            retries += 1
+            expected = current_revision
+
+        results += [
+            operations[i].result(i, SKIPPED)
+            for i in range(len(results), len(operations))
+        ]
+        return {"_id": ObjectId(board_id), "revision": expected, "results": results}
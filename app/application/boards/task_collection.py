@@ -0,0 +1,637 @@
+"""
+Normalised task storage.
+
+With BOARD_TASK_STORAGE = "collection", tasks are stored as documents
+of their own in the tasks collection instead of in the board's
+columns[].tasks arrays:
+
+    {"_id", "board_id", "column_id", "position",
+     "title", "description", "subtasks"}
+
+A task write then touches one small document, whatever the size of
+the board, and the board document stays small. A task refers to its
+column only by column_id; its status (the column's name) is filled in
+when it is read, so renaming a column only writes the board. position
+orders a column's tasks: a task is added, or moved in, one after the
+column's last.
+
+Board keeps its public methods and their signatures; each one hands
+over to the TaskCollection method of the same name when this layout
+is enabled. Boards are still returned with their tasks nested in
+columns[].tasks, so the API doesn't change.
+
+The board document still carries the revision and the last event.
+A task write first reads the board's columns, which checks any
+If-Match precondition, then writes the task and, only if it found the
+task, bumps the board's revision and records the event. The writes are
+not transactional: another write landing between the check and the
+bump isn't detected.
+
+The migrate-tasks CLI command moves existing boards between the two
+layouts.
+"""
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import with_appcontext
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from pymongo.collection import ReturnDocument
+
+from application.database import mongo
+from application.boards.diff import to_object_id, column_field
+from application.boards.batch import APPLIED, FAILED, CONFLICT, SKIPPED
+from application.boards.events import board_event
+from application.boards.models import (
+    Board, BOARD_PROJECTION, REVISION_PROJECTION, column_array_filter
+)
+from exceptions.handlers import RevisionMismatchError
+
+
+STORAGE_EMBEDDED = "embedded"
+STORAGE_COLLECTION = "collection"
+
+# Fields that only exist to place a task; never sent to the client.
+TASK_PROJECTION = {"board_id": 0, "column_id": 0, "position": 0}
+
+# Gap between the positions of consecutive tasks.
+POSITION_STEP = 1
+
+
+def stored_task(task, **placement):
+    """The task document to store: the task without its status, placed by placement."""
+    return dict({k: v for k, v in task.items() if k != "status"}, **placement)
+
+
+class TaskCollection:
+    """Board task operations for the normalised (tasks collection) layout."""
+
+    @staticmethod
+    def add_board(board):
+        """Insert a board, moving any tasks in its columns to the tasks collection."""
+        board["columns"], tasks = TaskCollection._split_tasks(board["columns"])
+        board_id = mongo.db.boards.insert_one(board).inserted_id
+        TaskCollection._insert_tasks(board_id, tasks)
+        return board_id
+
+    @staticmethod
+    def find_board_by_id(board_id):
+        board = mongo.db.boards.find_one({"_id": ObjectId(board_id)}, BOARD_PROJECTION)
+        if board is not None:
+            TaskCollection._attach_tasks([board])
+        return board
+
+    @staticmethod
+    def get_boards(boards, summary):
+        """
+        Nest the tasks of the boards found by Board.get_boards
+        into their columns, or with summary, count them.
+        """
+        boards = list(boards)
+        if summary:
+            TaskCollection._attach_task_counts(boards)
+        else:
+            TaskCollection._attach_tasks(boards)
+        return boards
+
+    @staticmethod
+    def get_task(board_id, column_name, task_id):
+        column = TaskCollection._find_column(board_id, None, column_name)
+        if column is None:
+            return []
+
+        task = mongo.db.tasks.find_one(
+            {"_id": ObjectId(task_id), "board_id": ObjectId(board_id), "column_id": column["_id"]},
+            TASK_PROJECTION
+        )
+        return [dict(task, status=column["name"])] if task is not None else []
+
+    @staticmethod
+    def update_board_columns(board_id, column_arr, revision, projection):
+        columns, tasks = TaskCollection._split_tasks(column_arr)
+        event = board_event("columns_added", columns=column_arr)
+
+        board = TaskCollection._bump_revision(
+            board_id, revision, event,
+            update={"$push": {"columns": {"$each": columns}}})
+        if board is None:
+            return None
+
+        TaskCollection._insert_tasks(board["_id"], tasks)
+        return TaskCollection._result(board_id, event, board, projection)
+
+    @staticmethod
+    def remove_board_columns(board_id, column_arr, revision, projection):
+        event = board_event("columns_removed", names=column_arr)
+        column_ids = Board.get_column_ids(board_id) or {}
+
+        board = TaskCollection._bump_revision(
+            board_id, revision, event,
+            update={"$pull": {"columns": {"name": {"$in": column_arr}}}})
+        if board is None:
+            return None
+
+        mongo.db.tasks.delete_many({
+            "board_id": board["_id"],
+            "column_id": {"$in": [column_ids[name] for name in column_arr if name in column_ids]}
+        })
+        return TaskCollection._result(board_id, event, board, projection)
+
+    @staticmethod
+    def add_task_to_column(board_id, column_name, task_data, revision, projection):
+        event = board_event("task_added", column=column_name, task=task_data)
+
+        board = TaskCollection._bump_revision(
+            board_id, revision, event, column_name=column_name)
+        if board is None:
+            return None
+
+        column_id = board["columns"][0]["_id"]
+        mongo.db.tasks.insert_one(stored_task(
+            task_data,
+            board_id=board["_id"],
+            column_id=column_id,
+            position=TaskCollection._next_position(board["_id"], column_id)
+        ))
+        return TaskCollection._result(board_id, event, board, projection)
+
+    @staticmethod
+    def remove_task_from_column(board_id, column_name, task_id, revision, projection):
+        column = TaskCollection._find_column(board_id, revision, column_name)
+        if column is None:
+            return None
+
+        removed = mongo.db.tasks.delete_one({
+            "_id": ObjectId(task_id),
+            "board_id": ObjectId(board_id),
+            "column_id": column["_id"]
+        })
+        if removed.deleted_count == 0:
+            return None
+
+        event = board_event(
+            "task_removed", column=column_name, task_id=ObjectId(task_id))
+        board = TaskCollection._bump_revision(board_id, None, event)
+        return TaskCollection._result(board_id, event, board, projection)
+
+    @staticmethod
+    def update_task_add_subtasks(board_id, column_name, task_id, subtask_data, revision):
+        event = board_event(
+            "subtasks_added", column=column_name,
+            task_id=ObjectId(task_id), subtasks=subtask_data)
+
+        return TaskCollection._update_task(
+            board_id, column_name, task_id, revision, event,
+            {"$push": {"subtasks": {"$each": subtask_data}}})
+
+    @staticmethod
+    def update_task_meta(board_id, column_name, task_id,
+                         new_title, new_description, revision):
+        event = board_event(
+            "task_updated", column=column_name, task_id=ObjectId(task_id),
+            title=new_title, description=new_description)
+
+        return TaskCollection._update_task(
+            board_id, column_name, task_id, revision, event,
+            {"$set": {"title": new_title, "description": new_description}})
+
+    @staticmethod
+    def update_task_remove_subtasks(board_id, column_name, task_id,
+                                    subtasks_to_remove, revision):
+        event = board_event(
+            "subtasks_removed", column=column_name,
+            task_id=ObjectId(task_id), subtask_ids=subtasks_to_remove)
+
+        return TaskCollection._update_task(
+            board_id, column_name, task_id, revision, event,
+            {"$pull": {"subtasks": {"_id": {"$in": subtasks_to_remove}}}})
+
+    @staticmethod
+    def update_subtask_title(board_id, column_name, task_id,
+                             subtasks_to_update, revision):
+        titles_by_id = {
+            to_object_id(subtask["_id"]): subtask["title"]
+            for subtask in subtasks_to_update
+        }
+
+        new_titles = {}
+        array_filters = []
+        for index, (subtask_id, title) in enumerate(titles_by_id.items()):
+            new_titles[f"subtasks.$[s{index}].title"] = title
+            array_filters.append({f"s{index}._id": subtask_id})
+
+        event = board_event(
+            "subtasks_renamed", column=column_name, task_id=ObjectId(task_id),
+            subtasks=[
+                {"_id": subtask_id, "title": title}
+                for subtask_id, title in titles_by_id.items()
+            ])
+
+        return TaskCollection._update_task(
+            board_id, column_name, task_id, revision, event,
+            {"$set": new_titles}, array_filters=array_filters)
+
+    @staticmethod
+    def update_task_status(board_id, task_id, prev_status, new_status, revision):
+        event = board_event(
+            "task_moved", task_id=ObjectId(task_id),
+            **{"from": prev_status, "to": new_status})
+
+        source = TaskCollection._find_column(board_id, revision, prev_status)
+        target = TaskCollection._find_column(board_id, revision, new_status)
+        if source is None or target is None:
+            return None
+
+        board_id = ObjectId(board_id)
+        moved = mongo.db.tasks.update_one(
+            {"_id": ObjectId(task_id), "board_id": board_id, "column_id": source["_id"]},
+            {
+                "$set": {
+                    "column_id": target["_id"],
+                    "position": TaskCollection._next_position(board_id, target["_id"])
+                }
+            }
+        )
+        if moved.matched_count == 0:
+            return None
+
+        board = TaskCollection._bump_revision(board_id, None, event)
+        return TaskCollection._result(board_id, event, board, BOARD_PROJECTION)
+
+    @staticmethod
+    def rename_column(board_id, column, new_name, revision, projection):
+        event = board_event("column_renamed", column=column, name=new_name)
+
+        board = mongo.db.boards.find_one_and_update(
+            Board._column_rename_filter(board_id, column, new_name, revision),
+            {
+                "$set": {
+                    "columns.$[c].name": new_name,
+                    "last_event": event
+                },
+                "$inc": {"revision": 1}
+            },
+            array_filters=[column_array_filter("c", column)],
+            projection=REVISION_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if board is None:
+            Board._check_revision(board_id, revision)
+            return None
+        return TaskCollection._result(board_id, event, board, projection)
+
+    @staticmethod
+    def apply_task_diff(board_id, column_name, task_id, task_diff, revision, projection):
+        moving = task_diff.moves_task(column_name)
+        source = TaskCollection._find_column(board_id, revision, column_name)
+        target = source
+        if moving and source is not None:
+            target = TaskCollection._find_column(board_id, revision, task_diff.status)
+        if target is None:
+            return None
+
+        board_id = ObjectId(board_id)
+        position = None
+        if moving:
+            position = TaskCollection._next_position(board_id, target["_id"])
+
+        task = mongo.db.tasks.find_one_and_update(
+            {"_id": ObjectId(task_id), "board_id": board_id, "column_id": source["_id"]},
+            task_diff.to_task_pipeline(column_name, target["_id"], position),
+            projection=TASK_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if task is None:
+            return None
+        task["status"] = target["name"]
+
+        event = task_diff.to_event(column_name, task_id)
+        board = TaskCollection._bump_revision(board_id, None, event)
+        return TaskCollection._result(board_id, event, board, projection, task)
+
+    @staticmethod
+    def apply_task_batch(board_id, operations, revision):
+        """
+        Apply a list of TaskOperations in order. Tasks live in their own
+        documents here, so each operation is its own task write (after
+        its revision bump) rather than part of one bulk_write on the
+        board, but the results are reported as in the embedded layout.
+        With a revision, each write is conditional on the revision the
+        one before it left the board at.
+        """
+        expected = revision if revision is not None else Board.get_revision(board_id)
+        if expected is None:
+            return None
+
+        results = []
+        for index, operation in enumerate(operations):
+            condition = expected if revision is not None else None
+            try:
+                if operation.op == "create":
+                    board = TaskCollection.add_task_to_column(
+                        board_id, operation.column, operation.task,
+                        condition, REVISION_PROJECTION)
+                elif operation.op == "delete":
+                    board = TaskCollection.remove_task_from_column(
+                        board_id, operation.column, operation.task_id,
+                        condition, REVISION_PROJECTION)
+                else:
+                    board = TaskCollection.apply_task_diff(
+                        board_id, operation.column, operation.task_id,
+                        operation.task_diff, condition, REVISION_PROJECTION)
+            except RevisionMismatchError:
+                if index == 0:
+                    raise
+                results.append(operation.result(index, CONFLICT))
+                break
+
+            if board is None:
+                results.append(operation.result(index, FAILED))
+                break
+
+            expected = board["revision"]
+            results.append(operation.result(index, APPLIED))
+
+        results += [
+            operations[i].result(i, SKIPPED)
+            for i in range(len(results), len(operations))
+        ]
+        return {"_id": ObjectId(board_id), "revision": expected, "results": results}
+
+    @staticmethod
+    def export_tasks(board_id, batch_size):
+        column_names = {
+            column_id: name
+            for name, column_id in (Board.get_column_ids(board_id) or {}).items()
+        }
+        tasks = mongo.db.tasks.find(
+            {"board_id": ObjectId(board_id)},
+            {"board_id": 0, "position": 0},
+            batch_size=batch_size
+        ).sort([("column_id", ASCENDING), ("position", ASCENDING)])
+        return (dict(task, status=column_names.get(task["column_id"])) for task in tasks)
+
+    @staticmethod
+    def import_tasks(board_id, column_id, tasks):
+        board_id = ObjectId(board_id)
+        position = TaskCollection._next_position(board_id, column_id)
+        mongo.db.tasks.insert_many([
+            stored_task(task, board_id=board_id, column_id=column_id,
+                        position=position + i * POSITION_STEP)
+            for i, task in enumerate(tasks)
+        ])
+        event = board_event("resync", column_id=column_id, task_count=len(tasks))
+        board = TaskCollection._bump_revision(board_id, None, event)
+        Board._published(board_id, event, board)
+
+    @staticmethod
+    def _bump_revision(board_id, revision, event, column_name=None, update=None):
+        """
+        Bump the board's revision and record the event, if the board is
+        still at revision (when given) and has the column column_name
+        (when given, by name or _id). Returns the board's _id and revision,
+        with the matched column as columns[0], or None if nothing matched.
+        """
+        board_filter = Board._board_filter(board_id, revision)
+        projection = dict(REVISION_PROJECTION)
+        if column_name is not None:
+            field = column_field(column_name)
+            board_filter[f"columns.{field}"] = column_name
+            projection["columns"] = {"$elemMatch": {field: column_name}}
+
+        board = mongo.db.boards.find_one_and_update(
+            board_filter,
+            {
+                **(update or {}),
+                "$set": {"last_event": event},
+                "$inc": {"revision": 1}
+            },
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if board is None:
+            Board._check_revision(board_id, revision)
+        return board
+
+    @staticmethod
+    def _find_column(board_id, revision, column):
+        """
+        The column, given by name or _id, as {"_id", "name"}, or None if
+        the board or column doesn't exist. Raises RevisionMismatchError
+        if the board isn't at revision (when given).
+        """
+        field = column_field(column)
+        board = mongo.db.boards.find_one(
+            {"_id": ObjectId(board_id), f"columns.{field}": column},
+            {"revision": 1, "columns": {"$elemMatch": {field: column}}}
+        )
+        if board is None:
+            Board._check_revision(board_id, revision)
+            return None
+        if revision is not None and board.get("revision", 0) != revision:
+            raise RevisionMismatchError(board_id, board.get("revision", 0))
+        return board["columns"][0]
+
+    @staticmethod
+    def _update_task(board_id, column_name, task_id, revision, event,
+                     update, array_filters=None):
+        column = TaskCollection._find_column(board_id, revision, column_name)
+        if column is None:
+            return None
+
+        updated = mongo.db.tasks.update_one(
+            {
+                "_id": ObjectId(task_id),
+                "board_id": ObjectId(board_id),
+                "column_id": column["_id"]
+            },
+            update,
+            array_filters=array_filters
+        )
+        if updated.matched_count == 0:
+            return None
+
+        board = TaskCollection._bump_revision(board_id, None, event)
+        return TaskCollection._result(board_id, event, board, BOARD_PROJECTION)
+
+    @staticmethod
+    def _result(board_id, event, board, projection, task=None):
+        """
+        Shape a write's result like the embedded layout's: the whole
+        board for BOARD_PROJECTION, else its _id and revision, plus the
+        task for a task_projection.
+        """
+        if projection is BOARD_PROJECTION:
+            result = TaskCollection.find_board_by_id(board_id)
+        else:
+            result = {"_id": board["_id"], "revision": board["revision"]}
+            if "task" in projection:
+                result["task"] = task
+        return Board._published(board_id, event, result)
+
+    @staticmethod
+    def _next_position(board_id, column_id):
+        """The position after the last task of a column."""
+        last = mongo.db.tasks.find_one(
+            {"board_id": board_id, "column_id": column_id},
+            {"position": 1},
+            sort=[("position", DESCENDING)]
+        )
+        return last["position"] + POSITION_STEP if last is not None else POSITION_STEP
+
+    @staticmethod
+    def _split_tasks(columns):
+        """
+        Return the columns without their tasks, and the tasks,
+        each paired with its column's _id.
+        """
+        bare_columns = []
+        tasks = []
+        for column in columns:
+            bare_columns.append({k: v for k, v in column.items() if k != "tasks"})
+            for task in column.get("tasks") or []:
+                tasks.append((column["_id"], task))
+        return bare_columns, tasks
+
+    @staticmethod
+    def _insert_tasks(board_id, tasks):
+        positions = {}
+        documents = []
+        for column_id, task in tasks:
+            positions[column_id] = positions.get(column_id, 0) + POSITION_STEP
+            documents.append(stored_task(
+                task,
+                _id=task.get("_id") or ObjectId(),
+                board_id=board_id,
+                column_id=column_id,
+                position=positions[column_id]
+            ))
+        if documents:
+            mongo.db.tasks.insert_many(documents)
+
+    @staticmethod
+    def _attach_tasks(boards):
+        """
+        Nest each board's tasks, in position order, into its columns,
+        with the column's name as their status.
+        """
+        if not boards:
+            return
+
+        tasks_by_column = {}
+        for task in mongo.db.tasks.find(
+                {"board_id": {"$in": [board["_id"] for board in boards]}},
+                {"position": 0}
+        ).sort([("board_id", ASCENDING), ("column_id", ASCENDING), ("position", ASCENDING)]):
+            key = (task.pop("board_id"), task.pop("column_id"))
+            tasks_by_column.setdefault(key, []).append(task)
+
+        for board in boards:
+            for column in board.get("columns", []):
+                column["tasks"] = tasks_by_column.get((board["_id"], column["_id"]), [])
+                for task in column["tasks"]:
+                    task["status"] = column["name"]
+
+    @staticmethod
+    def _attach_task_counts(boards):
+        """Set task_count on each column of summary boards, counted server-side."""
+        if not boards:
+            return
+
+        counts = {
+            (count["_id"]["board_id"], count["_id"]["column_id"]): count["task_count"]
+            for count in mongo.db.tasks.aggregate([
+                {"$match": {"board_id": {"$in": [board["_id"] for board in boards]}}},
+                {
+                    "$group": {
+                        "_id": {"board_id": "$board_id", "column_id": "$column_id"},
+                        "task_count": {"$sum": 1}
+                    }
+                }
+            ])
+        }
+
+        for board in boards:
+            for column in board.get("columns", []):
+                column["task_count"] = counts.get((board["_id"], column["_id"]), 0)
+
+
+def migrate_to_collection(db, board):
+    """Move one board's embedded tasks into the tasks collection."""
+    requests = []
+    for column in board.get("columns", []):
+        for index, task in enumerate(column.get("tasks") or []):
+            requests.append(ReplaceOne(
+                {"_id": task["_id"]},
+                stored_task(
+                    task,
+                    board_id=board["_id"],
+                    column_id=column["_id"],
+                    position=(index + 1) * POSITION_STEP
+                ),
+                upsert=True
+            ))
+
+    # Upserting by _id makes a rerun after an interruption safe.
+    if requests:
+        db.tasks.bulk_write(requests, ordered=False)
+    db.boards.update_one(
+        {"_id": board["_id"]},
+        {"$unset": {"columns.$[].tasks": ""}, "$inc": {"revision": 1}}
+    )
+    return len(requests)
+
+
+def migrate_to_embedded(db, board):
+    """Move one board's tasks from the tasks collection back into its columns."""
+    tasks_by_column = {}
+    for task in db.tasks.find(
+            {"board_id": board["_id"]}, {"board_id": 0, "position": 0}
+    ).sort("position", ASCENDING):
+        tasks_by_column.setdefault(task.pop("column_id"), []).append(task)
+
+    columns = board.get("columns", [])
+    for column in columns:
+        # Keep any tasks already embedded by an interrupted earlier run.
+        embedded = column.get("tasks") or []
+        embedded_ids = {task["_id"] for task in embedded}
+        column["tasks"] = embedded + [
+            task for task in tasks_by_column.get(column["_id"], [])
+            if task["_id"] not in embedded_ids
+        ]
+
+    db.boards.update_one(
+        {"_id": board["_id"]},
+        {"$set": {"columns": columns}, "$inc": {"revision": 1}}
+    )
+    db.tasks.delete_many({"board_id": board["_id"]})
+    return sum(len(tasks) for tasks in tasks_by_column.values())
+
+
+@click.command("migrate-tasks")
+@click.option("--to", "layout", type=click.Choice([STORAGE_COLLECTION, STORAGE_EMBEDDED]),
+              required=True, help="The task storage layout to move boards to.")
+@with_appcontext
+def migrate_tasks(layout):
+    """
+    Move every board's tasks between the embedded and collection layouts.
+    Stop the app (or set BOARD_TASK_STORAGE to the new layout straight
+    after) so no writes land in the old layout mid-migration.
+    """
+    db = mongo.db
+    migrate = migrate_to_collection if layout == STORAGE_COLLECTION else migrate_to_embedded
+
+    board_count = 0
+    task_count = 0
+    for board in db.boards.find({}, {"columns": 1}):
+        task_count += migrate(db, board)
+        board_count += 1
+
+    click.echo(f"Moved {task_count} tasks of {board_count} boards to the {layout} layout.")
+
+
+def init_task_storage(app):
+    """Pick the task storage layout and register the migration command."""
+    layout = app.config.get("BOARD_TASK_STORAGE", STORAGE_EMBEDDED)
+    Board.task_collection = TaskCollection if layout == STORAGE_COLLECTION else None
+
+    app.cli.add_command(migrate_tasks)
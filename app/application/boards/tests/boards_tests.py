@@ -1,6 +1,9 @@
 from application import create_app
+from application.config import TestConfig
 from application.test_helpers import client_post_helper
 from application.database import mongo
+from application.boards.models import Board
+from application.metrics import BOARD_SIZE
 import flask_unittest
 
 import json
@@ -10,7 +13,7 @@ class BoardAPITests(flask_unittest.AppClientTestCase):
     """Unit tests for the Board API"""
 
     def create_app(self):
-        app = create_app()
+        app = create_app(TestConfig)
         yield app
 
     def setUp(self, app, client):
@@ -269,6 +272,347 @@ class BoardAPITests(flask_unittest.AppClientTestCase):
             self.assertNotIn("user", board)
         
 
+    def _create_board(self, client, name, columns):
+        res = client.post(
+            "/api/create_board/",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({"name": name, "columns": columns}),
+            content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 201)
+        return json.loads(res.data)
+
+    def test_list_boards_paginated(self, app, client):
+        """Test paging through a user's boards with 'after' and 'limit'."""
+
+        for i in range(3):
+            self._create_board(client, f"Test Board Name {i + 1}", [])
+
+        res = client.get(
+            "/api/list_boards?limit=2",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual([board["name"] for board in data],
+                         ["Test Board Name 1", "Test Board Name 2"])
+        self.assertIn('rel="next"', res.headers["Link"])
+
+        next_page = res.headers["Link"].split(">")[0].lstrip("<")
+        res = client.get(
+            next_page,
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual([board["name"] for board in data], ["Test Board Name 3"])
+        self.assertNotIn("Link", res.headers)
+
+    def test_list_boards_summary(self, app, client):
+        """Test the summary view returns names and per-column task counts only."""
+
+        board = self._create_board(client, "Test Board Name", [
+            {"name": "Test Column 1", "tasks": []},
+            {"name": "Test Column 2", "tasks": []}
+        ])
+        board_id = board["_id"].get("$oid")
+
+        for title in ("Test Task 1", "Test Task 2"):
+            res = client.post(
+                f"/api/add_task/{board_id}/Test Column 1",
+                headers={
+                    "Authorization": f"Bearer {self.jwt_token}"
+                },
+                data=json.dumps({
+                    "title": title,
+                    "description": "Test Task Description",
+                    "status": "Test Column 1",
+                    "subtasks": []
+                }),
+                content_type="application/json"
+            )
+            self.assertEqual(res.status_code, 200)
+
+        res = client.get(
+            "/api/list_boards?view=summary",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["name"], "Test Board Name")
+        self.assertEqual(
+            [(column["name"], column["task_count"]) for column in data[0]["columns"]],
+            [("Test Column 1", 2), ("Test Column 2", 0)]
+        )
+        for column in data[0]["columns"]:
+            self.assertNotIn("tasks", column)
+
+    def test_list_boards_invalid_limit_error(self, app, client):
+        """Test a non-positive page size is rejected."""
+
+        res = client.get(
+            "/api/list_boards?limit=0",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_get_board_records_board_size(self, app, client):
+        """Test get_board records the size of the board it serves."""
+        board = self._create_board(client, "Test Board Name", [
+            {"name": "Test Column 1", "tasks": []}
+        ])
+        board_id = board["_id"].get("$oid")
+
+        def board_size_samples():
+            return {
+                sample.name: sample.value for sample in BOARD_SIZE.collect()[0].samples
+                if not sample.name.endswith("_bucket")
+            }
+
+        before = board_size_samples()
+        res = client.get(
+            f"/api/get_board/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+        after = board_size_samples()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            after["board_document_size_bytes_count"] - before["board_document_size_bytes_count"], 1)
+        self.assertEqual(
+            after["board_document_size_bytes_sum"] - before["board_document_size_bytes_sum"],
+            len(res.data))
+
+    def test_get_board_conditional(self, app, client):
+        """
+        Test get_board answers a matching If-None-Match with 304,
+        and sends the board again once it has changed.
+        """
+        board = self._create_board(client, "Test Board Name", [
+            {"name": "Test Column 1", "tasks": []}
+        ])
+        board_id = board["_id"].get("$oid")
+
+        res = client.get(
+            f"/api/get_board/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        etag = res.headers["ETag"]
+
+        res = client.get(
+            f"/api/get_board/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        self.assertEqual(res.headers["ETag"], etag)
+
+        res = client.patch(
+            f"/api/update_board_columns/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({"columns_to_add": [{"name": "Test Column 2", "tasks": []}]}),
+            content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 200)
+
+        res = client.get(
+            f"/api/get_board/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+        self.assertEqual(len(json.loads(res.data)["columns"]), 2)
+
+    def test_list_boards_conditional(self, app, client):
+        """Test list_boards answers a matching If-None-Match with 304."""
+
+        self._create_board(client, "Test Board Name 1", [])
+
+        res = client.get(
+            "/api/list_boards",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        etag = res.headers["ETag"]
+
+        res = client.get(
+            "/api/list_boards",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+        self._create_board(client, "Test Board Name 2", [])
+
+        res = client.get(
+            "/api/list_boards",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)), 2)
+
+    def test_list_boards_etag_varies_with_view_and_page(self, app, client):
+        """
+        Test the summary view and each page of the same boards get
+        their own ETag, so one's ETag never gets a 304 for another.
+        """
+
+        self._create_board(client, "Test Board Name 1", [])
+        self._create_board(client, "Test Board Name 2", [])
+        headers = {"Authorization": f"Bearer {self.jwt_token}"}
+
+        urls = [
+            "/api/list_boards",
+            "/api/list_boards?view=summary",
+            "/api/list_boards?limit=5",
+            "/api/list_boards?limit=5&view=summary"
+        ]
+        etags = [client.get(url, headers=headers).headers["ETag"] for url in urls]
+        self.assertEqual(len(set(etags)), len(urls))
+
+        res = client.get(urls[1], headers={**headers, "If-None-Match": etags[0]})
+        self.assertEqual(res.status_code, 200)
+
+        res = client.get(urls[1], headers={**headers, "If-None-Match": etags[1]})
+        self.assertEqual(res.status_code, 304)
+
+    def test_update_board_columns_if_match(self, app, client):
+        """
+        Test a write with the board's current ETag in If-Match succeeds,
+        and a write with a stale one is refused with 412 and the
+        current revision.
+        """
+        board = self._create_board(client, "Test Board Name", [
+            {"name": "Test Column 1", "tasks": []}
+        ])
+        board_id = board["_id"].get("$oid")
+
+        res = client.get(
+            f"/api/get_board/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+        etag = res.headers["ETag"]
+
+        res = client.patch(
+            f"/api/update_board_columns/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-Match": etag
+            },
+            data=json.dumps({"columns_to_add": [{"name": "Test Column 2", "tasks": []}]}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        new_etag = res.headers["ETag"]
+        self.assertNotEqual(new_etag, etag)
+
+        res = client.patch(
+            f"/api/update_board_columns/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-Match": etag
+            },
+            data=json.dumps({"columns_to_remove": ["Test Column 1"]}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 412)
+        self.assertEqual(res.headers["ETag"], new_etag)
+        self.assertEqual(
+            json.loads(res.data)["revision"], board["revision"] + 1)
+
+        board = Board.find_board_by_id(board_id)
+        self.assertEqual(len(board["columns"]), 2)
+
+    def test_update_board_columns_minimal_response(self, app, client):
+        """
+        Test Prefer: return=minimal returns only the columns added
+        or removed, and the board's new revision.
+        """
+        board = self._create_board(client, "Test Board Name", [
+            {"name": "Test Column 1", "tasks": []}
+        ])
+        board_id = board["_id"].get("$oid")
+
+        res = client.patch(
+            f"/api/update_board_columns/{board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "Prefer": "return=minimal"
+            },
+            data=json.dumps({"columns_to_add": [{"name": "Test Column 2", "tasks": []}]}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["Preference-Applied"], "return=minimal")
+        self.assertIn("Prefer", res.headers["Vary"])
+
+        data = json.loads(res.data)
+        self.assertEqual(data["revision"], board["revision"] + 1)
+        self.assertEqual(len(data["columns_added"]), 1)
+        self.assertEqual(data["columns_added"][0]["name"], "Test Column 2")
+        self.assertIn("_id", data["columns_added"][0])
+        self.assertNotIn("columns", data)
+
+        res = client.patch(
+            f"/api/update_board_columns/{board_id}?response=delta",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({"columns_to_remove": ["Test Column 1"]}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(data["revision"], board["revision"] + 2)
+        self.assertEqual(data["columns_removed"], ["Test Column 1"])
+
     def tearDown(self, app, client):
         mongo.db.users.delete_many({})
         mongo.db.boards.delete_many({})
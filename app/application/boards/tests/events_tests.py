@@ -0,0 +1,240 @@
+from application import create_app
+from application.config import TestConfig
+from application.test_helpers import client_post_helper
+from application.database import mongo
+from application.boards.events import board_events, change_stream_pipeline
+from application.boards.models import Board
+import flask_unittest
+
+import json
+from unittest.mock import patch
+
+from bson.objectid import ObjectId
+
+
+class LocalEventsConfig(TestConfig):
+    BOARD_EVENTS_BACKEND = "local"
+    BOARD_EVENTS_HEARTBEAT = 1
+
+
+class BoardEventsTests(flask_unittest.AppClientTestCase):
+    """
+    Tests for the board events stream,
+    using the in-process pub/sub backend.
+    """
+
+    def create_app(self):
+        app = create_app(LocalEventsConfig)
+        yield app
+
+    def setUp(self, app, client):
+        payload = {
+            "username": "Test User",
+            "email": "test14@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, '/register', payload)
+
+        login_res = client_post_helper(client, '/login', {
+            "email": payload["email"],
+            "password": payload["password"]
+        })
+
+        self.assertEqual(login_res.status_code, 200)
+        self.jwt_token = json.loads(login_res.data)["token"]
+
+        res = client.post(
+            "api/create_board/",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({
+                "name": "Test Board Name",
+                "columns": [
+                    {"name": "Test Column One", "tasks": []},
+                    {"name": "Test Column Two", "tasks": []}
+                ]
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 201)
+        self.board = json.loads(res.data)
+        self.board_id = self.board["_id"].get("$oid")
+
+    def _open_stream(self, client, headers=None):
+        res = client.get(
+            f"/api/boards/{self.board_id}/events",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                **(headers or {})
+            }
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "text/event-stream")
+        return res, iter(res.response)
+
+    def _read_message(self, stream):
+        message = next(stream).decode()
+        fields = {}
+        for line in message.strip().split("\n"):
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        return fields
+
+    def test_stream_task_added_and_moved(self, app, client):
+        """
+        Test writes to the board are pushed to the stream as compact
+        events, with the board's new revision as the event ID.
+        """
+        res, stream = self._open_stream(client)
+        self.assertTrue(next(stream).startswith(b"retry: "))
+
+        add_res = client.post(
+            f"/api/add_task/{self.board_id}/Test Column One",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "status": "Test Column One",
+                "subtasks": []
+            }),
+            content_type="application/json"
+        )
+        self.assertEqual(add_res.status_code, 200)
+        task_id = json.loads(add_res.data)["columns"][0]["tasks"][0]["_id"].get("$oid")
+
+        message = self._read_message(stream)
+        self.assertEqual(message["event"], "task_added")
+        self.assertEqual(message["id"], str(self.board["revision"] + 1))
+        data = json.loads(message["data"])
+        self.assertEqual(data["column"], "Test Column One")
+        self.assertEqual(data["task"]["title"], "Test Task Title")
+
+        client.patch(
+            f"/api/update_task/{self.board_id}/Test Column One/{task_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "status": "Test Column Two",
+                "subtasks": []
+            }),
+            content_type="application/json"
+        )
+
+        message = self._read_message(stream)
+        self.assertEqual(message["event"], "task_moved")
+        data = json.loads(message["data"])
+        self.assertEqual(data["task_id"].get("$oid"), task_id)
+        self.assertEqual(data["from"], "Test Column One")
+        self.assertEqual(data["to"], "Test Column Two")
+        self.assertEqual(data["revision"], self.board["revision"] + 2)
+
+        client.patch(
+            f"/api/update_board_columns/{self.board_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({"columns_to_remove": ["Test Column One"]}),
+            content_type="application/json"
+        )
+
+        message = self._read_message(stream)
+        self.assertEqual(message["event"], "columns_removed")
+        self.assertEqual(json.loads(message["data"])["names"], ["Test Column One"])
+
+        res.close()
+        self.assertNotIn(self.board_id, board_events._subscribers)
+
+    def test_stream_heartbeat_and_resync(self, app, client):
+        """
+        Test an idle stream sends heartbeats, and a client reconnecting
+        with an out of date Last-Event-ID is told to resync.
+        """
+        res, stream = self._open_stream(client, {"Last-Event-ID": "0"})
+        next(stream)
+
+        message = self._read_message(stream)
+        self.assertEqual(message["event"], "resync")
+        self.assertEqual(message["id"], str(self.board["revision"]))
+
+        self.assertEqual(next(stream), b": heartbeat\n\n")
+        res.close()
+
+    def test_stream_limit(self, app, client):
+        """
+        Test a stream beyond BOARD_EVENTS_MAX_STREAMS is refused with
+        503, and one can be opened again once another is closed.
+        """
+        with patch.object(board_events, "max_streams", 1):
+            res, _ = self._open_stream(client)
+
+            refused = client.get(
+                f"/api/boards/{self.board_id}/events",
+                headers={"Authorization": f"Bearer {self.jwt_token}"}
+            )
+            self.assertEqual(refused.status_code, 503)
+            self.assertEqual(refused.headers["Retry-After"], "1")
+
+            res.close()
+            res, _ = self._open_stream(client)
+            res.close()
+
+    def test_stream_resync_on_import(self, app, client):
+        """Test importing tasks into the board tells subscribers to resync."""
+        res, stream = self._open_stream(client)
+        next(stream)
+
+        column_id = ObjectId(self.board["columns"][0]["_id"]["$oid"])
+        with app.app_context():
+            Board.import_tasks(self.board_id, column_id, [
+                {"_id": ObjectId(), "title": "Test Task", "description": "", "subtasks": []}
+            ])
+
+        message = self._read_message(stream)
+        self.assertEqual(message["event"], "resync")
+        self.assertEqual(message["id"], str(self.board["revision"] + 1))
+        res.close()
+
+    def test_change_stream_matches_subscribed_boards(self, app, client):
+        """
+        Test the change stream matches only the boards with subscribers,
+        and is reopened when a board gains its first or loses its last.
+        """
+        board_events._boards_changed.clear()
+        first = board_events.subscribe(self.board_id)
+        self.assertTrue(board_events._boards_changed.is_set())
+
+        board_events._boards_changed.clear()
+        second = board_events.subscribe(self.board_id)
+        self.assertFalse(board_events._boards_changed.is_set())
+
+        self.assertEqual(
+            change_stream_pipeline(list(board_events._subscribers))[0],
+            {"$match": {"documentKey._id": {"$in": [ObjectId(self.board_id)]}}}
+        )
+
+        second.close()
+        self.assertFalse(board_events._boards_changed.is_set())
+        first.close()
+        self.assertTrue(board_events._boards_changed.is_set())
+
+    def test_stream_board_not_found_error(self, app, client):
+        res = client.get(
+            "/api/boards/5f1d7f1f1f1f1f1f1f1f1f1f/events",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            }
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+    def tearDown(self, app, client):
+        mongo.db.users.delete_many({})
+        mongo.db.boards.delete_many({})
@@ -1,7 +1,9 @@
 from application import create_app
-from application.test_helpers import client_post_helper
+from application.config import TestConfig
+from application.test_helpers import client_post_helper, CommandCounter
 from application.database import mongo
 import flask_unittest
+from pymongo import monitoring
 
 
 from application.boards.models import Board
@@ -11,10 +13,18 @@ from bson.objectid import ObjectId
 from application.helpers import parse_json
 
 
+command_counter = CommandCounter()
+monitoring.register(command_counter)
+
+
 class TaskAPITests(flask_unittest.AppClientTestCase):
 
+    # Whether to check how many commands a request sends; the counts
+    # are those of the embedded layout.
+    count_commands = True
+
     def create_app(self):
-        app = create_app()
+        app = create_app(TestConfig)
         yield app
     
     def setUp(self, app, client):
@@ -69,6 +79,8 @@ class TaskAPITests(flask_unittest.AppClientTestCase):
         self.board_id = data["_id"].get("$oid")
         self.test_column_1 = data["columns"][0]["name"]
         self.test_column_2 = data["columns"][1]["name"]
+        self.test_column_1_id = data["columns"][0]["_id"]["$oid"]
+        self.test_column_2_id = data["columns"][1]["_id"]["$oid"]
     
     def test_add_task_no_subtasks(self, app, client):
         """
@@ -620,6 +632,806 @@ class TaskAPITests(flask_unittest.AppClientTestCase):
 
 
 
+    def test_update_task_add_remove_rename_and_move(self, app, client):
+        """
+        Test adding, removing and renaming subtasks while moving the task
+        to another column is applied in a single request.
+        """
+        subtasks = [
+            {
+                "title": "Test Subtask Title 1",
+                "isCompleted": False,
+            },
+            {
+                "title": "Test Subtask Title 2",
+                "isCompleted": False
+            },
+            {
+                "title": "Test Subtask Title 3",
+                "isCompleted": False
+            }
+        ]
+
+        payload = {
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": subtasks
+        }
+
+        res = client.post(
+            f"/api/add_task/{self.board_id}/{self.test_column_1}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps(payload),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+        data = json.loads(res.data)
+        task_id = data["columns"][0]["tasks"][0]["_id"].get("$oid")
+
+        current_subtasks = Board.get_task(self.board_id, self.test_column_1, task_id)[0]["subtasks"]
+
+        # Keep and rename the first subtask, drop the others and add a new one.
+        patched_subtasks = current_subtasks[:1]
+        patched_subtasks[0]["title"] = "New Subtask Title"
+        patched_subtasks.append({
+            "title": "Test Subtask Title 4",
+            "isCompleted": False
+        })
+
+        patch_payload = {
+            "title": "New Task Title",
+            "description": "New Task Description",
+            "status": self.test_column_2,
+            "subtasks": patched_subtasks
+        }
+
+        res = client.patch(
+            f"/api/update_task/{self.board_id}/{self.test_column_1}/{task_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps(parse_json(patch_payload)),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+        data = json.loads(res.data)
+        self.assertEqual(len(data["columns"][0]["tasks"]), 0)
+        self.assertEqual(len(data["columns"][1]["tasks"]), 1)
+
+        task = data["columns"][1]["tasks"][0]
+        self.assertEqual(task["_id"].get("$oid"), task_id)
+        self.assertEqual(task["title"], patch_payload["title"])
+        self.assertEqual(task["description"], patch_payload["description"])
+        self.assertEqual(task["status"], self.test_column_2)
+        self.assertEqual(len(task["subtasks"]), 2)
+        self.assertEqual(task["subtasks"][0]["title"], "New Subtask Title")
+        self.assertEqual(task["subtasks"][1]["title"], "Test Subtask Title 4")
+        self.assertIn("_id", task["subtasks"][1])
+
+    def test_update_task_unknown_task_error(self, app, client):
+        """Test updating a task that does not exist returns an error."""
+
+        payload = {
+            "title": "New Task Title",
+            "description": "New Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+
+        res = client.patch(
+            f"/api/update_task/{self.board_id}/{self.test_column_1}/{ObjectId()}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps(payload),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_update_subtask_titles_single_write(self, app, client):
+        """
+        Test renaming subtasks costs one DB call,
+        however many subtasks are renamed.
+        """
+        for subtask_count in (1, 10, 30):
+            payload = {
+                "title": f"Test Task With {subtask_count} Subtasks",
+                "description": "Test Task Description",
+                "status": self.test_column_1,
+                "subtasks": [
+                    {
+                        "title": f"Test Subtask Title {i}",
+                        "isCompleted": False
+                    }
+                    for i in range(subtask_count)
+                ]
+            }
+
+            res = client.post(
+                f"/api/add_task/{self.board_id}/{self.test_column_1}",
+                headers={
+                    "Authorization": f"Bearer {self.jwt_token}"
+                },
+                data=json.dumps(payload),
+                content_type="application/json"
+            )
+
+            self.assertEqual(res.status_code, 200)
+
+            data = json.loads(res.data)
+            task = data["columns"][0]["tasks"][-1]
+            task_id = task["_id"].get("$oid")
+
+            subtasks_to_update = task["subtasks"]
+            for subtask in subtasks_to_update:
+                subtask["title"] = subtask["title"].replace("Test", "New")
+
+            command_counter.reset()
+            updated_board = Board.update_subtask_title(
+                self.board_id, self.test_column_1, task_id, subtasks_to_update)
+
+            if self.count_commands:
+                self.assertEqual(command_counter.count, 1)
+
+            updated_task = updated_board["columns"][0]["tasks"][-1]
+            self.assertEqual(len(updated_task["subtasks"]), subtask_count)
+            for i, subtask in enumerate(updated_task["subtasks"]):
+                self.assertEqual(subtask["title"], f"New Subtask Title {i}")
+
+    def test_update_task_stale_if_match_error(self, app, client):
+        """
+        Test updating a task with a stale If-Match is refused with 412,
+        leaves the task untouched, and succeeds once retried with the
+        ETag the 412 carries.
+        """
+        payload = {
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+
+        res = client.post(
+            f"/api/add_task/{self.board_id}/{self.test_column_1}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps(payload),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        task_id = data["columns"][0]["tasks"][0]["_id"].get("$oid")
+        stale_etag = f"{self.board_id}-{data['revision'] - 1}"
+
+        patch_payload = dict(payload, title="New Task Title")
+
+        res = client.patch(
+            f"/api/update_task/{self.board_id}/{self.test_column_1}/{task_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-Match": stale_etag
+            },
+            data=json.dumps(patch_payload),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 412)
+        self.assertEqual(json.loads(res.data)["revision"], data["revision"])
+
+        task = Board.get_task(self.board_id, self.test_column_1, task_id)[0]
+        self.assertEqual(task["title"], "Test Task Title")
+
+        res = client.patch(
+            f"/api/update_task/{self.board_id}/{self.test_column_1}/{task_id}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "If-Match": res.headers["ETag"]
+            },
+            data=json.dumps(patch_payload),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            json.loads(res.data)["columns"][0]["tasks"][0]["title"], "New Task Title")
+
+    def test_update_task_status_single_write(self, app, client):
+        """Test moving a task with update_task_status is one atomic write."""
+
+        task = {
+            "_id": ObjectId(),
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+        Board.add_task_to_column(self.board_id, self.test_column_1, task)
+        revision = Board.get_revision(self.board_id)
+
+        command_counter.reset()
+        updated_board = Board.update_task_status(
+            self.board_id, task["_id"], self.test_column_1,
+            self.test_column_2, task, revision=revision)
+
+        if self.count_commands:
+            self.assertEqual(command_counter.count, 1)
+        self.assertEqual(updated_board["revision"], revision + 1)
+        self.assertEqual(updated_board["columns"][0]["tasks"], [])
+        moved_task = updated_board["columns"][1]["tasks"][0]
+        self.assertEqual(moved_task["_id"], task["_id"])
+        self.assertEqual(moved_task["status"], self.test_column_2)
+
+    def test_add_task_single_round_trip(self, app, client):
+        """Test adding a task returns the board from the write itself."""
+
+        command_counter.reset()
+        res = client.post(
+            f"/api/add_task/{self.board_id}/{self.test_column_1}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "status": self.test_column_1,
+                "subtasks": []
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        if self.count_commands:
+            self.assertEqual(command_counter.commands, ["findAndModify"])
+        self.assertEqual(len(json.loads(res.data)["columns"]), 3)
+
+    def test_add_and_remove_task_minimal_response(self, app, client):
+        """
+        Test Prefer: return=minimal returns only the added or removed
+        task and the board's new revision.
+        """
+        res = client.post(
+            f"/api/add_task/{self.board_id}/{self.test_column_1}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "Prefer": "return=minimal"
+            },
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "status": self.test_column_1,
+                "subtasks": [{"title": "Test Subtask Title", "isCompleted": False}]
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["Preference-Applied"], "return=minimal")
+
+        data = json.loads(res.data)
+        self.assertEqual(set(data), {"_id", "revision", "column", "task"})
+        self.assertEqual(data["column"], self.test_column_1)
+        self.assertEqual(data["task"]["title"], "Test Task Title")
+        self.assertIn("_id", data["task"]["subtasks"][0])
+        self.assertEqual(res.headers["ETag"], f'"{self.board_id}-{data["revision"]}"')
+
+        task_id = data["task"]["_id"].get("$oid")
+
+        res = client.post(
+            f"/api/remove_task/{self.board_id}/{self.test_column_1}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                "Prefer": "return=minimal"
+            },
+            data=json.dumps({"task_id": task_id}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        removed = json.loads(res.data)
+        self.assertEqual(removed["task_id"].get("$oid"), task_id)
+        self.assertEqual(removed["revision"], data["revision"] + 1)
+        self.assertNotIn("columns", removed)
+
+    def test_update_task_delta_response(self, app, client):
+        """
+        Test ?response=delta returns only the updated task,
+        as it stands in the column it was moved to.
+        """
+        res = client.post(
+            f"/api/add_task/{self.board_id}/{self.test_column_1}",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "status": self.test_column_1,
+                "subtasks": [{"title": "Test Subtask Title", "isCompleted": False}]
+            }),
+            content_type="application/json"
+        )
+        task = json.loads(res.data)["columns"][0]["tasks"][0]
+        task_id = task["_id"].get("$oid")
+
+        command_counter.reset()
+        res = client.patch(
+            f"/api/update_task/{self.board_id}/{self.test_column_1}/{task_id}?response=delta",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}"
+            },
+            data=json.dumps({
+                "title": "New Task Title",
+                "description": "Test Task Description",
+                "status": self.test_column_2,
+                "subtasks": task["subtasks"] + [
+                    {"title": "New Subtask Title", "isCompleted": False}
+                ]
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        if self.count_commands:
+            self.assertEqual(command_counter.count, 1)
+        self.assertNotIn("Preference-Applied", res.headers)
+
+        data = json.loads(res.data)
+        self.assertNotIn("columns", data)
+        self.assertEqual(data["column"], self.test_column_2)
+        self.assertEqual(data["moved_from"], self.test_column_1)
+        self.assertEqual(data["task"]["_id"].get("$oid"), task_id)
+        self.assertEqual(data["task"]["title"], "New Task Title")
+        self.assertEqual(data["task"]["status"], self.test_column_2)
+        self.assertEqual(len(data["task"]["subtasks"]), 2)
+
+    def test_get_task_single_find(self, app, client):
+        """
+        Test get_task finds a task with one find, and returns
+        an empty list for a task or column that doesn't exist.
+        """
+        tasks = [
+            {
+                "_id": ObjectId(),
+                "title": f"Test Task Title {i}",
+                "description": "Test Task Description",
+                "status": self.test_column_2,
+                "subtasks": []
+            }
+            for i in range(5)
+        ]
+        for task in tasks:
+            Board.add_task_to_column(self.board_id, self.test_column_2, task)
+
+        command_counter.reset()
+        found = Board.get_task(self.board_id, self.test_column_2, tasks[3]["_id"])
+
+        if self.count_commands:
+            self.assertEqual(command_counter.commands, ["find"])
+        self.assertEqual(found, [tasks[3]])
+
+        self.assertEqual(
+            Board.get_task(self.board_id, self.test_column_1, tasks[3]["_id"]), [])
+        self.assertEqual(
+            Board.get_task(self.board_id, "Unknown Column", tasks[3]["_id"]), [])
+        self.assertEqual(
+            Board.get_task(self.board_id, self.test_column_2, ObjectId()), [])
+
+    def test_task_routes_by_column_id(self, app, client):
+        """
+        Test adding, moving and removing a task with its column
+        referenced by column ID rather than column name.
+        """
+        headers = {"Authorization": f"Bearer {self.jwt_token}"}
+        tasks_url = f"/api/boards/{self.board_id}/columns/{self.test_column_1_id}/tasks"
+
+        res = client.post(
+            tasks_url,
+            headers=headers,
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "status": self.test_column_1,
+                "subtasks": []
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        task_id = data["columns"][0]["tasks"][0]["_id"]["$oid"]
+
+        res = client.patch(
+            f"{tasks_url}/{task_id}",
+            headers=headers,
+            data=json.dumps({
+                "title": "Test Task Title",
+                "description": "Test Task Description",
+                "column_id": self.test_column_2_id,
+                "subtasks": []
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(data["columns"][0]["tasks"], [])
+        self.assertEqual(data["columns"][1]["tasks"][0]["_id"]["$oid"], task_id)
+        self.assertEqual(data["columns"][1]["tasks"][0]["status"], self.test_column_2)
+
+        res = client.delete(
+            f"/api/boards/{self.board_id}/columns/{self.test_column_2_id}/tasks/{task_id}",
+            headers=headers
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(data["columns"][1]["tasks"], [])
+
+        res = client.post(
+            f"/api/boards/{self.board_id}/columns/not-an-id/tasks",
+            headers=headers,
+            data=json.dumps({"title": "", "description": "", "subtasks": []}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_rename_column(self, app, client):
+        """
+        Test renaming a column by ID renames the column and the status
+        of each of its tasks, and refuses a name already in use.
+        """
+        task = {
+            "_id": ObjectId(),
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+        Board.add_task_to_column(self.board_id, self.test_column_1, task)
+
+        headers = {"Authorization": f"Bearer {self.jwt_token}"}
+        column_url = f"/api/boards/{self.board_id}/columns/{self.test_column_1_id}"
+
+        res = client.patch(
+            column_url,
+            headers=headers,
+            data=json.dumps({"name": "Renamed Column"}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(data["columns"][0]["name"], "Renamed Column")
+        self.assertEqual(data["columns"][0]["tasks"][0]["status"], "Renamed Column")
+        self.assertEqual(
+            Board.get_task(self.board_id, "Renamed Column", task["_id"])[0]["status"],
+            "Renamed Column")
+
+        res = client.patch(
+            column_url,
+            headers=headers,
+            data=json.dumps({"name": self.test_column_2}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+    def _stored_tasks(self):
+        """The board's task documents as stored, in either layout."""
+        if Board.task_collection is not None:
+            return list(mongo.db.tasks.find({"board_id": ObjectId(self.board_id)}))
+        board = mongo.db.boards.find_one({"_id": ObjectId(self.board_id)})
+        return [task for column in board["columns"] for task in column.get("tasks", [])]
+
+    def test_rename_column_leaves_tasks(self, app, client):
+        """
+        Test renaming a column writes no task: each task's status is
+        the name of its column when read, in boards, single tasks and
+        exports alike.
+        """
+        task = {
+            "_id": ObjectId(),
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+        Board.add_task_to_column(self.board_id, self.test_column_1, task)
+        stored = self._stored_tasks()
+
+        command_counter.reset()
+        Board.rename_column(self.board_id, ObjectId(self.test_column_1_id), "Renamed Column")
+
+        self.assertNotIn("update", command_counter.commands)
+        self.assertEqual(self._stored_tasks(), stored)
+        board = Board.get_board(self.board_id)
+        self.assertEqual(board["columns"][0]["tasks"][0]["status"], "Renamed Column")
+        self.assertEqual(
+            Board.get_task(self.board_id, "Renamed Column", task["_id"])[0]["status"],
+            "Renamed Column")
+        self.assertEqual(
+            [t["status"] for t in Board.export_tasks(self.board_id, 10)], ["Renamed Column"])
+
+        Board.update_task_status(
+            self.board_id, task["_id"], "Renamed Column", self.test_column_2,
+            dict(task, status="Renamed Column"))
+        board = Board.get_board(self.board_id)
+        self.assertEqual(board["columns"][1]["tasks"][0]["status"], self.test_column_2)
+
+    def _post_batch(self, client, operations, headers=None):
+        return client.post(
+            f"/api/boards/{self.board_id}/tasks:batch",
+            headers={
+                "Authorization": f"Bearer {self.jwt_token}",
+                **(headers or {})
+            },
+            data=json.dumps({"operations": operations}),
+            content_type="application/json"
+        )
+
+    def test_task_batch(self, app, client):
+        """
+        Test a batch creating, updating, moving and deleting tasks is
+        applied in order and reports each operation and the final revision.
+        """
+        task = {
+            "_id": ObjectId(),
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+        Board.add_task_to_column(self.board_id, self.test_column_1, task)
+        revision = Board.get_revision(self.board_id)
+        task_id = {"$oid": str(task["_id"])}
+
+        res = self._post_batch(client, [
+            {
+                "op": "create",
+                "column": self.test_column_1,
+                "task": {
+                    "title": "Test Batch Task",
+                    "description": "",
+                    "status": self.test_column_1,
+                    "subtasks": [{"title": "Test Subtask", "isCompleted": False}]
+                }
+            },
+            {
+                "op": "update",
+                "column": self.test_column_1,
+                "task_id": task_id,
+                "task": {"title": "Renamed Task", "description": "", "subtasks": []}
+            },
+            {
+                "op": "move",
+                "column": self.test_column_1,
+                "task_id": task_id,
+                "to": {"$oid": self.test_column_2_id}
+            },
+            {"op": "delete", "column": self.test_column_2, "task_id": task_id}
+        ])
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(data["revision"], revision + 4)
+        self.assertEqual(res.headers["ETag"], f'"{self.board_id}-{revision + 4}"')
+        self.assertEqual([r["status"] for r in data["results"]], ["applied"] * 4)
+        new_task_id = data["results"][0]["task"]["_id"]
+
+        board = Board.get_board(self.board_id)
+        self.assertEqual(
+            [t["_id"] for t in board["columns"][0]["tasks"]],
+            [ObjectId(new_task_id["$oid"])])
+        self.assertEqual(board["columns"][1]["tasks"], [])
+
+    def test_task_batch_single_bulk_write(self, app, client):
+        """Test a conditional batch is sent as a single write command."""
+        revision = Board.get_revision(self.board_id)
+        operations = [
+            {
+                "op": "create",
+                "column": self.test_column_1,
+                "task": {"title": f"Test Task {i}", "description": "", "subtasks": []}
+            }
+            for i in range(20)
+        ]
+
+        command_counter.reset()
+        res = self._post_batch(
+            client, operations, {"If-Match": f'"{self.board_id}-{revision}"'})
+
+        self.assertEqual(res.status_code, 200)
+        if self.count_commands:
+            self.assertEqual(command_counter.commands, ["update"])
+        self.assertEqual(json.loads(res.data)["revision"], revision + 20)
+
+    def test_task_batch_stops_at_failed_operation(self, app, client):
+        """
+        Test the operations after one whose task doesn't exist are
+        skipped, and those before it stay applied.
+        """
+        revision = Board.get_revision(self.board_id)
+        res = self._post_batch(client, [
+            {
+                "op": "create",
+                "column": self.test_column_1,
+                "task": {"title": "Test Task", "description": "", "subtasks": []}
+            },
+            {
+                "op": "update",
+                "column": self.test_column_1,
+                "task_id": str(ObjectId()),
+                "task": {"title": "Test Task", "description": "", "subtasks": []}
+            },
+            {
+                "op": "create",
+                "column": self.test_column_1,
+                "task": {"title": "Test Task", "description": "", "subtasks": []}
+            }
+        ])
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual(
+            [r["status"] for r in data["results"]], ["applied", "failed", "skipped"])
+        self.assertEqual(data["revision"], revision + 1)
+        self.assertEqual(data["revision"], Board.get_revision(self.board_id))
+        self.assertEqual(len(Board.get_board(self.board_id)["columns"][0]["tasks"]), 1)
+
+    def test_task_batch_applies_in_order(self, app, client):
+        """
+        Test an operation can't apply once one before it has matched
+        nothing, even when the board has moved on to the revision it
+        expects: a batch conditional on a stale revision applies none
+        of its operations.
+        """
+        create = {
+            "op": "create",
+            "column": self.test_column_1,
+            "task": {"title": "Test Task", "description": "", "subtasks": []}
+        }
+        revision = Board.get_revision(self.board_id)
+        Board.add_task_to_column(
+            self.board_id, self.test_column_2, dict(create["task"], _id=ObjectId()))
+
+        res = self._post_batch(
+            client, [create, create], {"If-Match": f'"{self.board_id}-{revision}"'})
+
+        self.assertEqual(res.status_code, 412)
+        self.assertEqual(Board.get_revision(self.board_id), revision + 1)
+        self.assertEqual(Board.get_board(self.board_id)["columns"][0]["tasks"], [])
+
+    def test_task_batch_mixed_column_forms(self, app, client):
+        """
+        Test a move or update naming its column by name and its target
+        by _id (or the other way round) is compared by _id: a target
+        that is the task's own column leaves the task where it is.
+        """
+        task = {
+            "_id": ObjectId(),
+            "title": "Test Task Title",
+            "description": "Test Task Description",
+            "status": self.test_column_1,
+            "subtasks": []
+        }
+        Board.add_task_to_column(self.board_id, self.test_column_1, task)
+        task_id = {"$oid": str(task["_id"])}
+
+        res = self._post_batch(client, [
+            {
+                "op": "move",
+                "column": self.test_column_1,
+                "task_id": task_id,
+                "to": {"$oid": self.test_column_1_id}
+            },
+            {
+                "op": "update",
+                "column": {"$oid": self.test_column_1_id},
+                "task_id": task_id,
+                "task": {
+                    "title": "Renamed Task",
+                    "description": "",
+                    "status": self.test_column_1,
+                    "subtasks": []
+                }
+            }
+        ])
+
+        self.assertEqual(res.status_code, 200)
+        data = json.loads(res.data)
+        self.assertEqual([r["status"] for r in data["results"]], ["applied"] * 2)
+
+        board = Board.get_board(self.board_id)
+        self.assertEqual(
+            [t["title"] for t in board["columns"][0]["tasks"]], ["Renamed Task"])
+        self.assertEqual(board["columns"][1]["tasks"], [])
+
+        res = self._post_batch(client, [{
+            "op": "move",
+            "column": {"$oid": self.test_column_1_id},
+            "task_id": task_id,
+            "to": self.test_column_2
+        }])
+
+        self.assertEqual(res.status_code, 200)
+        board = Board.get_board(self.board_id)
+        self.assertEqual(board["columns"][0]["tasks"], [])
+        self.assertEqual(
+            [t["_id"] for t in board["columns"][1]["tasks"]], [task["_id"]])
+
+    def test_task_batch_errors(self, app, client):
+        """Test malformed batches and stale If-Match revisions are refused."""
+        create = {
+            "op": "create",
+            "column": self.test_column_1,
+            "task": {"title": "Test Task", "description": "", "subtasks": []}
+        }
+
+        res = self._post_batch(client, [create, {"op": "rename"}])
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Operation 1", json.loads(res.data)["msg"])
+
+        res = self._post_batch(client, [])
+        self.assertEqual(res.status_code, 400)
+
+        revision = Board.get_revision(self.board_id)
+        Board.add_task_to_column(self.board_id, self.test_column_1, dict(create["task"], _id=ObjectId()))
+
+        res = self._post_batch(
+            client, [create], {"If-Match": f'"{self.board_id}-{revision}"'})
+        self.assertEqual(res.status_code, 412)
+        self.assertEqual(len(Board.get_board(self.board_id)["columns"][0]["tasks"]), 1)
+
+    def test_missing_task_leaves_board_unchanged(self, app, client):
+        """
+        Test writes to a task that doesn't exist find nothing, and
+        neither bump the board's revision nor record an event.
+        """
+        headers = {"Authorization": f"Bearer {self.jwt_token}"}
+        missing_id = str(ObjectId())
+        board = mongo.db.boards.find_one({"_id": ObjectId(self.board_id)})
+
+        res = client.patch(
+            f"/api/update_task/{self.board_id}/{self.test_column_1}/{missing_id}",
+            headers=headers,
+            data=json.dumps({
+                "title": "Test Task",
+                "description": "",
+                "status": self.test_column_2,
+                "subtasks": []
+            }),
+            content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 400)
+
+        res = client.post(
+            f"/api/remove_task/{self.board_id}/{self.test_column_1}",
+            headers=headers,
+            data=json.dumps({"task_id": missing_id}),
+            content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 400)
+
+        self.assertIsNone(Board.update_task_meta(
+            self.board_id, self.test_column_1, missing_id, "Test Task", ""))
+        self.assertIsNone(Board.update_task_status(
+            self.board_id, missing_id, self.test_column_1, self.test_column_2, {}))
+
+        after = mongo.db.boards.find_one({"_id": ObjectId(self.board_id)})
+        self.assertEqual(after.get("revision"), board.get("revision"))
+        self.assertEqual(after.get("last_event"), board.get("last_event"))
+
     def test_add_task_unauthorized_user_error(self, app, client):
         pass
 
@@ -0,0 +1,254 @@
+from application import create_app
+from application.config import TestConfig
+from application.test_helpers import client_post_helper
+from application.database import mongo
+from application.boards.models import Board
+import flask_unittest
+
+import gc
+import json
+import tempfile
+import tracemalloc
+from bson.objectid import ObjectId
+
+
+class BoardTransferTests(flask_unittest.AppClientTestCase):
+    """Tests for the NDJSON board export and import."""
+
+    # Tasks per board of the large imports, whose boards each hold the
+    # same number so the store's work per board is the same. The memory
+    # store scans a collection for every query, so it gets fewer.
+    LARGE_IMPORT_BOARD_TASKS = 2000 if TestConfig.MONGO_BACKEND == "memory" else 10000
+
+    def create_app(self):
+        app = create_app(TestConfig)
+        yield app
+
+    def setUp(self, app, client):
+        payload = {
+            "username": "Test User",
+            "email": "test15@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, '/register', payload)
+
+        login_res = client_post_helper(client, '/login', {
+            "email": payload["email"],
+            "password": payload["password"]
+        })
+
+        self.assertEqual(login_res.status_code, 200)
+        self.jwt_token = json.loads(login_res.data)["token"]
+        self.headers = {"Authorization": f"Bearer {self.jwt_token}"}
+
+    def _create_board(self, client, name):
+        res = client.post(
+            "api/create_board/",
+            headers=self.headers,
+            data=json.dumps({
+                "name": name,
+                "columns": [
+                    {"name": "Test Column One", "tasks": []},
+                    {"name": "Test Column Two", "tasks": []}
+                ]
+            }),
+            content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 201)
+        return json.loads(res.data)["_id"]["$oid"]
+
+    def _add_task(self, client, board_id, column, title):
+        res = client.post(
+            f"/api/add_task/{board_id}/{column}",
+            headers=self.headers,
+            data=json.dumps({
+                "title": title,
+                "description": "Test Task Description",
+                "status": column,
+                "subtasks": [{"title": "Test Subtask", "isCompleted": False}]
+            }),
+            content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 200)
+
+    def _export(self, client):
+        res = client.get("/api/export", headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        return [json.loads(line) for line in res.data.decode().splitlines()]
+
+    def _import(self, client, body):
+        return client.post(
+            "/api/import",
+            headers=self.headers,
+            data=body,
+            content_type="application/x-ndjson"
+        )
+
+    def _list_boards(self, client):
+        res = client.get("/api/list_boards", headers=self.headers)
+        return json.loads(res.data)
+
+    def test_export_import_round_trip(self, app, client):
+        """
+        Test an export lists each board, then its columns, then its tasks,
+        and importing it recreates the boards under new IDs.
+        """
+        board_id = self._create_board(client, "Test Board One")
+        self._add_task(client, board_id, "Test Column One", "Test Task One")
+        self._add_task(client, board_id, "Test Column Two", "Test Task Two")
+        self._add_task(client, board_id, "Test Column Two", "Test Task Three")
+        self._create_board(client, "Test Board Two")
+
+        records = self._export(client)
+
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["board", "column", "column", "task", "task", "task",
+             "board", "column", "column"]
+        )
+        self.assertEqual(records[3]["title"], "Test Task One")
+        self.assertEqual(records[3]["column_id"], records[1]["_id"])
+        self.assertEqual(records[3]["subtasks"][0]["title"], "Test Subtask")
+
+        res = self._import(client, "".join(json.dumps(r) + "\n" for r in records))
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(json.loads(res.data), {"boards": 2, "tasks": 3})
+
+        boards = self._list_boards(client)
+        self.assertEqual(len(boards), 4)
+        original, imported = boards[0], boards[2]
+        self.assertNotEqual(original["_id"], imported["_id"])
+        self.assertEqual(imported["name"], original["name"])
+        self.assertEqual(
+            [[task["title"] for task in column["tasks"]] for column in imported["columns"]],
+            [["Test Task One"], ["Test Task Two", "Test Task Three"]]
+        )
+        self.assertEqual(imported["columns"][1]["tasks"][0]["status"], "Test Column Two")
+
+    def test_import_bad_line_error(self, app, client):
+        """
+        Test an import stops at a line it can't read, naming the line,
+        and keeps the records before it.
+        """
+        board_id = str(ObjectId())
+        lines = [
+            {"type": "board", "_id": {"$oid": board_id}, "name": "Test Board"},
+            {"type": "task", "board_id": {"$oid": board_id},
+             "column_id": {"$oid": str(ObjectId())}, "title": "Test Task"}
+        ]
+
+        res = self._import(client, "".join(json.dumps(line) + "\n" for line in lines))
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Line 2", json.loads(res.data)["msg"])
+        self.assertEqual(len(self._list_boards(client)), 1)
+
+        res = self._import(client, "not json\n")
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Line 1", json.loads(res.data)["msg"])
+
+    def _stored_task_count(self):
+        if Board.task_collection is not None:
+            return mongo.db.tasks.count_documents({})
+        counts = mongo.db.boards.aggregate([
+            {"$unwind": "$columns"},
+            {"$group": {"_id": None, "tasks": {"$sum": {"$size": "$columns.tasks"}}}}
+        ])
+        return next(counts, {"tasks": 0})["tasks"]
+
+    def _large_import_peak(self, client, board_count):
+        """
+        Import board_count boards of LARGE_IMPORT_BOARD_TASKS tasks
+        from a file, and return the peak memory
+        the request worked in: the peak allocated while it ran, less
+        what is still allocated after it, which is the documents the
+        memory store keeps in this process (nothing with a real mongod).
+        """
+        with tempfile.TemporaryFile("w+b") as body:
+            for b in range(board_count):
+                board_id = {"$oid": str(ObjectId())}
+                column_id = {"$oid": str(ObjectId())}
+                body.write((json.dumps(
+                    {"type": "board", "_id": board_id, "name": f"Board {b}"}) + "\n").encode())
+                body.write((json.dumps(
+                    {"type": "column", "board_id": board_id, "_id": column_id,
+                     "name": "Todo"}) + "\n").encode())
+                for t in range(self.LARGE_IMPORT_BOARD_TASKS):
+                    body.write((json.dumps({
+                        "type": "task",
+                        "board_id": board_id,
+                        "column_id": column_id,
+                        "_id": {"$oid": str(ObjectId())},
+                        "title": f"Task {t}",
+                        "description": "",
+                        "status": "Todo",
+                        "subtasks": []
+                    }) + "\n").encode())
+
+            size = body.tell()
+            body.seek(0)
+
+            stored_before = self._stored_task_count()
+            tracemalloc.start()
+            res = client.post(
+                "/api/import",
+                headers={**self.headers, "Content-Length": str(size)},
+                input_stream=body,
+                content_type="application/x-ndjson"
+            )
+            gc.collect()
+            kept, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.assertEqual(res.status_code, 201)
+        imported = self.LARGE_IMPORT_BOARD_TASKS * board_count
+        self.assertEqual(json.loads(res.data)["tasks"], imported)
+        self.assertEqual(self._stored_task_count() - stored_before, imported)
+        return peak - kept, size
+
+    def test_import_memory_independent_of_size(self, app, client):
+        """
+        Test importing ten boards of tasks (100k with a real mongod)
+        stores them all, and peaks at about the memory of importing one,
+        well under the size of the import.
+        """
+        if Board.task_collection is None and app.config["MONGO_BACKEND"] == "memory":
+            self.skipTest("The memory store copies the whole board on each embedded $push.")
+        small_peak, _ = self._large_import_peak(client, 1)
+        peak, size = self._large_import_peak(client, 10)
+
+        self.assertLess(peak, small_peak * 2)
+        self.assertLess(peak, size / 4)
+
+    def test_import_embedded_board_size_limit(self, app, client):
+        """
+        Test an import is refused at the task that takes an embedded
+        board's tasks over IMPORT_EMBEDDED_BOARD_MAX_BYTES, keeping the
+        tasks before it.
+        """
+        app.config["IMPORT_EMBEDDED_BOARD_MAX_BYTES"] = 1024
+        board_id = {"$oid": str(ObjectId())}
+        column_id = {"$oid": str(ObjectId())}
+        lines = [
+            {"type": "board", "_id": board_id, "name": "Test Board"},
+            {"type": "column", "board_id": board_id, "_id": column_id, "name": "Todo"}
+        ] + [
+            {"type": "task", "board_id": board_id, "column_id": column_id,
+             "_id": {"$oid": str(ObjectId())}, "title": f"Test Task {t}",
+             "description": "x" * 200, "status": "Todo", "subtasks": []}
+            for t in range(10)
+        ]
+
+        res = self._import(client, "".join(json.dumps(line) + "\n" for line in lines))
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Line 6", json.loads(res.data)["msg"])
+        self.assertEqual(self._stored_task_count(), 3)
+
+    def tearDown(self, app, client):
+        mongo.db.users.delete_many({})
+        mongo.db.boards.delete_many({})
+        mongo.db.tasks.delete_many({})
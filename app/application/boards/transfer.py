@@ -0,0 +1,179 @@
+"""
+Streaming board export and import.
+
+A user's boards are exported as newline-delimited JSON, one record
+per line, each board followed by its columns and then its tasks:
+
+    {"type": "board", "_id": ..., "name": ...}
+    {"type": "column", "board_id": ..., "_id": ..., "name": ...}
+    {"type": "task", "board_id": ..., "column_id": ..., "_id": ...,
+     "title": ..., "description": ..., "status": ..., "subtasks": [...]}
+
+Records are written as they come off Mongo cursors read batch_size
+documents at a time, and read back line by line on import, with tasks
+written chunk_size at a time. Neither side ever holds more than one
+board's columns and one chunk of tasks, whatever the size of the export.
+
+Imported boards, columns and tasks get new _ids, so an export can be
+imported again, into the same account or another one.
+
+In the embedded layout a board's tasks all live in its one document,
+which MongoDB caps at 16 MB. A board whose tasks add up to more than
+max_board_bytes (IMPORT_EMBEDDED_BOARD_MAX_BYTES) is refused at the
+task that would take it over; the tasks before it stay imported. The
+collection layout has no such limit.
+"""
+
+import json
+
+import bson
+from bson import json_util
+from bson.errors import BSONError
+from bson.objectid import ObjectId
+
+from application.boards.models import Board
+from application.helpers import bson_default
+
+
+BOARD = "board"
+COLUMN = "column"
+TASK = "task"
+
+# Fields of a task record that only place the task.
+TASK_PLACEMENT_FIELDS = ("type", "board_id", "column_id")
+
+
+def export_records(user_id, batch_size):
+    """Yield the export records of a user's boards, in _id order."""
+    for board in Board.export_boards(user_id, batch_size):
+        yield {"type": BOARD, "_id": board["_id"], "name": board.get("name")}
+
+        for column in board.get("columns") or []:
+            yield {
+                "type": COLUMN,
+                "board_id": board["_id"],
+                "_id": column["_id"],
+                "name": column.get("name")
+            }
+
+        for task in Board.export_tasks(board["_id"], batch_size):
+            yield {"type": TASK, "board_id": board["_id"], **task}
+
+
+def export_lines(user_id, batch_size):
+    """Yield a user's boards as NDJSON lines."""
+    for record in export_records(user_id, batch_size):
+        yield json.dumps(record, default=bson_default) + "\n"
+
+
+class BoardImporter:
+    """
+    Writes the records of an export to a user's boards as they are
+    read. A board is inserted, with its columns, once its first task
+    (or the next board) comes along; its tasks are then buffered and
+    written to their column chunk_size at a time.
+    """
+
+    def __init__(self, user_id, chunk_size, max_board_bytes=None):
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        # Only embedded boards hold their tasks in one document.
+        self.max_board_bytes = max_board_bytes if Board.task_collection is None else None
+        self.board_count = 0
+        self.task_count = 0
+
+        # The board being read: its record until it is inserted,
+        # then its new _id, and its columns' new _ids by exported _id.
+        self._board = None
+        self._board_id = None
+        self._columns = {}
+
+        # Tasks waiting to be written to the column _column_id.
+        self._column_id = None
+        self._tasks = []
+
+        # BSON size of the tasks read for the board being read.
+        self._board_bytes = 0
+
+    def add(self, record):
+        """
+        Take the next record of the export. Raises ValueError for a
+        record out of place or that can't be understood.
+        """
+        record_type = record.get("type") if isinstance(record, dict) else None
+
+        if record_type == BOARD:
+            self._finish_board()
+            self._board = {"_id": record.get("_id"), "name": record.get("name"), "columns": []}
+            self._columns = {}
+            self._board_bytes = 0
+        elif record_type == COLUMN:
+            if self._board is None or record.get("board_id") != self._board["_id"]:
+                raise ValueError("a column must follow its board, before the board's tasks")
+            column_id = ObjectId()
+            self._columns[record.get("_id")] = column_id
+            self._board["columns"].append(
+                {"_id": column_id, "name": record.get("name"), "tasks": []})
+        elif record_type == TASK:
+            self._insert_board()
+            column_id = self._columns.get(record.get("column_id"))
+            if column_id is None:
+                raise ValueError("a task must follow its board and column")
+
+            if column_id != self._column_id or len(self._tasks) >= self.chunk_size:
+                self._write_tasks()
+                self._column_id = column_id
+
+            task = {k: v for k, v in record.items() if k not in TASK_PLACEMENT_FIELDS}
+            task["_id"] = ObjectId()
+            if self.max_board_bytes is not None:
+                self._board_bytes += len(bson.encode(task))
+                if self._board_bytes > self.max_board_bytes:
+                    raise ValueError(
+                        f"a board's tasks can't add up to more than "
+                        f"{self.max_board_bytes} bytes")
+            self._tasks.append(task)
+        else:
+            raise ValueError("'type' must be board, column or task")
+
+    def finish(self):
+        """Write whatever is still buffered. Returns the counts imported."""
+        self._finish_board()
+        return {"boards": self.board_count, "tasks": self.task_count}
+
+    def _insert_board(self):
+        if self._board is None:
+            return
+        self._board_id = Board(
+            self.user_id, self._board["name"], self._board["columns"]).add_board()
+        self._board = None
+        self.board_count += 1
+
+    def _write_tasks(self):
+        if self._tasks:
+            Board.import_tasks(self._board_id, self._column_id, self._tasks)
+            self.task_count += len(self._tasks)
+        self._tasks = []
+
+    def _finish_board(self):
+        self._write_tasks()
+        self._insert_board()
+
+
+def import_lines(user_id, lines, chunk_size, max_board_bytes=None):
+    """
+    Import NDJSON lines, as written by export_lines, into a user's
+    boards. Returns the number of boards and tasks imported. Raises
+    ValueError naming the line at fault; the records before it stay
+    imported.
+    """
+    importer = BoardImporter(user_id, chunk_size, max_board_bytes)
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            importer.add(json_util.loads(line))
+        except (ValueError, BSONError) as e:
+            importer.finish()
+            raise ValueError(f"Line {number}: {e}")
+    return importer.finish()
@@ -1,41 +1,137 @@
-from flask import Blueprint, session, request, jsonify
-from werkzeug.exceptions import HTTPException
+from flask import (
+    Blueprint, session, request, jsonify, current_app, url_for, stream_with_context
+)
 from flask_cors import CORS
 from flask_jwt_extended import (
     jwt_required, 
-    get_jwt_identity,
-    get_jwt,
-    set_access_cookies,
-    create_access_token
+    get_jwt_identity
     )
 
-from application.users.models import User
-from application.boards.models import Board
+from application.users.identity import identity_cache
+from application.boards.models import (
+    Board, BOARD_PROJECTION, REVISION_PROJECTION, task_projection
+)
+from application.boards.diff import TaskDiff, to_object_id
+from application.boards.batch import parse_operations
+from application.boards.transfer import export_lines, import_lines
+from application.boards.events import board_events
+from application.metrics import metrics
+from exceptions.handlers import RevisionMismatchError
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 
-from application.helpers import parse_json
 
-from datetime import datetime, timedelta, timezone
+import hashlib
 
 
 boards = Blueprint('boards', __name__)
 
 CORS(boards, supports_credentials=True, resources=r"/api/*")
 
-@boards.after_request
-def refresh_expiring_jwts(response):
+def board_etag(board_id, revision):
+    """Strong ETag for a single board at a given revision."""
+    return f"{board_id}-{revision}"
+
+
+def boards_etag(boards, view=None, limit=None, after=None):
+    """
+    Strong ETag for a list of boards, from each board's _id and revision
+    and the representation asked for: the view and the page (limit and
+    after), since those give different bodies for the same boards.
+    """
+    digest = hashlib.sha1()
+    digest.update(f"{view or 'full'};{limit};{after};".encode())
+    for board in boards:
+        digest.update(f"{board['_id']}-{board.get('revision', 0)};".encode())
+    return digest.hexdigest()
+
+
+def not_modified(etag):
+    """Empty 304 response, sent without reading or serialising the board."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def requested_revision(board_id):
+    """
+    The board revision a write is conditional on, taken from the
+    If-Match header (an ETag as sent by get_board), or None when the
+    write is unconditional. An ETag that doesn't name a revision of
+    this board can never match, so it fails the precondition outright.
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+
+    for etag in request.if_match.as_set():
+        etag_board_id, _, revision = etag.rpartition("-")
+        if etag_board_id == board_id and revision.isdigit():
+            return int(revision)
+
+    raise RevisionMismatchError(board_id, Board.get_revision(board_id))
+
+
+def prefers_minimal():
+    """
+    True if the client asked for just the change a write made rather
+    than the whole board, with Prefer: return=minimal or ?response=delta.
+    """
+    if request.args.get("response") == "delta":
+        return True
+    return "return=minimal" in prefer_tokens()
+
+
+def prefer_tokens():
+    """The preferences in the request's Prefer header, without parameters."""
+    return [
+        preference.split(";")[0].strip().lower()
+        for preference in request.headers.get("Prefer", "").split(",")
+    ]
+
+
+def board_response(board, changes=None):
+    """
+    Send a board along with the ETag of its current revision.
+    With changes, send only the board's _id and revision and the changes,
+    as asked for by prefers_minimal.
+    """
+    if board is None:
+        return jsonify({
+            "msg": "Sorry, the board or column does not exist"
+        }), 400
+
+    if changes is None:
+        response = jsonify(board)
+    else:
+        response = jsonify({
+            "_id": board["_id"],
+            "revision": board.get("revision", 0),
+            **changes
+        })
+        if "return=minimal" in prefer_tokens():
+            response.headers["Preference-Applied"] = "return=minimal"
+
+    response.vary.add("Prefer")
+    response.set_etag(board_etag(str(board["_id"]), board.get("revision", 0)))
+    return response
+
+
+@boards.errorhandler(RevisionMismatchError)
+def revision_mismatch(e):
+    """
+    412 for a write whose If-Match revision is out of date. The body and
+    ETag carry the current revision, so the client can tell whether it
+    needs to re-fetch the board at all.
+    """
+    response = jsonify({
+        "msg": e.description,
+        "revision": e.current_revision
+    })
+    response.status_code = e.code
+    if e.current_revision is not None:
+        response.set_etag(board_etag(e.board_id, e.current_revision))
+    return response
 
-    try:
-        exp_timestamp = get_jwt()["exp"]
-        now = datetime.now(timezone.utc)
-        target_timestamp = datetime.timestamp(now + timedelta(minutes=30))
-        if target_timestamp > exp_timestamp:
-            access_token = create_access_token(identity=get_jwt_identity())
-            set_access_cookies(response, access_token)
-        return response
-    except (RuntimeError, KeyError):
-        return response
-    
 
 @boards.route('/api/create_board/', methods=["POST"])
 @jwt_required()
@@ -47,11 +143,9 @@ def add_board():
     along with board meta details.
     """
     if request.method == "POST":
-        user_email = get_jwt_identity()
-        user_profile = User.find_user_no_password(user_email)
+        user_id = identity_cache.current_user_id()
 
-        
-        if user_profile is not None:
+        if user_id is not None:
             data = request.json
 
             board_name = data["name"]
@@ -62,12 +156,12 @@ def add_board():
                     column['_id'] = ObjectId()
         
 
-            board = Board(user_profile['_id'], board_name, board_columns)
+            board = Board(user_id, board_name, board_columns)
             inserted_board_id = board.add_board()
 
             inserted_board = Board.find_board_by_id(inserted_board_id)
 
-            return parse_json(inserted_board), 201
+            return jsonify(inserted_board), 201
 
         return 'Error', 404
 
@@ -76,68 +170,355 @@ def add_board():
 @boards.route('/api/list_boards', methods=["GET"])
 @jwt_required()
 def list_boards():
-    user_email = get_jwt_identity()
-    user = User.find_user_no_password(user_email)
+    """
+    List the user's boards, in _id order.
+
+    Optional query parameters:
+        after: the _id of the last board of the previous page.
+        limit: the page size, capped at BOARDS_PAGE_MAX_LIMIT.
+        view=summary: return only each board's _id and name, and each
+        column's _id, name and task count.
+
+    When a limit is given and more boards follow, the URL of the next
+    page is sent in a Link header with rel="next".
+
+    The response carries an ETag built from each board's revision and
+    the view and page asked for.
+    A request whose If-None-Match still matches is answered with 304,
+    after a query that fetches only the boards' revisions.
+    """
+    user_id = identity_cache.current_user_id()
 
     # if user_email != session["user_email"]:
     #     return jsonify({
     #           "msg": "You are not authorized to access another user's boards."
     #     }), 401
 
-    if user is not None:
+    if user_id is not None:
+        after = request.args.get("after")
+        limit = request.args.get("limit", type=int)
+        view = request.args.get("view")
+
+        if after is not None and not ObjectId.is_valid(after):
+            return jsonify({
+                "msg": "'after' must be a board ID."
+            }), 400
+
+        if "limit" in request.args and (limit is None or limit < 1):
+            return jsonify({
+                "msg": "'limit' must be a positive number."
+            }), 400
+
+        if limit is not None:
+            limit = min(limit, current_app.config["BOARDS_PAGE_MAX_LIMIT"])
+
+        page_limit = limit + 1 if limit is not None else None
+
+        if request.if_none_match:
+            revisions = Board.get_board_revisions(user_id, after, page_limit)
+            etag = boards_etag(revisions, view, limit, after)
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+
+        # Fetch one extra board to find out whether there is a next page.
+        boards = Board.get_boards(
+            user_id,
+            after=after,
+            limit=page_limit,
+            summary=view == "summary"
+        )
+
         board_collection = []
-        boards = Board.get_boards(user["_id"])
         for board in boards:
             board_collection.append(board)
 
-        return parse_json(board_collection), 200
+        response = jsonify(board_collection[:limit])
+        response.set_etag(boards_etag(board_collection, view, limit, after))
+
+        if limit is not None and len(board_collection) > limit:
+            next_page = url_for(
+                "boards.list_boards",
+                after=str(board_collection[limit - 1]["_id"]),
+                limit=limit,
+                view=view
+            )
+            response.headers["Link"] = f'<{next_page}>; rel="next"'
+
+        return response, 200
+
+
+@boards.route("/api/export", methods=["GET"])
+@jwt_required()
+def export_boards():
+    """
+    Stream the user's boards, columns, tasks and subtasks as
+    newline-delimited JSON (see application.boards.transfer), read
+    from the database EXPORT_BATCH_SIZE documents at a time.
+    """
+    user_id = identity_cache.current_user_id()
+
+    if user_id is None:
+        return jsonify({
+            "msg": "Sorry, the user does not exist"
+        }), 400
+
+    lines = export_lines(user_id, current_app.config["EXPORT_BATCH_SIZE"])
+    response = current_app.response_class(
+        stream_with_context(lines), mimetype="application/x-ndjson")
+    response.headers["Content-Disposition"] = "attachment; filename=boards.ndjson"
+    return response
+
+
+@boards.route("/api/import", methods=["POST"])
+@jwt_required()
+def import_boards():
+    """
+    Import boards from a newline-delimited JSON body, as sent by
+    export_boards, into the user's account. The body is read line by
+    line and tasks are written IMPORT_CHUNK_SIZE at a time, so it is
+    never held in memory whole. In the embedded layout, a board whose
+    tasks come to more than IMPORT_EMBEDDED_BOARD_MAX_BYTES is refused,
+    as it would outgrow MongoDB's 16 MB document limit.
+
+    Responds with the number of boards and tasks imported. A line that
+    can't be imported stops the import with a 400 naming the line;
+    what came before it stays imported.
+    """
+    user_id = identity_cache.current_user_id()
+
+    if user_id is None:
+        return jsonify({
+            "msg": "Sorry, the user does not exist"
+        }), 400
+
+    try:
+        imported = import_lines(
+            user_id, request.stream, current_app.config["IMPORT_CHUNK_SIZE"],
+            current_app.config["IMPORT_EMBEDDED_BOARD_MAX_BYTES"])
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    return jsonify(imported), 201
 
 
 @boards.route("/api/get_board/<board_id>", methods=["GET"])
 @jwt_required()
 def get_board(board_id):
+    """
+    Return a single board, with an ETag built from its revision.
+    If the request's If-None-Match still matches, answer 304 after
+    fetching only the board's revision.
+    """
     user_email = get_jwt_identity()
-    user = User.find_user_no_password(user_email)
 
-    if user["email"] != session["user_email"]:
+    if user_email != session["user_email"]:
             return jsonify({
               "msg": "You are not authorized to access another user's boards."
         }), 401
     
+    if request.if_none_match:
+        revision = Board.get_revision(board_id)
+        if revision is not None:
+            etag = board_etag(board_id, revision)
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+
     board = Board.get_board(board_id)
     if board:
-        return parse_json(board), 200
+        response = jsonify(board)
+        metrics.observe_board_size(response.content_length)
+        response.set_etag(board_etag(board_id, board.get("revision", 0)))
+        return response, 200
     else:
         return jsonify({
             "msg": "Sorry, the board does not exist"
         }), 400
 
 
+def sse_message(event_type, data, dumps, event_id=None):
+    """Format one Server-Sent Events message."""
+    message = f"event: {event_type}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {dumps(data)}\n\n"
+
+
+@boards.route("/api/boards/<board_id>/events", methods=["GET"])
+@jwt_required()
+def board_events_stream(board_id):
+    """
+    Stream the board's changes as Server-Sent Events.
+
+    Each message's event is the change type (task_added, task_moved,
+    subtasks_renamed, columns_removed, ...), its id is the board's
+    revision after the change and its data the change itself.
+    A client reconnecting with a Last-Event-ID that is no longer the
+    board's revision has missed changes, and is sent a "resync" event
+    telling it to fetch the board again. A comment is sent every
+    BOARD_EVENTS_HEARTBEAT seconds to keep the connection open.
+
+    A stream holds a server thread while it is open, so once the
+    process has BOARD_EVENTS_MAX_STREAMS open, more are refused with
+    503 and a Retry-After, leaving threads for other requests.
+    """
+    user_email = get_jwt_identity()
+
+    if user_email != session["user_email"]:
+        return jsonify({
+            "msg": "You are not authorized to access another user's boards."
+        }), 401
+
+    # Subscribe before reading the revision, so no change falls in between.
+    subscription = board_events.subscribe(board_id)
+    if subscription is None:
+        response = jsonify({
+            "msg": "Too many board event streams are open, try again later."
+        })
+        response.status_code = 503
+        response.headers["Retry-After"] = str(board_events.heartbeat)
+        return response
+
+    revision = Board.get_revision(board_id)
+    if revision is None:
+        subscription.close()
+        return jsonify({
+            "msg": "Sorry, the board does not exist"
+        }), 400
+
+    dumps = current_app.json.dumps
+    heartbeat = board_events.heartbeat
+    last_event_id = request.headers.get("Last-Event-ID")
+
+    def stream():
+        yield f"retry: {heartbeat * 1000}\n\n"
+
+        if last_event_id is not None and last_event_id != str(revision):
+            yield sse_message("resync", {"revision": revision}, dumps, revision)
+
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": heartbeat\n\n"
+                continue
+            yield sse_message(event["type"], event, dumps, event.get("revision"))
+
+    response = current_app.response_class(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx buffering the stream.
+    response.headers["X-Accel-Buffering"] = "no"
+    response.call_on_close(subscription.close)
+    return response
+
+
 @boards.route('/api/update_board_columns/<board_id>', methods=["PATCH"])
 @jwt_required()
 def update_board_columns(board_id):
     """
     Add or remove columns from a given board.
+
+    Like every write to a board, this can be made conditional with an
+    If-Match header carrying the board's ETag; if the board has changed
+    since, nothing is written and 412 is returned with the current revision.
+
+    With Prefer: return=minimal (or ?response=delta) only the columns
+    added or removed and the board's revision are returned.
     """
 
-    user_email = get_jwt_identity()
-    user_profile = User.find_user_no_password(user_email)
+    user_id = identity_cache.current_user_id()
 
-    if user_profile is not None:
+    if user_id is not None:
 
         data = request.json
-        
+        minimal = prefers_minimal()
+        projection = REVISION_PROJECTION if minimal else BOARD_PROJECTION
+
         if "columns_to_add" in data:
             columns_to_add = data["columns_to_add"]
             for column in columns_to_add:
                 column["_id"] = ObjectId()
 
-            Board.update_board_columns(board_id, columns_to_add)
+            updated_board = Board.update_board_columns(
+                board_id, columns_to_add,
+                revision=requested_revision(board_id), projection=projection)
+            changes = {"columns_added": columns_to_add}
         else:
             columns_to_remove = data["columns_to_remove"]
-            Board.remove_board_columns(board_id, columns_to_remove)
-        updated_board = Board.find_board_by_id(board_id)
-        return parse_json(updated_board), 200
+            updated_board = Board.remove_board_columns(
+                board_id, columns_to_remove,
+                revision=requested_revision(board_id), projection=projection)
+            changes = {"columns_removed": columns_to_remove}
+
+        return board_response(updated_board, changes if minimal else None)
+
+
+def invalid_column_id():
+    return jsonify({
+        "msg": "'column_id' must be a column ID."
+    }), 400
+
+
+def write_task(board_id, column, task):
+    """
+    Add a task to a column, given by name or by _id, and respond
+    with the board or, as asked for by prefers_minimal, the new task.
+    """
+    task["_id"] = ObjectId()
+
+    if len(task["subtasks"]) > 0:
+        for subtask in task["subtasks"]:
+            subtask["_id"] = ObjectId()
+
+    minimal = prefers_minimal()
+
+    updated_board = Board.add_task_to_column(
+        board_id, column, task, revision=requested_revision(board_id),
+        projection=REVISION_PROJECTION if minimal else BOARD_PROJECTION)
+
+    changes = {"column": column, "task": task}
+    return board_response(updated_board, changes if minimal else None)
+
+
+def write_task_diff(board_id, column, task_id, task_diff):
+    """
+    Apply a TaskDiff to a task of a column, given by name or by _id,
+    and respond with the board or, as asked for by prefers_minimal,
+    the updated task.
+    """
+    minimal = prefers_minimal()
+
+    updated_board = Board.apply_task_diff(
+        board_id, column, task_id, task_diff,
+        revision=requested_revision(board_id),
+        projection=(task_projection(task_diff.status, task_id)
+                    if minimal else BOARD_PROJECTION))
+
+    if updated_board is None:
+        return jsonify({
+            "msg": "Sorry, the task does not exist"
+        }), 400
+
+    if not minimal:
+        return board_response(updated_board)
+
+    changes = {"column": task_diff.status, "task": updated_board.get("task")}
+    if task_diff.moves_task(column):
+        changes["moved_from"] = column
+    return board_response(updated_board, changes)
+
+
+def delete_task(board_id, column, task_id):
+    """
+    Remove a task from a column, given by name or by _id, and respond
+    with the board or, as asked for by prefers_minimal, the task's ID.
+    """
+    minimal = prefers_minimal()
+
+    updated_board = Board.remove_task_from_column(
+        board_id, column, task_id, revision=requested_revision(board_id),
+        projection=REVISION_PROJECTION if minimal else BOARD_PROJECTION)
+
+    changes = {"column": column, "task_id": ObjectId(task_id)}
+    return board_response(updated_board, changes if minimal else None)
 
 
 @boards.route('/api/add_task/<board_id>/<task_status>', methods=["POST", "PATCH"])
@@ -147,26 +528,19 @@ def add_task(board_id, task_status):
     Add tasks for a given column.
     The task's column is referenced by the column name,
     under the board ID.
+
+    With Prefer: return=minimal (or ?response=delta) only the new
+    task, its column and the board's revision are returned.
     """
 
     user_email = get_jwt_identity()
-    user_profile = User.find_user_no_password(user_email)
 
-    if user_profile["email"] != session["user_email"]:
+    if user_email != session["user_email"]:
         return jsonify({
             "msg": "You are not authorized to access another user's boards."
     }), 401
 
-    task = request.json
-    task["_id"] = ObjectId()
-
-    if len(task["subtasks"]) > 0:
-        for subtask in task["subtasks"]:
-            subtask["_id"] = ObjectId()
-
-    Board.add_task_to_column(board_id, task_status, task)
-    updated_board = Board.find_board_by_id(board_id)
-    return parse_json(updated_board), 200
+    return write_task(board_id, task_status, request.json)
 
 
 @boards.route("/api/update_task/<board_id>/<column_name>/<task_id>", methods=["PATCH"])
@@ -179,8 +553,13 @@ def update_task(board_id, column_name, task_id):
     Column is referenced from board by unique column name.
     Board is referenced by ID.
 
-    Handles changing a task title, description and adding/removing
-    of subtasks.
+    Handles changing a task title, description, adding/removing/renaming
+    of subtasks and moving the task to another column. The whole change
+    is applied to the board in a single write.
+
+    With Prefer: return=minimal (or ?response=delta) only the updated
+    task, computed by the write's projection, is returned with the
+    board's revision.
     """
 
     user_email = get_jwt_identity()
@@ -190,105 +569,181 @@ def update_task(board_id, column_name, task_id):
             "msg": "You are not authorized to access another user's boards."
     }), 401
 
-    current_task = Board.get_task(board_id, column_name, task_id)
+    task_diff = TaskDiff.from_payload(request.json)
+    return write_task_diff(board_id, column_name, task_id, task_diff)
+
+
+@boards.route("/api/remove_task/<board_id>/<column_name>", methods=["POST"])
+@jwt_required()
+def remove_task(board_id, column_name):
+    """
+    Remove a task from a given column.
+    The task's column is referenced by the column name,
+    under the board ID.
+
+    With Prefer: return=minimal (or ?response=delta) only the removed
+    task's ID and the board's revision are returned.
+    """
+
+    user_email = get_jwt_identity()
+
+    if user_email != session["user_email"]:
+        return jsonify({
+            "msg": "You are not authorized to access another user's boards."
+    }), 401
 
     data = request.json
+    return delete_task(board_id, column_name, data["task_id"])
 
-    current_subtasks = current_task[0]["subtasks"]
-    current_task_status = current_task[0]["status"]
 
-    incoming_subtasks = data["subtasks"]
-    new_task_title = data["title"]
-    new_task_description = data["description"]
+@boards.route("/api/boards/<board_id>/columns/<column_id>/tasks", methods=["POST"])
+@jwt_required()
+def add_task_by_column_id(board_id, column_id):
+    """
+    Add a task to a column referenced by its ID rather than its name.
+    Otherwise the same as add_task.
+    """
 
+    user_email = get_jwt_identity()
 
-    subtasks_to_update = []
-    for subtask in data["subtasks"]:
-        for current_subtask in current_task[0]["subtasks"]:
-            if subtask.get("_id") is not None and \
-                (ObjectId(subtask.get("_id").get("$oid")) == current_subtask["_id"]) and \
-                    subtask["title"] != current_subtask["title"]:
-                subtasks_to_update.append(subtask)
-    
-    if len(subtasks_to_update) > 0:
-        Board.update_subtask_title(board_id, column_name, task_id, subtasks_to_update)
-
-    updated_board = None
-
-    # If there are more subtasks in request payload than in the current collection
-    if len(current_subtasks) < len(incoming_subtasks):
-        subtasks_to_add = []
-        for subtask in incoming_subtasks:
-            if not "_id" in subtask:
-                # Update current task with new subtasks
-                subtasks_to_add.append(subtask)
-        
-        updated_board = Board.update_task_add_subtasks(
-            board_id, column_name, task_id, subtasks_to_add)
+    if user_email != session["user_email"]:
+        return jsonify({
+            "msg": "You are not authorized to access another user's boards."
+    }), 401
 
-    # If these are less sub tasks in request payload than in current collection
-    if len(current_subtasks) > len(incoming_subtasks):
-        subtask_ids_to_remove = []
-        for incoming_subtask in incoming_subtasks:
-            subtask_id = incoming_subtask["_id"].get("$oid")
-            subtask_ids_to_remove.append(ObjectId(subtask_id))
+    if not ObjectId.is_valid(column_id):
+        return invalid_column_id()
 
-        subtasks_to_remove = []
+    return write_task(board_id, ObjectId(column_id), request.json)
 
-        for subtask in current_subtasks:
 
-            if subtask["_id"] not in subtask_ids_to_remove:
-                subtasks_to_remove.append(subtask["_id"])
+@boards.route("/api/boards/<board_id>/columns/<column_id>/tasks/<task_id>", methods=["PATCH"])
+@jwt_required()
+def update_task_by_column_id(board_id, column_id, task_id):
+    """
+    Update a task of a column referenced by its ID rather than its name.
+    The task is moved to another column by giving that column's ID as
+    column_id in the payload; status is ignored. Otherwise the same
+    as update_task.
+    """
 
-        updated_board = Board.update_task_remove_subtasks(
-            board_id, column_name, task_id, subtasks_to_remove
-        )
-    
+    user_email = get_jwt_identity()
 
-    updated_board = Board.update_task_meta(
-        board_id, column_name, task_id, new_task_title,
-        new_task_description
-    )
+    if user_email != session["user_email"]:
+        return jsonify({
+            "msg": "You are not authorized to access another user's boards."
+    }), 401
 
-    # If status in incoming payload differs from status of task at present
-    if current_task_status != data["status"]:
-        column_to_remove_task_from = current_task_status
-        column_to_inject_task_into = data["status"]
+    data = request.json
+    if not ObjectId.is_valid(column_id):
+        return invalid_column_id()
 
-        current_task = Board.get_task(board_id, column_to_remove_task_from, task_id)[0]
+    column_id = ObjectId(column_id)
+    try:
+        new_column_id = to_object_id(data["column_id"]) if data.get("column_id") else column_id
+    except InvalidId:
+        return invalid_column_id()
 
-        updated_board = Board.update_task_status(board_id,
-                                 task_id,
-                                 column_to_remove_task_from,
-                                 column_to_inject_task_into,
-                                 current_task)
-        
-        current_task = Board.get_task(board_id, column_to_inject_task_into, task_id)[0]
+    task_diff = TaskDiff.from_payload(data, status=new_column_id)
+    return write_task_diff(board_id, column_id, task_id, task_diff)
 
-    return parse_json(updated_board), 200
 
+@boards.route("/api/boards/<board_id>/columns/<column_id>/tasks/<task_id>", methods=["DELETE"])
+@jwt_required()
+def remove_task_by_column_id(board_id, column_id, task_id):
+    """
+    Remove a task from a column referenced by its ID rather than its name.
+    Otherwise the same as remove_task.
+    """
 
-@boards.route("/api/remove_task/<board_id>/<column_name>", methods=["POST"])
+    user_email = get_jwt_identity()
+
+    if user_email != session["user_email"]:
+        return jsonify({
+            "msg": "You are not authorized to access another user's boards."
+    }), 401
+
+    if not ObjectId.is_valid(column_id):
+        return invalid_column_id()
+
+    return delete_task(board_id, ObjectId(column_id), task_id)
+
+
+@boards.route("/api/boards/<board_id>/tasks:batch", methods=["POST"])
 @jwt_required()
-def remove_task(board_id, column_name):
+def task_batch(board_id):
     """
-    Remove a task from a given column.
-    The task's column is referenced by the column name,
-    under the board ID.
+    Apply an ordered list of create, update, move and delete
+    operations to a board's tasks in a single bulk write.
+    See application.boards.batch for the operations.
+
+    Responds with the board's _id and final revision, and one result
+    per operation: applied, failed (no such task or column), conflict
+    (the board changed under the batch) or skipped (after a failed or
+    conflicting operation).
     """
 
     user_email = get_jwt_identity()
-    user_profile = User.find_user_no_password(user_email)
-    
-    if user_profile["email"] != session["user_email"]:
+
+    if user_email != session["user_email"]:
         return jsonify({
             "msg": "You are not authorized to access another user's boards."
     }), 401
 
-    data = request.json
-    task_id = data["task_id"]
+    try:
+        operations = parse_operations(
+            request.json, current_app.config["BOARD_BATCH_MAX_OPERATIONS"])
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    result = Board.apply_task_batch(
+        board_id, operations, revision=requested_revision(board_id))
+
+    if result is None:
+        return jsonify({
+            "msg": "Sorry, the board does not exist"
+        }), 400
 
-    Board.remove_task_from_column(board_id, column_name, task_id)
-    updated_board = Board.find_board_by_id(board_id)
+    return board_response(result, {"results": result["results"]})
+
+
+@boards.route("/api/boards/<board_id>/columns/<column_id>", methods=["PATCH"])
+@jwt_required()
+def rename_column(board_id, column_id):
+    """
+    Rename a column referenced by its ID. The column's tasks aren't
+    written: they are read with the new name as their status.
+    Expects {"name": <new name>}; the name must not be used by another
+    column of the board.
+    """
+
+    user_email = get_jwt_identity()
+
+    if user_email != session["user_email"]:
+        return jsonify({
+            "msg": "You are not authorized to access another user's boards."
+    }), 401
+
+    if not ObjectId.is_valid(column_id):
+        return invalid_column_id()
+
+    new_name = request.json.get("name")
+    if not isinstance(new_name, str) or not new_name:
+        return jsonify({
+            "msg": "'name' must be a non-empty string."
+        }), 400
+
+    minimal = prefers_minimal()
+
+    updated_board = Board.rename_column(
+        board_id, ObjectId(column_id), new_name,
+        revision=requested_revision(board_id),
+        projection=REVISION_PROJECTION if minimal else BOARD_PROJECTION)
+
+    if updated_board is None:
+        return jsonify({
+            "msg": "Sorry, the column does not exist, or another column has that name"
+        }), 400
 
-    return parse_json(updated_board), 200
+    changes = {"column": ObjectId(column_id), "name": new_name}
+    return board_response(updated_board, changes if minimal else None)
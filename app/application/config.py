@@ -4,29 +4,116 @@
 import os
 
 
+def mongo_uri():
+    """
+    The server's URI from the MONGODB_* variables, or None if any is
+    missing, in which case only the memory backend can be used.
+    """
+    try:
+        return ("mongodb://"
+        + os.environ["MONGODB_USERNAME"]
+        + ":"
+        + os.environ["MONGODB_PASSWORD"]
+        + "@"
+        + os.environ["MONGODB_HOSTNAME"]
+        + ":27017/"
+        + os.environ["MONGODB_DATABASE"]
+        ) + "?authSource=flaskdb&directConnection=true"
+    except KeyError:
+        return None
+
+
 class Config:
 
     SECRET_KEY = os.environ.get("SECRET_KEY")
     MONGODB_DATABASE = os.environ.get("MONGODB_DATABASE")
-    MONGO_URI = ("mongodb://"
-    + os.environ["MONGODB_USERNAME"]
-    + ":"
-    + os.environ["MONGODB_PASSWORD"]
-    + "@"
-    + os.environ["MONGODB_HOSTNAME"]
-    + ":27017/"
-    + os.environ["MONGODB_DATABASE"]
-    ) + "?authSource=flaskdb&directConnection=true"
+    MONGO_URI = mongo_uri()
+    # "pymongo" for a MongoDB server, "memory" for the in-process
+    # stand-in (see application.memory).
+    MONGO_BACKEND = os.environ.get("MONGO_BACKEND", "pymongo")
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+    # How long a request waits for a free pooled connection before failing.
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+        os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+    # In order of preference; those whose module isn't installed are skipped.
+    MONGO_COMPRESSORS = [
+        name for name in os.environ.get("MONGO_COMPRESSORS", "zstd,snappy").split(",") if name
+    ]
+    MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+    METRICS_ENABLED = bool(int(os.environ.get("METRICS_ENABLED", 1)))
+    MONGO_PROFILER = bool(int(os.environ.get("MONGO_PROFILER", 0)))
+    MONGO_PROFILER_SLOW_MS = float(os.environ.get("MONGO_PROFILER_SLOW_MS", 500))
     
     SECURITY_PASSWORD_SALT = os.environ.get("SECURITY_PASSWORD_SALT")
+    # Comma-separated earlier values of SECRET_KEY; tokens they signed still verify.
+    SECRET_KEY_FALLBACKS = [
+        key for key in os.environ.get("SECRET_KEY_FALLBACKS", "").split(",") if key
+    ]
+    EMAIL_TOKEN_MAX_AGE = int(os.environ.get("EMAIL_TOKEN_MAX_AGE", 3600))
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
     MAIL_SERVER = os.environ.get("MAIL_SERVER")
-    MAIL_PORT = int(os.environ.get("MAIL_PORT"))
-    MAIL_USE_TLS = bool(int(os.environ.get("MAIL_USE_TLS")))
-    MAIL_USE_SSL = bool(int(os.environ.get("MAIL_USE_SSL")))
+    MAIL_PORT = int(os.environ.get("MAIL_PORT", 25))
+    MAIL_USE_TLS = bool(int(os.environ.get("MAIL_USE_TLS", 0)))
+    MAIL_USE_SSL = bool(int(os.environ.get("MAIL_USE_SSL", 0)))
     MAIL_DEBUG = bool(os.environ.get("MAIL_DEBUG"))
     MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER")
+    MAIL_OUTBOX_WORKER = os.environ.get("MAIL_OUTBOX_WORKER", "thread")
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("MAIL_OUTBOX_BATCH_SIZE", 50))
+    MAIL_OUTBOX_POLL_INTERVAL = float(os.environ.get("MAIL_OUTBOX_POLL_INTERVAL", 5))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("MAIL_OUTBOX_MAX_ATTEMPTS", 6))
+    MAIL_OUTBOX_BACKOFF = float(os.environ.get("MAIL_OUTBOX_BACKOFF", 30))
+    MAIL_OUTBOX_LEASE = int(os.environ.get("MAIL_OUTBOX_LEASE", 300))
     CORS_HEADERS = 'Content-Type'
+    MONGO_ENSURE_INDEXES = bool(int(os.environ.get("MONGO_ENSURE_INDEXES", 1)))
+    BOARDS_PAGE_MAX_LIMIT = int(os.environ.get("BOARDS_PAGE_MAX_LIMIT", 100))
+    IDENTITY_CACHE_TTL = int(os.environ.get("IDENTITY_CACHE_TTL", 300))
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 8))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256:260000")
+    PASSWORD_HASH_SALT_LENGTH = int(os.environ.get("PASSWORD_HASH_SALT_LENGTH", 16))
+    BOARD_TASK_STORAGE = os.environ.get("BOARD_TASK_STORAGE", "embedded")
+    BOARD_EVENTS_BACKEND = os.environ.get("BOARD_EVENTS_BACKEND", "auto")
+    BOARD_EVENTS_HEARTBEAT = int(os.environ.get("BOARD_EVENTS_HEARTBEAT", 15))
+    # Per process. The development server and gevent workers give each
+    # connection its own thread or greenlet, so an open stream costs
+    # little; gunicorn.conf.py lowers this for gthread workers, whose
+    # few threads every stream would otherwise take.
+    BOARD_EVENTS_MAX_STREAMS = int(os.environ.get("BOARD_EVENTS_MAX_STREAMS", 100))
+    BOARD_BATCH_MAX_OPERATIONS = int(os.environ.get("BOARD_BATCH_MAX_OPERATIONS", 1000))
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 500))
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 1000))
+    # Below MongoDB's 16 MB document limit, leaving room for the board's
+    # own fields and the tasks added to it later.
+    IMPORT_EMBEDDED_BOARD_MAX_BYTES = int(
+        os.environ.get("IMPORT_EMBEDDED_BOARD_MAX_BYTES", 12 * 1024 * 1024))
     JWT_COOKIE_SAMESITE = "None"
     JWT_COOKIE_SECURE = True
+    JWT_REFRESH_WINDOW = int(os.environ.get("JWT_REFRESH_WINDOW", 1800))
+    JWT_REFRESH_STATS_MINUTES = int(os.environ.get("JWT_REFRESH_STATS_MINUTES", 60))
+
+
+class TestConfig(Config):
+    """
+    Settings for the test suite. The database is the in-process memory
+    store, empty for every app created (TEST_MONGO_BACKEND=pymongo runs
+    the suite against the MONGODB_* server instead), and nothing needs
+    the MAIL_* or secret variables. Emails stay in the outbox, and
+    passwords are hashed on the request thread with few iterations.
+    """
+    TESTING = True
+    MONGO_BACKEND = os.environ.get("TEST_MONGO_BACKEND", "memory")
+    MONGO_DATABASE = "flaskdb"
+    SECRET_KEY = Config.SECRET_KEY or "test-secret-key-for-the-test-suite-only"
+    SECURITY_PASSWORD_SALT = Config.SECURITY_PASSWORD_SALT or "test-password-salt"
+    MAIL_DEFAULT_SENDER = Config.MAIL_DEFAULT_SENDER or "boards@example.com"
+    MAIL_OUTBOX_WORKER = "off"
+    MAIL_SUPPRESS_SEND = True
+    PASSWORD_HASH_WORKERS = 0
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:2000"
+    BOARD_EVENTS_BACKEND = "local"
+    JWT_COOKIE_SECURE = False
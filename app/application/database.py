@@ -1,6 +1,79 @@
 """Initialize Flask Pymongo Object"""
 
-from flask_pymongo import PyMongo
+import importlib.util
+
+from flask_pymongo import PyMongo, BSONObjectIdConverter
+
+from application.monitoring import mongo_monitor
+from application.profiler import command_profiler
 
 
 mongo = PyMongo()
+
+BACKEND_PYMONGO = "pymongo"
+BACKEND_MEMORY = "memory"
+
+# Wire protocol compressors and the module each needs installed.
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def mongo_client_options(config):
+    """
+    MongoClient keyword arguments from the MONGO_* pool settings.
+    Compressors whose module isn't installed are left out, so
+    MONGO_COMPRESSORS can name zstd and snappy without requiring either.
+    """
+    options = {
+        "maxPoolSize": config.get("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": config.get("MONGO_MIN_POOL_SIZE", 0),
+        "readPreference": config.get("MONGO_READ_PREFERENCE", "primary")
+    }
+    for option, key in (("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+                        ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS"),
+                        ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS")):
+        if config.get(key) is not None:
+            options[option] = config[key]
+
+    compressors = [
+        name for name in config.get("MONGO_COMPRESSORS", [])
+        if name in COMPRESSOR_MODULES
+        and importlib.util.find_spec(COMPRESSOR_MODULES[name]) is not None
+    ]
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def init_mongo(app):
+    """
+    Create the MongoClient with the configured pool settings, and the
+    monitor's and profiler's listeners. With MONGO_BACKEND = "memory",
+    the client is an in-process stand-in instead, see application.memory.
+    """
+    event_listeners = [*mongo_monitor.listeners, command_profiler.listener]
+
+    if app.config.get("MONGO_BACKEND", BACKEND_PYMONGO) == BACKEND_MEMORY:
+        from application.memory import MemoryClient
+
+        mongo.cx = MemoryClient(event_listeners=event_listeners)
+        mongo.db = mongo.cx[app.config.get("MONGO_DATABASE", "flaskdb")]
+        app.url_map.converters["ObjectId"] = BSONObjectIdConverter
+        return
+
+    mongo.init_app(
+        app,
+        event_listeners=event_listeners,
+        **mongo_client_options(app.config)
+    )
+
+
+def reconnect(app):
+    """
+    Replace the MongoClient with a new one, for a process forked after
+    the app was created (a gunicorn worker with preload_app). A client
+    isn't fork-safe: the child mustn't use the sockets and monitor
+    threads it inherited. The inherited client is dropped, not closed,
+    since closing it would talk to the server over the parent's sockets.
+    """
+    mongo_monitor.reset()
+    init_mongo(app)
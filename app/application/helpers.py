@@ -1,11 +1,41 @@
 from bson import json_util
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+from datetime import datetime
 import json
 
 
+def bson_default(o):
+    """
+    Convert a BSON type to its Extended JSON shape, e.g. {"$oid": ...}.
+    Used as the json `default` hook, so documents are encoded in a
+    single pass rather than dumped, parsed and dumped again.
+    """
+    if isinstance(o, ObjectId):
+        return {"$oid": str(o)}
+    if isinstance(o, datetime):
+        return json_util.default(o, json_options=json_util.RELAXED_JSON_OPTIONS)
+    try:
+        return DefaultJSONProvider.default(o)
+    except TypeError:
+        return json_util.default(o, json_options=json_util.RELAXED_JSON_OPTIONS)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that writes Mongo documents straight to the
+    Extended JSON shape the frontend expects, so views can return
+    documents as they come out of the database.
+    """
+    default = staticmethod(bson_default)
+
+    # Keep document order; sorting every object's keys is wasted work.
+    sort_keys = False
+
+
 def parse_json(data):
     """
     Helper function to serialize a User object.
     Required since ObjectId is non-JSON serializable.
     """
-    return json.loads(json_util.dumps(data))
-
+    return json.loads(json.dumps(data, default=bson_default))
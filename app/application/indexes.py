@@ -0,0 +1,156 @@
+"""
+Index management for the users and boards collections.
+
+ensure_indexes is run by create_app and is idempotent: creating an
+index that already exists with the same keys and options is a no-op,
+as is dropping a RETIRED_INDEXES index that is already gone.
+The index-report CLI command shows how often each index is used
+($indexStats) and which plan the server picks for the queries the
+Board and User models issue (explain()).
+"""
+
+from datetime import datetime, timezone
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import with_appcontext
+from pymongo import ASCENDING
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+from application.database import mongo
+
+
+INDEXES = {
+    "users": [
+        # User.find_user_by_email / find_user_no_password, and
+        # enforces one account per email at the database level.
+        {"keys": [("email", ASCENDING)], "name": "email_unique", "unique": True},
+    ],
+    "boards": [
+        # Board.get_boards: a user's boards, in _id order.
+        {"keys": [("user", ASCENDING), ("_id", ASCENDING)], "name": "user_id"},
+        # Updates matching a board and one of its columns by name.
+        {"keys": [("_id", ASCENDING), ("columns.name", ASCENDING)], "name": "id_column_name"},
+    ],
+    "tasks": [
+        # The "collection" task storage layout: a board's tasks,
+        # column by column, in position order.
+        {"keys": [("board_id", ASCENDING), ("column_id", ASCENDING), ("position", ASCENDING)],
+         "name": "board_column_position"},
+    ],
+    "mail_outbox": [
+        # MailOutbox.claim_batch: messages due for an attempt, oldest first.
+        {"keys": [("status", ASCENDING), ("next_attempt_at", ASCENDING)], "name": "status_due"},
+        # MailOutbox.claim_batch: the messages just claimed.
+        {"keys": [("claim", ASCENDING)], "name": "claim", "sparse": True},
+        # Sent messages are dropped after a week.
+        {"keys": [("sent_at", ASCENDING)], "name": "sent_ttl", "expireAfterSeconds": 7 * 24 * 3600},
+    ]
+}
+
+# Indexes earlier versions created, dropped by ensure_indexes.
+RETIRED_INDEXES = {
+    # Multikey over every embedded task: each task write updated an
+    # entry, and every task write matches its board by _id anyway.
+    "boards": ["column_task_id"],
+}
+
+
+def ensure_indexes(db, logger):
+    """
+    Create every index in INDEXES that does not exist yet, and drop
+    those in RETIRED_INDEXES.
+    """
+    for collection_name, names in RETIRED_INDEXES.items():
+        for name in names:
+            try:
+                if name in db[collection_name].index_information():
+                    db[collection_name].drop_index(name)
+            except ConnectionFailure as e:
+                logger.warning("Skipping index creation: %s", e)
+                return
+            except OperationFailure as e:
+                logger.warning("Could not drop index %s on %s: %s", name, collection_name, e)
+
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            options = {k: v for k, v in index.items() if k != "keys"}
+            try:
+                db[collection_name].create_index(index["keys"], **options)
+            except ConnectionFailure as e:
+                # Don't stop the app starting if Mongo isn't up yet;
+                # the indexes are created on the next start.
+                logger.warning("Skipping index creation: %s", e)
+                return
+            except OperationFailure as e:
+                # An index with the same name but different keys or options,
+                # or existing data that violates a unique index.
+                logger.warning(
+                    "Could not create index %s on %s: %s",
+                    index["name"], collection_name, e)
+
+
+def _explained_queries():
+    """
+    The query shapes issued by the Board and User models.
+    The values are placeholders: the winning plan depends on the
+    shape of the query, not on whether a document matches.
+    """
+    board_id = ObjectId()
+    task_id = ObjectId()
+
+    return [
+        ("User.find_user_by_email", "users", {"email": "user@example.com"}),
+        ("Board.get_boards", "boards", {"user": ObjectId()}),
+        ("Board.find_board_by_id", "boards", {"_id": board_id}),
+        ("Board.add_task_to_column", "boards",
+         {"_id": board_id, "columns.name": "Todo"}),
+        ("Board.apply_task_diff", "boards",
+         {"_id": board_id,
+          "columns": {"$elemMatch": {"name": "Todo", "tasks._id": task_id}}}),
+        ("TaskCollection board tasks", "tasks", {"board_id": board_id}),
+        ("MailOutbox.claim_batch", "mail_outbox",
+         {"status": "pending", "next_attempt_at": {"$lte": datetime.now(timezone.utc)}}),
+    ]
+
+
+def _plan_stages(plan):
+    """Flatten a winning plan into 'STAGE(indexName)' strings, outermost first."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage = f"{stage}({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+@click.command("index-report")
+@with_appcontext
+def index_report():
+    """Report index usage and the query plan of each model query."""
+    db = mongo.db
+
+    for collection_name in INDEXES:
+        click.echo(f"== {collection_name}: $indexStats")
+        for stats in db[collection_name].aggregate([{"$indexStats": {}}]):
+            click.echo(
+                f"  {stats['name']:<20} ops={stats['accesses']['ops']:<10} "
+                f"since={stats['accesses']['since']:%Y-%m-%d %H:%M}")
+
+    click.echo("== explain()")
+    for label, collection_name, query in _explained_queries():
+        explained = db[collection_name].find(query).explain()
+        plan = explained["queryPlanner"]["winningPlan"]
+        # Plans run by the slot-based engine nest the classic plan.
+        plan = plan.get("queryPlan", plan)
+        click.echo(f"  {label:<28} {' <- '.join(_plan_stages(plan))}")
+
+
+def init_indexes(app):
+    """Create the indexes (unless disabled) and register the CLI command."""
+    if app.config.get("MONGO_ENSURE_INDEXES", True):
+        ensure_indexes(mongo.db, app.logger)
+
+    app.cli.add_command(index_report)
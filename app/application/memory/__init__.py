@@ -0,0 +1,16 @@
+"""
+In-process MongoDB stand-in, for tests.
+
+With MONGO_BACKEND = "memory" (as in TestConfig), init_mongo gives
+the app a MemoryClient instead of a MongoClient: mongomock, extended
+with what mongomock lacks and the Board and TaskCollection writes use,
+namely arrayFilters and positional updates, pipeline updates, and
+projections and $replaceRoot stages computed with expressions. No
+server is needed, and every app gets an empty database of its own, so
+test processes can run side by side (pytest -n auto).
+
+The stand-in has no change streams, and its command monitoring events
+carry no real reply. mongomock is only needed when this backend is used.
+"""
+
+from application.memory.store import MemoryClient
@@ -0,0 +1,207 @@
+"""
+Aggregation expressions, evaluated in Python.
+
+Covers the expression operators the Board and TaskCollection queries
+use in find projections ($filter, $map, $let, ...), pipeline updates
+($set / $replaceWith stages) and $replaceRoot, which mongomock doesn't
+evaluate in those places.
+"""
+
+import copy
+
+
+# A field that doesn't exist, as opposed to one holding null.
+MISSING = object()
+
+
+def get_field(value, path):
+    """The value at a dotted path, reaching into arrays as MongoDB does."""
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list):
+            value = [get_field(item, part) for item in value if isinstance(item, dict)]
+            value = [item for item in value if item is not MISSING]
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def evaluate(expression, root, variables=None):
+    """Evaluate an expression against the document root."""
+    variables = variables or {}
+
+    if isinstance(expression, str):
+        if expression.startswith("$$"):
+            name, _, path = expression[2:].partition(".")
+            base = root if name in ("ROOT", "CURRENT") else variables.get(name, MISSING)
+            return get_field(base, path) if path and base is not MISSING else base
+        if expression.startswith("$"):
+            return get_field(root, expression[1:])
+        return expression
+    if isinstance(expression, list):
+        return [_null(evaluate(item, root, variables)) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+
+    if len(expression) == 1:
+        (operator, argument), = expression.items()
+        if operator.startswith("$"):
+            return _operator(operator, argument, root, variables)
+
+    document = {}
+    for key, value in expression.items():
+        result = evaluate(value, root, variables)
+        if result is not MISSING:
+            document[key] = result
+    return document
+
+
+def apply_pipeline(document, pipeline):
+    """Return a copy of the document with an update pipeline applied."""
+    document = copy.deepcopy(document)
+    for stage in pipeline:
+        (operator, spec), = stage.items()
+        if operator in ("$set", "$addFields"):
+            values = {key: evaluate(value, document) for key, value in spec.items()}
+            for key, value in values.items():
+                target = document
+                parts = key.split(".")
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                if value is MISSING:
+                    target.pop(parts[-1], None)
+                else:
+                    target[parts[-1]] = value
+        elif operator in ("$replaceWith", "$replaceRoot"):
+            document = evaluate(spec["newRoot"] if operator == "$replaceRoot" else spec, document)
+        elif operator == "$unset":
+            for key in [spec] if isinstance(spec, str) else spec:
+                document.pop(key, None)
+        else:
+            raise NotImplementedError(f"{operator} isn't supported in pipeline updates")
+    return document
+
+
+def project(document, projection):
+    """Apply a find projection, which may compute fields with expressions."""
+    include_id = projection.get("_id", 1) not in (0, False)
+    projected = {"_id": document["_id"]} if include_id and "_id" in document else {}
+    for key, value in projection.items():
+        if key == "_id":
+            continue
+        result = get_field(document, key) if value in (1, True) else evaluate(value, document)
+        if result is not MISSING:
+            projected[key] = result
+    return projected
+
+
+def has_expressions(projection):
+    """True if a projection computes a field rather than only picking fields."""
+    if not isinstance(projection, dict):
+        return False
+    return any(
+        isinstance(value, dict) and any(key.startswith("$") for key in value)
+        and not set(value) & {"$slice", "$elemMatch"}
+        or isinstance(value, str) and value.startswith("$")
+        for value in projection.values()
+    )
+
+
+def _operator(operator, argument, root, variables):
+    def ev(expression, bound=None):
+        return evaluate(expression, root, {**variables, **(bound or {})})
+
+    if operator == "$literal":
+        return copy.deepcopy(argument)
+    if operator in ("$map", "$filter"):
+        items = ev(argument["input"])
+        if items is MISSING or items is None:
+            return None
+        name = argument.get("as", "this")
+        if operator == "$map":
+            return [_null(ev(argument["in"], {name: item})) for item in items]
+        return [item for item in items if _truthy(ev(argument["cond"], {name: item}))]
+    if operator == "$let":
+        bound = {name: ev(value) for name, value in argument["vars"].items()}
+        return ev(argument["in"], bound)
+    if operator == "$cond":
+        if isinstance(argument, dict):
+            argument = [argument["if"], argument["then"], argument["else"]]
+        return ev(argument[1]) if _truthy(ev(argument[0])) else ev(argument[2])
+    if operator == "$switch":
+        for branch in argument["branches"]:
+            if _truthy(ev(branch["case"])):
+                return ev(branch["then"])
+        return ev(argument["default"])
+    if operator == "$reduce":
+        value = ev(argument["initialValue"])
+        for item in ev(argument["input"]) or []:
+            value = ev(argument["in"], {"value": value, "this": item})
+        return value
+
+    values = [ev(item) for item in (argument if isinstance(argument, list) else [argument])]
+
+    if operator == "$mergeObjects":
+        merged = {}
+        for value in values:
+            if isinstance(value, dict):
+                merged.update(value)
+        return merged
+    if operator == "$concatArrays":
+        if any(value is MISSING or value is None for value in values):
+            return None
+        return [item for value in values for item in value]
+    if operator == "$arrayElemAt":
+        array, index = values
+        if not isinstance(array, list):
+            return None
+        return array[index] if -len(array) <= index < len(array) else MISSING
+    if operator == "$first":
+        array = values[0]
+        return array[0] if isinstance(array, list) and array else MISSING
+    if operator == "$ifNull":
+        for value in values:
+            if value is not MISSING and value is not None:
+                return value
+        return values[-1]
+    if operator == "$eq":
+        return _null(values[0]) == _null(values[1])
+    if operator == "$ne":
+        return _null(values[0]) != _null(values[1])
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        a, b = _null(values[0]), _null(values[1])
+        if a is None or b is None:
+            return False
+        return {"$gt": a > b, "$gte": a >= b, "$lt": a < b, "$lte": a <= b}[operator]
+    if operator == "$in":
+        return _null(values[0]) in (values[1] or [])
+    if operator == "$size":
+        return len(values[0])
+    if operator == "$add":
+        return sum(_null(value) or 0 for value in values)
+    if operator == "$and":
+        return all(_truthy(value) for value in values)
+    if operator == "$or":
+        return any(_truthy(value) for value in values)
+    if operator == "$not":
+        return not _truthy(values[0])
+    if operator == "$type":
+        value = values[0]
+        if value is MISSING:
+            return "missing"
+        return {dict: "object", list: "array", str: "string", type(None): "null",
+                bool: "bool", int: "int", float: "double"}.get(type(value), "objectId")
+    if operator == "$toString":
+        return str(values[0])
+    raise NotImplementedError(f"{operator} isn't supported by the memory store")
+
+
+def _null(value):
+    return None if value is MISSING else value
+
+
+def _truthy(value):
+    return value is not MISSING and value not in (None, False, 0)
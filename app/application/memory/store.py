@@ -0,0 +1,309 @@
+"""
+The in-process MongoDB stand-in: mongomock, with the update and
+projection semantics the models rely on added on top, and command
+monitoring events like a real MongoClient's.
+"""
+
+import copy
+import functools
+import itertools
+import threading
+import time
+from datetime import timedelta
+
+import mongomock
+from pymongo import ReturnDocument, monitoring
+from pymongo.operations import (
+    DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+)
+from pymongo.results import BulkWriteResult, UpdateResult
+
+from application.memory.expressions import apply_pipeline, evaluate, has_expressions, project
+from application.memory.updates import apply_update, concrete_update
+
+
+ADDRESS = ("memory", None)
+
+
+def command(name):
+    """Publish command monitoring events around a collection method, as the given command."""
+    def decorator(method):
+        @functools.wraps(method)
+        def monitored(self, *args, **kwargs):
+            return self.database.client.run_command(
+                name, self, functools.partial(method, self, *args, **kwargs))
+        return monitored
+    return decorator
+
+
+class MemoryClient:
+    """
+    A MongoClient whose databases live in this process. Every client
+    has a store of its own, so each starts out empty. Connection and
+    pool options are accepted and ignored.
+    """
+
+    def __init__(self, event_listeners=None, **options):
+        self._client = mongomock.MongoClient()
+        self._databases = {}
+        self._event_listeners = [
+            listener for listener in event_listeners or []
+            if isinstance(listener, monitoring.CommandListener)
+        ]
+        self._request_ids = itertools.count(1)
+        self._nesting = threading.local()
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, self._client[name])
+        return self._databases[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    def close(self):
+        pass
+
+    def run_command(self, name, collection, call):
+        """
+        Run call as the command name on collection. Only the outermost
+        command of a call publishes events: a bulk_write is one command,
+        however many updates it makes.
+        """
+        # Listeners registered with pymongo.monitoring.register, as a
+        # real MongoClient created now would pick them up.
+        listeners = self._event_listeners + list(monitoring._LISTENERS.command_listeners)
+        if not listeners or getattr(self._nesting, "depth", 0):
+            return call()
+
+        request_id = next(self._request_ids)
+        started = monitoring.CommandStartedEvent(
+            {name: collection.name}, collection.database.name, request_id, ADDRESS, request_id)
+        for listener in listeners:
+            listener.started(started)
+
+        self._nesting.depth = 1
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            failed = monitoring.CommandFailedEvent(
+                timedelta(seconds=time.perf_counter() - start), {"ok": 0, "errmsg": str(e)},
+                name, request_id, ADDRESS, request_id)
+            for listener in listeners:
+                listener.failed(failed)
+            raise
+        finally:
+            self._nesting.depth = 0
+
+        succeeded = monitoring.CommandSucceededEvent(
+            timedelta(seconds=time.perf_counter() - start), {"ok": 1},
+            name, request_id, ADDRESS, request_id)
+        for listener in listeners:
+            listener.succeeded(succeeded)
+        return result
+
+
+class MemoryDatabase:
+
+    def __init__(self, client, database):
+        self.client = client
+        self.name = database.name
+        self._database = database
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, self._database[name])
+        return self._collections[name]
+
+    def command(self, name, *args, **kwargs):
+        if name in ("hello", "ping"):
+            # A standalone server, so no change streams.
+            return {"isWritablePrimary": True, "ok": 1.0}
+        return self._database.command(name, *args, **kwargs)
+
+
+class MemoryCollection:
+    """
+    A mongomock collection, with arrayFilters, positional updates,
+    pipeline updates and computed projections added. Anything else is
+    passed through to mongomock.
+    """
+
+    def __init__(self, database, collection):
+        self.database = database
+        self.name = collection.name
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    @command("find")
+    def find(self, filter=None, projection=None, *args, batch_size=None, **kwargs):
+        if has_expressions(projection):
+            return ProjectingCursor(self._collection.find(filter, *args, **kwargs), projection)
+        return self._collection.find(filter, projection, *args, **kwargs)
+
+    @command("find")
+    def find_one(self, filter=None, projection=None, *args, **kwargs):
+        if has_expressions(projection):
+            return next(iter(self.find(filter, projection, *args, **kwargs).limit(1)), None)
+        return self._collection.find_one(filter, projection, *args, **kwargs)
+
+    @command("insert")
+    def insert_one(self, document, *args, **kwargs):
+        return self._collection.insert_one(document, *args, **kwargs)
+
+    @command("insert")
+    def insert_many(self, documents, *args, **kwargs):
+        return self._collection.insert_many(documents, *args, **kwargs)
+
+    @command("delete")
+    def delete_one(self, filter, *args, **kwargs):
+        return self._collection.delete_one(filter, *args, **kwargs)
+
+    @command("delete")
+    def delete_many(self, filter, *args, **kwargs):
+        return self._collection.delete_many(filter, *args, **kwargs)
+
+    @command("aggregate")
+    def count_documents(self, filter, *args, **kwargs):
+        return self._collection.count_documents(filter, *args, **kwargs)
+
+    @command("createIndexes")
+    def create_index(self, keys, **kwargs):
+        return self._collection.create_index(keys, **kwargs)
+
+    @command("update")
+    def replace_one(self, filter, replacement, *args, **kwargs):
+        return self._collection.replace_one(filter, replacement, *args, **kwargs)
+
+    @command("aggregate")
+    def aggregate(self, pipeline, **kwargs):
+        # mongomock doesn't evaluate expressions in $replaceRoot, so
+        # trailing $replaceRoot / $replaceWith stages are run here.
+        kwargs.pop("batchSize", None)
+        tail = []
+        while pipeline and set(pipeline[-1]) & {"$replaceRoot", "$replaceWith"}:
+            tail.insert(0, pipeline[-1])
+            pipeline = pipeline[:-1]
+
+        documents = self._collection.aggregate(pipeline, **kwargs) if pipeline \
+            else self._collection.find()
+        if not tail:
+            return documents
+        return (_replace_root(document, tail) for document in documents)
+
+    @command("update")
+    def update_one(self, filter, update, upsert=False, array_filters=None, **kwargs):
+        document = self._collection.find_one(filter)
+        if document is None:
+            if upsert:
+                return self._collection.update_one(filter, update, upsert=True)
+            return UpdateResult({"n": 0, "nModified": 0}, True)
+        return self._write(document, update, array_filters, filter)
+
+    @command("update")
+    def update_many(self, filter, update, upsert=False, array_filters=None, **kwargs):
+        matched = modified = 0
+        for document in list(self._collection.find(filter)):
+            matched += 1
+            modified += self._write(document, update, array_filters, filter).modified_count
+        if not matched and upsert:
+            return self._collection.update_many(filter, update, upsert=True)
+        return UpdateResult({"n": matched, "nModified": modified}, True)
+
+    @command("findAndModify")
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, array_filters=None,
+                            **kwargs):
+        document = self._collection.find_one(filter, sort=sort)
+        if document is None:
+            if upsert:
+                return self._collection.find_one_and_update(
+                    filter, update, projection=projection, upsert=True,
+                    return_document=return_document)
+            return None
+
+        self._write(document, update, array_filters, filter)
+        if return_document == ReturnDocument.BEFORE:
+            return document
+        return self.find_one({"_id": document["_id"]}, projection)
+
+    @command("update")
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+                  "nUpserted": 0, "upserted": []}
+        for request in requests:
+            if isinstance(request, InsertOne):
+                self.insert_one(request._doc)
+                counts["nInserted"] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany)):
+                update = self.update_one if isinstance(request, UpdateOne) else self.update_many
+                result = update(request._filter, request._doc, upsert=request._upsert,
+                                array_filters=request._array_filters)
+                counts["nMatched"] += result.matched_count
+                counts["nModified"] += result.modified_count
+            elif isinstance(request, ReplaceOne):
+                result = self.replace_one(request._filter, request._doc, upsert=request._upsert)
+                counts["nMatched"] += result.matched_count
+                counts["nModified"] += result.modified_count
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                delete = self.delete_one if isinstance(request, DeleteOne) else self.delete_many
+                counts["nRemoved"] += delete(request._filter).deleted_count
+        return BulkWriteResult(counts, True)
+
+    def watch(self, *args, **kwargs):
+        raise NotImplementedError("The memory store has no change streams")
+
+    def _write(self, document, update, array_filters, query):
+        """Apply an update to one stored document, replacing it if it changed."""
+        if isinstance(update, list):
+            updated = apply_pipeline(document, update)
+        else:
+            updated = copy.deepcopy(document)
+            apply_update(updated, concrete_update(document, update, array_filters, query))
+
+        if updated == document:
+            return UpdateResult({"n": 1, "nModified": 0}, True)
+        self._collection.replace_one({"_id": document["_id"]}, updated)
+        return UpdateResult({"n": 1, "nModified": 1}, True)
+
+
+class ProjectingCursor:
+    """A find cursor whose documents go through a computed projection."""
+
+    def __init__(self, cursor, projection):
+        self._cursor = cursor
+        self._projection = projection
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit):
+        self._cursor.limit(limit)
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __iter__(self):
+        return (project(document, self._projection) for document in self._cursor)
+
+    def __next__(self):
+        return project(next(self._cursor), self._projection)
+
+
+def _replace_root(document, stages):
+    for stage in stages:
+        root = stage["$replaceRoot"]["newRoot"] if "$replaceRoot" in stage \
+            else stage["$replaceWith"]
+        document = evaluate(root, document)
+    return document
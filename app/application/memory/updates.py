@@ -0,0 +1,167 @@
+"""
+Update operators with array filters, applied in Python.
+
+mongomock doesn't implement arrayFilters, which the Board writes rely
+on (columns.$[column].tasks.$[task]...). An update is first made
+concrete for one document: the positional operators ($, $[] and
+$[identifier]) are replaced by the indexes of the elements they match,
+and the resulting update is then applied to a copy of the document.
+"""
+
+import copy
+
+from mongomock import filtering
+
+
+def concrete_update(document, update, array_filters=None, query=None):
+    """
+    The update with every positional path expanded into the concrete
+    paths it designates in this document.
+    """
+    filters = _filters_by_identifier(array_filters)
+    concrete = {}
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            path = _resolve_positional(document, path, query)
+            if "$[" not in path:
+                concrete.setdefault(operator, {})[path] = value
+                continue
+            for parts in _expand(document, path.split("."), filters, []):
+                concrete.setdefault(operator, {})[".".join(parts)] = value
+    return concrete
+
+
+def apply_update(document, update):
+    """Apply a concrete update (no positional paths) to the document in place."""
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            parent, key = _container(document, path, create=operator in ("$set", "$inc", "$push"))
+            if parent is None:
+                continue
+            if isinstance(parent, list):
+                key = int(key)
+
+            if operator == "$set":
+                parent[key] = copy.deepcopy(value)
+            elif operator == "$unset":
+                if isinstance(parent, dict):
+                    parent.pop(key, None)
+            elif operator == "$inc":
+                current = parent.get(key, 0) if isinstance(parent, dict) else parent[key]
+                parent[key] = current + value
+            elif operator == "$push":
+                array = parent.setdefault(key, []) if isinstance(parent, dict) else parent[key]
+                if isinstance(value, dict) and "$each" in value:
+                    items = copy.deepcopy(value["$each"])
+                    position = value.get("$position")
+                    if position is None:
+                        array.extend(items)
+                    else:
+                        array[position:position] = items
+                else:
+                    array.append(copy.deepcopy(value))
+            elif operator == "$pull":
+                array = parent.get(key) if isinstance(parent, dict) else parent[key]
+                if isinstance(array, list):
+                    array[:] = [item for item in array if not _pull_matches(item, value)]
+            else:
+                raise NotImplementedError(f"{operator} isn't supported by the memory store")
+
+
+def _filters_by_identifier(array_filters):
+    # {"column._id": ..., "task._id": ...} -> {"column": {"_id": ...}, "task": {...}}
+    grouped = {}
+    for spec in array_filters or []:
+        for key, condition in spec.items():
+            identifier, _, rest = key.partition(".")
+            grouped.setdefault(identifier, {})[rest or "__element__"] = condition
+    return grouped
+
+
+def _element_matches(element, condition):
+    if "__element__" in condition:
+        element = {"__element__": element, **(element if isinstance(element, dict) else {})}
+    return filtering.filter_applies(condition, element)
+
+
+def _expand(value, parts, filters, prefix):
+    """The concrete paths designated by parts, with $[] and $[identifier] expanded."""
+    if not parts:
+        return [prefix]
+    head, rest = parts[0], parts[1:]
+
+    if head.startswith("$[") and head.endswith("]"):
+        if not isinstance(value, list):
+            return []
+        identifier = head[2:-1]
+        paths = []
+        for index, element in enumerate(value):
+            if identifier and not _element_matches(element, filters.get(identifier, {})):
+                continue
+            paths.extend(_expand(element, rest, filters, prefix + [str(index)]))
+        return paths
+
+    if isinstance(value, dict):
+        child = value.get(head)
+    elif isinstance(value, list) and head.isdigit() and int(head) < len(value):
+        child = value[int(head)]
+    else:
+        child = None
+    return _expand(child, rest, filters, prefix + [head])
+
+
+def _resolve_positional(document, path, query):
+    """Replace the $ operator with the index of the first element the query matched."""
+    if ".$." not in path + "." or "$[" in path.split(".$.")[0]:
+        return path
+    head, _, tail = (path + ".").partition(".$.")
+    index = _positional_index(document, query, head)
+    if index is None:
+        return path
+    return f"{head}.{index}.{tail}".rstrip(".")
+
+
+def _positional_index(document, query, array_path):
+    array = document
+    for part in array_path.split("."):
+        array = array.get(part) if isinstance(array, dict) else None
+    if not isinstance(array, list):
+        return None
+
+    conditions = {}
+    for key, condition in (query or {}).items():
+        if key == array_path and isinstance(condition, dict) and "$elemMatch" in condition:
+            conditions.update(condition["$elemMatch"])
+        elif key.startswith(array_path + "."):
+            conditions[key[len(array_path) + 1:]] = condition
+    if not conditions:
+        return None
+
+    for index, element in enumerate(array):
+        if isinstance(element, dict) and filtering.filter_applies(conditions, element):
+            return index
+    return None
+
+
+def _container(document, path, create):
+    """The object holding the last part of path, and that part."""
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+            continue
+        if part not in target:
+            if not create:
+                return None, parts[-1]
+            target[part] = {}
+        target = target[part]
+    return target, parts[-1]
+
+
+def _pull_matches(element, condition):
+    if isinstance(condition, dict) and condition:
+        if all(not key.startswith("$") for key in condition):
+            return isinstance(element, dict) and filtering.filter_applies(condition, element)
+        return filtering.filter_applies({"value": condition}, {"value": element})
+    return element == condition
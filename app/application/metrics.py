@@ -0,0 +1,238 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Every request is timed and counted by route (the URL rule, e.g.
+/api/get_board/<board_id>, so board ids don't each get a series) and
+method, and its response size is recorded. get_board records the size
+of the boards it serves, and the token refresher counts the access
+tokens it mints. The MongoDB pool and command counters of
+application.monitoring are exported as mongodb_* metrics, and the
+identity cache's counters as identity_cache_* metrics.
+
+Under gunicorn, each worker keeps its own values. With the
+PROMETHEUS_MULTIPROC_DIR environment variable set to a writable
+directory (created if missing), prometheus_client keeps them in memory-mapped files there and
+/metrics adds up the values of all the workers (see the on_starting and
+child_exit hooks in gunicorn.conf.py). Without it, /metrics reports the
+process that answers. The mongodb_* and identity_cache_* metrics
+always come from the process that answers, since each worker has its
+own MongoClient and identity cache.
+
+Set METRICS_ENABLED to 0 to turn off both the recording and the endpoint.
+"""
+
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+from prometheus_client.core import (
+    CounterMetricFamily, GaugeMetricFamily, SummaryMetricFamily
+)
+
+from application.monitoring import mongo_monitor
+from application.users.identity import identity_cache
+
+
+# prometheus_client opens its files there as soon as an unlabelled metric
+# is created, i.e. on import, which under preload_app is in the gunicorn
+# master before any server hook has run.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent serving a request, by route.",
+    ["route", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests served, by route and status.",
+    ["route", "method", "status"]
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of response bodies, by route. Streamed responses aren't counted.",
+    ["route", "method"],
+    buckets=SIZE_BUCKETS
+)
+BOARD_SIZE = Histogram(
+    "board_document_size_bytes",
+    "Size of the boards served by get_board, as JSON.",
+    buckets=SIZE_BUCKETS
+)
+JWT_REFRESHES = Counter(
+    "jwt_refresh_total",
+    "Expiring access tokens handled by the token refresher.",
+    ["outcome"]
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MongoCollector:
+    """Exports a MongoMonitor's snapshot each time /metrics is read."""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def collect(self):
+        snapshot = self.monitor.snapshot()
+
+        pool_open = GaugeMetricFamily(
+            "mongodb_pool_connections", "Connections open in the pool.", labels=["address"])
+        checked_out = GaugeMetricFamily(
+            "mongodb_pool_checked_out", "Connections checked out of the pool.",
+            labels=["address"])
+        max_checked_out = GaugeMetricFamily(
+            "mongodb_pool_checked_out_max",
+            "Most connections checked out of the pool at once.", labels=["address"])
+        checkout_wait = SummaryMetricFamily(
+            "mongodb_pool_checkout_wait_seconds",
+            "Time spent waiting to check a connection out.", labels=["address"])
+        checkout_failures = CounterMetricFamily(
+            "mongodb_pool_checkout_failures",
+            "Connection checkouts that failed, by reason.", labels=["address", "reason"])
+        cleared = CounterMetricFamily(
+            "mongodb_pool_cleared", "Times the pool was cleared.", labels=["address"])
+
+        for address, pool in snapshot["pools"].items():
+            pool_open.add_metric([address], pool["open"])
+            checked_out.add_metric([address], pool["checked_out"])
+            max_checked_out.add_metric([address], pool["max_checked_out"])
+            wait = pool["checkout_wait"]
+            checkout_wait.add_metric([address], wait["count"], wait["total_ms"] / 1000)
+            checkout_failures.add_metric([address, "timeout"], pool["checkout_timeouts"])
+            checkout_failures.add_metric([address, "other"], pool["checkout_failures"])
+            cleared.add_metric([address], pool["cleared"])
+
+        command_duration = SummaryMetricFamily(
+            "mongodb_command_duration_seconds", "Time spent in MongoDB commands, by name.",
+            labels=["command"])
+        command_max = GaugeMetricFamily(
+            "mongodb_command_duration_max_seconds", "Longest MongoDB command, by name.",
+            labels=["command"])
+        command_failures = CounterMetricFamily(
+            "mongodb_command_failures", "MongoDB commands that failed, by name.",
+            labels=["command"])
+
+        for name, command in snapshot["commands"].items():
+            command_duration.add_metric([name], command["count"], command["total_ms"] / 1000)
+            command_max.add_metric([name], command["max_ms"] / 1000)
+            command_failures.add_metric([name], command["failures"])
+
+        yield from (pool_open, checked_out, max_checked_out, checkout_wait,
+                    checkout_failures, cleared, command_duration, command_max,
+                    command_failures)
+
+
+class IdentityCacheCollector:
+    """Exports an IdentityCache's stats each time /metrics is read."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        yield CounterMetricFamily(
+            "identity_cache_hits", "Profile lookups answered from the identity cache.",
+            value=stats["hits"])
+        yield CounterMetricFamily(
+            "identity_cache_misses", "Profile lookups that read the users collection.",
+            value=stats["misses"])
+        yield GaugeMetricFamily(
+            "identity_cache_size", "Profiles held in the identity cache.",
+            value=stats["size"])
+
+
+mongo_collector = MongoCollector(mongo_monitor)
+identity_cache_collector = IdentityCacheCollector(identity_cache)
+# Collectors of this process's own state, served alongside the
+# multiprocess values.
+PROCESS_COLLECTORS = (mongo_collector, identity_cache_collector)
+for collector in PROCESS_COLLECTORS:
+    REGISTRY.register(collector)
+
+
+class Metrics:
+    """Records request metrics and serves /metrics."""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        # The labelled children, looked up once per route and method
+        # (and status) rather than on every request.
+        self._route_metrics = {}
+        self._status_counters = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", self.enabled)
+        if not self.enabled:
+            return
+        app.before_request(self.start_timer)
+        app.after_request(self.record)
+        app.add_url_rule("/metrics", "metrics", self.serve)
+
+    def start_timer(self):
+        g._metrics_started = time.perf_counter()
+
+    def record(self, response):
+        """Observe the request's latency, status and response size."""
+        started = g.pop("_metrics_started", None)
+        if started is None or request.endpoint == "metrics":
+            return response
+
+        rule = request.url_rule
+        key = (rule.rule if rule is not None else UNMATCHED_ROUTE, request.method)
+        route_metrics = self._route_metrics.get(key)
+        if route_metrics is None:
+            route_metrics = self._route_metrics[key] = (
+                REQUEST_LATENCY.labels(*key), RESPONSE_SIZE.labels(*key))
+        latency, size = route_metrics
+
+        latency.observe(time.perf_counter() - started)
+        self._status_counter(key, response.status_code).inc()
+        content_length = response.content_length
+        if content_length is not None:
+            size.observe(content_length)
+        return response
+
+    def observe_board_size(self, size):
+        if self.enabled:
+            BOARD_SIZE.observe(size)
+
+    def count_jwt_refresh(self, outcome):
+        if self.enabled:
+            JWT_REFRESHES.labels(outcome).inc()
+
+    def _status_counter(self, key, status):
+        counter = self._status_counters.get((key, status))
+        if counter is None:
+            counter = self._status_counters[(key, status)] = REQUESTS.labels(*key, str(status))
+        return counter
+
+    def serve(self):
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            for collector in PROCESS_COLLECTORS:
+                registry.register(collector)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
@@ -0,0 +1,212 @@
+"""
+MongoDB connection pool and command monitoring.
+
+pymongo listeners registered on the app's MongoClient (see
+database.init_mongo) that count, per server:
+
+- the connections open and checked out of the pool, and the pool's
+  high-water mark;
+- how long requests waited to check a connection out, and how many
+  gave up (waitQueueTimeoutMS) or found the pool closed;
+
+and, per command name, how many ran, how many failed and how long they
+took. snapshot() returns all of it, and /metrics exports it as the
+mongodb_* metrics (see application.metrics), for sizing gunicorn
+workers and MONGO_MAX_POOL_SIZE against what the server can take.
+
+Each process counts its own connections and commands.
+"""
+
+import threading
+import time
+
+from pymongo import monitoring
+
+
+class Timing:
+    """Count, total and maximum of a series of durations, in seconds."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "max_ms": self.max * 1000
+        }
+
+
+class PoolStats:
+    """The counters of one server's connection pool."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkout_wait = Timing()
+        self.checkout_timeouts = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+
+    def to_dict(self):
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "max_checked_out": self.max_checked_out,
+            "checkout_wait": self.checkout_wait.to_dict(),
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_failures": self.checkout_failures,
+            "cleared": self.cleared
+        }
+
+
+class MongoMonitor:
+    """Collects the pool and command events of the app's MongoClient."""
+
+    def __init__(self):
+        self._pools = {}
+        self._commands = {}
+        self._failures = {}
+        self._checkout_started = threading.local()
+        self._lock = threading.Lock()
+        self.listeners = [_PoolListener(self), _CommandListener(self)]
+
+    def snapshot(self):
+        """Return the pool counters by server address and the command timings by name."""
+        with self._lock:
+            return {
+                "pools": {
+                    _address(address): pool.to_dict()
+                    for address, pool in self._pools.items()
+                },
+                "commands": {
+                    name: dict(timing.to_dict(), failures=self._failures.get(name, 0))
+                    for name, timing in self._commands.items()
+                }
+            }
+
+    def reset(self):
+        """Forget every counter, e.g. in a process forked with a new client."""
+        with self._lock:
+            self._pools = {}
+            self._commands = {}
+            self._failures = {}
+
+    def _pool(self, address):
+        # Called with the lock held.
+        pool = self._pools.get(address)
+        if pool is None:
+            pool = self._pools[address] = PoolStats()
+        return pool
+
+    def _checkout_waited(self, address):
+        started = getattr(self._checkout_started, "at", None)
+        self._checkout_started.at = None
+        return time.perf_counter() - started if started is not None else None
+
+
+class _PoolListener(monitoring.ConnectionPoolListener):
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def pool_created(self, event):
+        with self.monitor._lock:
+            self.monitor._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self.monitor._lock:
+            self.monitor._pool(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self.monitor._lock:
+            self.monitor._pool(event.address).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self.monitor._lock:
+            pool = self.monitor._pool(event.address)
+            pool.open = max(0, pool.open - 1)
+
+    def connection_check_out_started(self, event):
+        # A checkout runs on the thread that asked for the connection.
+        self.monitor._checkout_started.at = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self.monitor._checkout_waited(event.address)
+        with self.monitor._lock:
+            pool = self.monitor._pool(event.address)
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                pool.checkout_timeouts += 1
+            else:
+                pool.checkout_failures += 1
+            if waited is not None:
+                pool.checkout_wait.add(waited)
+
+    def connection_checked_out(self, event):
+        waited = self.monitor._checkout_waited(event.address)
+        with self.monitor._lock:
+            pool = self.monitor._pool(event.address)
+            pool.checked_out += 1
+            pool.max_checked_out = max(pool.max_checked_out, pool.checked_out)
+            if waited is not None:
+                pool.checkout_wait.add(waited)
+
+    def connection_checked_in(self, event):
+        with self.monitor._lock:
+            pool = self.monitor._pool(event.address)
+            pool.checked_out = max(0, pool.checked_out - 1)
+
+
+class _CommandListener(monitoring.CommandListener):
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self.monitor._lock:
+            self._timing(event.command_name).add(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        with self.monitor._lock:
+            self._timing(event.command_name).add(event.duration_micros / 1e6)
+            failures = self.monitor._failures
+            failures[event.command_name] = failures.get(event.command_name, 0) + 1
+
+    def _timing(self, name):
+        commands = self.monitor._commands
+        timing = commands.get(name)
+        if timing is None:
+            timing = commands[name] = Timing()
+        return timing
+
+
+def _address(address):
+    host, port = address
+    return f"{host}:{port}" if port is not None else host
+
+
+mongo_monitor = MongoMonitor()
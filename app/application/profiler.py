@@ -0,0 +1,168 @@
+"""
+Per-request MongoDB command profiler.
+
+With MONGO_PROFILER on, every command a request issues is recorded:
+its name, collection, duration, reply size, and the application
+function that issued it (e.g. application.boards.models.update_task).
+The response gets a Server-Timing header with the total time spent in
+MongoDB and an entry per command, so the browser's network panel shows
+where a request's time went.
+
+A request taking MONGO_PROFILER_SLOW_MS or longer is also logged as a
+JSON trace of all its commands.
+
+Profiling costs a stack walk and a BSON encode of every reply, so it is
+off by default. The listener is always registered with the client, but
+outside a profiled request it returns before either.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+
+from bson import encode
+from flask import g, request
+from pymongo import monitoring
+
+
+# Server-Timing entries per response, beyond which commands are only counted.
+MAX_TIMING_ENTRIES = 30
+
+logger = logging.getLogger(__name__)
+
+
+class CommandProfiler:
+    """Collects the MongoDB commands of each request on the request's thread."""
+
+    def __init__(self, app=None):
+        self.slow_ms = None
+        self.listener = _ProfilerListener(self)
+        self._local = threading.local()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("MONGO_PROFILER", False):
+            return
+        self.slow_ms = app.config.get("MONGO_PROFILER_SLOW_MS", self.slow_ms)
+        app.before_request(self.start)
+        app.after_request(self.finish)
+        app.teardown_request(self.discard)
+
+    def start(self):
+        """Start recording the current request's commands."""
+        g._profiler_started = time.perf_counter()
+        self._local.commands = []
+        self._local.pending = {}
+
+    def finish(self, response):
+        """Add the Server-Timing header, and log the trace if the request was slow."""
+        commands = getattr(self._local, "commands", None)
+        if commands is None:
+            return response
+        self.discard()
+
+        elapsed_ms = (time.perf_counter() - g._profiler_started) * 1000
+        response.headers.add("Server-Timing", server_timing(commands, elapsed_ms))
+
+        if self.slow_ms is not None and elapsed_ms >= self.slow_ms:
+            logger.warning("Slow request: %s", json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "duration_ms": round(elapsed_ms, 3),
+                "mongo_ms": round(sum(c["duration_ms"] for c in commands), 3),
+                "commands": commands
+            }))
+        return response
+
+    def discard(self, exc=None):
+        """Stop recording on this thread."""
+        self._local.commands = None
+        self._local.pending = None
+
+    def commands(self):
+        """The commands recorded so far for the current request, or None."""
+        return getattr(self._local, "commands", None)
+
+
+class _ProfilerListener(monitoring.CommandListener):
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def started(self, event):
+        pending = getattr(self.profiler._local, "pending", None)
+        if pending is None:
+            return
+        collection = event.command.get(event.command_name)
+        pending[event.request_id] = {
+            "command": event.command_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "caller": _caller()
+        }
+
+    def succeeded(self, event):
+        command = self._pending_command(event)
+        if command is not None:
+            # Only a profiled request's replies are encoded to be measured.
+            self._record(command, event, reply_bytes=len(encode(event.reply)))
+
+    def failed(self, event):
+        command = self._pending_command(event)
+        if command is not None:
+            self._record(command, event, failed=True)
+
+    def _pending_command(self, event):
+        pending = getattr(self.profiler._local, "pending", None)
+        if pending is None:
+            return None
+        return pending.pop(event.request_id, None)
+
+    def _record(self, command, event, reply_bytes=0, failed=False):
+        command["duration_ms"] = event.duration_micros / 1000
+        command["reply_bytes"] = reply_bytes
+        if failed:
+            command["failed"] = True
+        self.profiler._local.commands.append(command)
+
+
+def server_timing(commands, elapsed_ms):
+    """
+    The Server-Timing header value: the request's total time, the time
+    in MongoDB, and one entry per command, e.g.
+    mongo-1;dur=1.2;desc="update boards (update_task) 312B".
+    """
+    mongo_ms = sum(command["duration_ms"] for command in commands)
+    entries = [
+        f'app;dur={elapsed_ms:.3f}',
+        f'mongo;dur={mongo_ms:.3f};desc="{len(commands)} commands"'
+    ]
+    for index, command in enumerate(commands[:MAX_TIMING_ENTRIES], start=1):
+        description = " ".join(filter(None, (
+            command["command"],
+            command["collection"],
+            f"({command['caller'].rpartition('.')[2]})" if command["caller"] else None,
+            f"{command['reply_bytes']}B"
+        )))
+        entries.append(f'mongo-{index};dur={command["duration_ms"]:.3f};desc="{description}"')
+    return ", ".join(entries)
+
+
+def _caller():
+    # The innermost application function on the stack, skipping this
+    # module: the model method (or view) that issued the command.
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("application.") and module != __name__:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+command_profiler = CommandProfiler()
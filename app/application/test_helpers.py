@@ -1,6 +1,107 @@
 """Helper functions for unit tests"""
 import json
+import socketserver
+import threading
+from pymongo import monitoring
 
 def client_post_helper(client, endpoint, data):
     return client.post(
-        endpoint, data=json.dumps(data), content_type='application/json')
\ No newline at end of file
+        endpoint, data=json.dumps(data), content_type='application/json')
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Record the name of every command sent to MongoDB.
+    Must be registered with pymongo.monitoring.register before
+    the app (and so the MongoClient) is created.
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.commands = []
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        stand_in = self.server.stand_in
+        with stand_in.lock:
+            if stand_in.refuse > 0:
+                stand_in.refuse -= 1
+                return
+            stand_in.connections += 1
+
+        self.reply("220 localhost SMTP stand-in")
+        mail_from, recipients = None, []
+
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                mail_from, recipients = command[10:], []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:])
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b"".join(iter(self.rfile.readline, b".\r\n"))
+                with stand_in.lock:
+                    stand_in.messages.append((mail_from, recipients, data))
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPStandIn:
+    """
+    A local SMTP server for tests, in the spirit of aiosmtpd's
+    Controller: accepts every message on 127.0.0.1:port and records it
+    as (mail_from, recipients, data) in messages. Set refuse to drop
+    that many of the next connections before the greeting.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.refuse = 0
+        self.lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,127 @@
+"""
+Password hashing pool.
+
+Hashing and checking a password are deliberately slow key derivations.
+Run on the request thread, a burst of logins keeps every worker thread
+busy and starves the board endpoints behind it. Here they run in a pool
+of PASSWORD_HASH_WORKERS processes (0 hashes on the request thread, as
+before), so at most that many derivations compete with the app for CPU.
+
+Admission control keeps a burst from queueing up behind the pool: at
+most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE hashing jobs are in
+flight per process, and a request that finds no room is refused at
+once with PasswordHashingBusyError (503) instead of holding a worker
+thread while it waits. A request that waits longer than
+PASSWORD_HASH_TIMEOUT is refused too, but its job keeps its place in
+flight until the pool has finished it.
+
+PASSWORD_HASH_METHOD and PASSWORD_HASH_SALT_LENGTH are the parameters
+new hashes are made with. A login whose stored hash was made with other
+parameters has its password rehashed, see needs_rehash.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from exceptions.handlers import PasswordHashingBusyError
+
+
+class PasswordHasher:
+    """Hashes and checks passwords in a bounded process pool."""
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.queue = 0
+        self.timeout = 10
+        self.method = "pbkdf2:sha256:260000"
+        self.salt_length = 16
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        if workers != self.workers:
+            self.shutdown()
+        self.workers = workers
+        self.queue = app.config.get("PASSWORD_HASH_QUEUE", self.queue)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", self.timeout)
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.salt_length = app.config.get("PASSWORD_HASH_SALT_LENGTH", self.salt_length)
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue) if self.workers else None
+
+    def hash(self, password):
+        """Hash a password with the configured method and salt length."""
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def check(self, password_hash, password):
+        """Return True if the password matches the hash."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Return True if the hash was made with another method (including
+        the iteration count, e.g. pbkdf2:sha256:260000) or salt length
+        than new hashes are.
+        """
+        method, _, rest = password_hash.partition("$")
+        salt, _, _ = rest.partition("$")
+        return method != self.method or len(salt) != self.salt_length
+
+    def shutdown(self):
+        """
+        Stop the pool's processes once their queued jobs are done. A
+        later hash starts a new pool.
+        """
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusyError()
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the job is done, not until we stop
+        # waiting: a job that timed out while running still has a
+        # process busy, and cancel can only stop one still queued.
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise PasswordHashingBusyError()
+
+    def _get_executor(self):
+        # Started on first use, so each gunicorn worker gets its own pool
+        # rather than sharing one created before the fork.
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # spawn, not fork: this process runs threads (pymongo's
+                # monitors, the board events watcher) a forked child
+                # would inherit in whatever state they were in.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+
+password_hasher = PasswordHasher()
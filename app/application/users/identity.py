@@ -0,0 +1,136 @@
+"""
+Identity cache.
+
+Turns the JWT identity (the user's email) into the user's profile
+without a users lookup on every request. Profiles are memoised for
+the lifetime of a request on flask.g, and for IDENTITY_CACHE_TTL
+seconds per process. Access tokens also carry the user's _id as a
+"uid" claim, so endpoints that only need the _id never touch the
+users collection.
+
+User's writes (register, confirm_email) invalidate the cached
+profile; rehash_password only changes the password, which profiles
+leave out. Each gunicorn worker holds its own
+cache, so invalidation only reaches the worker that made the change;
+the TTL bounds how stale the other workers can be.
+
+hits and misses count lookups of a profile only, not the _ids read
+from a token's uid claim. They are exported at /metrics.
+"""
+
+import threading
+import time
+
+from bson.objectid import ObjectId
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+from application.users.models import User
+
+
+USER_ID_CLAIM = "uid"
+
+
+class IdentityCache:
+    """Request and process level cache of user profiles, keyed by JWT identity."""
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self.max_size = 10000
+        self.hits = 0
+        self.misses = 0
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("IDENTITY_CACHE_TTL", self.ttl)
+        self.max_size = app.config.get("IDENTITY_CACHE_MAX_SIZE", self.max_size)
+
+    def get_profile(self, email):
+        """
+        Return the profile of the user with the given email,
+        without the password field, or None if there is no such user.
+        """
+        request_profiles = g.setdefault("_identity_profiles", {})
+        if email in request_profiles:
+            self._count(hit=True)
+            return request_profiles[email]
+
+        with self._lock:
+            cached = self._profiles.get(email)
+
+        if cached is not None and cached[1] > time.monotonic():
+            self._count(hit=True)
+            profile = cached[0]
+        else:
+            self._count(hit=False)
+            profile = User.find_user_no_password(email)
+            if profile is not None:
+                self._store(email, profile)
+
+        request_profiles[email] = profile
+        return profile
+
+    def current_profile(self):
+        """Return the profile of the user making the current request."""
+        return self.get_profile(get_jwt_identity())
+
+    def current_user_id(self):
+        """
+        Return the ObjectId of the user making the current request.
+        Read from the token's uid claim when present, so no lookup is needed.
+        """
+        user_id = get_jwt().get(USER_ID_CLAIM)
+        if user_id is not None:
+            return ObjectId(user_id)
+
+        profile = self.current_profile()
+        return profile["_id"] if profile is not None else None
+
+    def invalidate(self, email):
+        """Drop any cached profile for the given email."""
+        with self._lock:
+            self._profiles.pop(email, None)
+        g.get("_identity_profiles", {}).pop(email, None)
+
+    def stats(self):
+        """Return the hit and miss counters, and the hit ratio."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._profiles)
+            }
+
+    def _store(self, email, profile):
+        with self._lock:
+            if len(self._profiles) >= self.max_size:
+                # Dicts keep insertion order, so this evicts the oldest entry.
+                self._profiles.pop(next(iter(self._profiles)))
+            self._profiles[email] = (profile, time.monotonic() + self.ttl)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+def user_id_claims(user_id):
+    """Additional JWT claims identifying the user by _id."""
+    return {USER_ID_CLAIM: str(user_id)}
+
+
+def current_user_claims():
+    """Carry the current token's uid claim over to a freshly minted token."""
+    user_id = get_jwt().get(USER_ID_CLAIM)
+    return user_id_claims(user_id) if user_id is not None else {}
+
+
+identity_cache = IdentityCache()
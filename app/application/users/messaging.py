@@ -1,13 +1,15 @@
-from application.mail import mailing
-from flask_mail import Message
-import os
+from flask import current_app
+
+from application.users.outbox import mail_outbox
 
 def send_email(to, subject, url, template=None):
-    msg = Message(
+    """
+    Queue an email for the outbox worker to send (see
+    application.users.outbox); returns without contacting the mail server.
+    """
+    return mail_outbox.enqueue(
+        to,
         subject,
-        recipients=[to],
         body=f"Visit this link to confirm your email: {url}",
-        sender=os.environ.get('MAIL_DEFAULT_SENDER')
+        sender=current_app.config['MAIL_DEFAULT_SENDER']
     )
-
-    mailing_attempt = mailing.send(msg)
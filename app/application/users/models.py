@@ -1,6 +1,6 @@
 
 
-from werkzeug.security import generate_password_hash, check_password_hash
+from application.users.hashing import password_hasher
 from exceptions.handlers import (
     EmailExistsError,
     EmailValidationError,
@@ -10,6 +10,8 @@ from exceptions.handlers import (
     PasswordSpecialCharacterError
     )
 from application.database import mongo
+from pymongo.collection import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import requests
 from requests.structures import CaseInsensitiveDict
 import os
@@ -100,27 +102,49 @@ class User:
 
         if not user_exists:
             if self._check_password_valid(user_data['password']):
-                user_data["password"] = generate_password_hash(
+                user_data["password"] = password_hasher.hash(
                     user_data['password'])
-                mongo.db.users.insert_one(user_data)
+                try:
+                    mongo.db.users.insert_one(user_data)
+                except DuplicateKeyError:
+                    # Lost a race with a concurrent registration;
+                    # the unique index on email caught it.
+                    raise EmailExistsError()
+                _invalidate_profile(user_data["email"])
     
     @staticmethod
-    def update_email_verification_status(user_id):
-
-        mongo.db.users.update_one({
-            "_id": user_id,
-        },{
-              "$set": {
-                "is_confirmed": True
-            }
-        })
-    
+    def confirm_email(email):
+        """
+        Mark the user with this email as confirmed. Returns the user,
+        without the password field, or None if there is no such user.
+        """
+        user = mongo.db.users.find_one_and_update(
+            {"email": email},
+            {"$set": {"is_confirmed": True}},
+            {"password": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        _invalidate_profile(email)
+        return user
+
     @staticmethod
     def check_password(password_hash, password):
         """
         Confirm that the password hash matches the password passed in.
         """
-        return check_password_hash(password_hash, password)
+        return password_hasher.check(password_hash, password)
+
+    @staticmethod
+    def rehash_password(user_id, password_hash, password):
+        """
+        Store a new hash of the password, made with the current hashing
+        parameters, unless the stored hash has changed since password_hash
+        was read.
+        """
+        mongo.db.users.update_one(
+            {"_id": user_id, "password": password_hash},
+            {"$set": {"password": password_hasher.hash(password)}}
+        )
 
     @staticmethod
     def find_user_by_email(email):
@@ -139,3 +163,9 @@ class User:
         return mongo.db.users.find_one(
             {'email': email}, {'password': 0, 'is_confirmed': 0})
 
+
+def _invalidate_profile(email):
+    """Drop the identity cache's copy of a user's profile after a write."""
+    # Imported here: the identity cache looks profiles up through User.
+    from application.users.identity import identity_cache
+    identity_cache.invalidate(email)
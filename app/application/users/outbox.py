@@ -0,0 +1,258 @@
+"""
+Email outbox.
+
+send_email doesn't talk to the mail server: it stores the message in
+the mail_outbox collection and returns, so a request never waits on
+SMTP. The outbox is drained by a background thread in each app process
+(MAIL_OUTBOX_WORKER = "thread") or by the mail-outbox CLI command,
+which can run on its own (MAIL_OUTBOX_WORKER = "off").
+
+Each round claims up to MAIL_OUTBOX_BATCH_SIZE due messages and sends
+them over a single SMTP connection (mailing.connect()). A message that
+can't be sent is retried MAIL_OUTBOX_BACKOFF seconds later, doubling
+with each attempt, and marked failed after MAIL_OUTBOX_MAX_ATTEMPTS.
+
+Claimed messages are leased for MAIL_OUTBOX_LEASE seconds. If the
+worker holding them dies, they are claimed again once the lease runs
+out, so a message may be sent twice but is never lost. Sent messages
+are kept for a week (a TTL index on sent_at).
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import with_appcontext
+from flask_mail import Message
+
+from application.database import mongo
+from application.mail import mailing
+
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+WORKER_THREAD = "thread"
+WORKER_OFF = "off"
+
+logger = logging.getLogger(__name__)
+
+
+class MailOutbox:
+    """Stores outgoing email and sends it in batches, with retries."""
+
+    def __init__(self, app=None):
+        self.worker = WORKER_THREAD
+        self.batch_size = 50
+        self.poll_interval = 5
+        self.max_attempts = 6
+        self.backoff = 30
+        self.lease = 300
+        self._app = None
+        self._thread = None
+        self._thread_pid = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.worker = app.config.get("MAIL_OUTBOX_WORKER", self.worker)
+        self.batch_size = app.config.get("MAIL_OUTBOX_BATCH_SIZE", self.batch_size)
+        self.poll_interval = app.config.get("MAIL_OUTBOX_POLL_INTERVAL", self.poll_interval)
+        self.max_attempts = app.config.get("MAIL_OUTBOX_MAX_ATTEMPTS", self.max_attempts)
+        self.backoff = app.config.get("MAIL_OUTBOX_BACKOFF", self.backoff)
+        self.lease = app.config.get("MAIL_OUTBOX_LEASE", self.lease)
+        self._app = app
+        app.cli.add_command(mail_outbox_command)
+
+    def enqueue(self, to, subject, body, sender=None):
+        """Store a message for sending and return its _id."""
+        now = datetime.now(timezone.utc)
+        message_id = mongo.db.mail_outbox.insert_one({
+            "to": to,
+            "subject": subject,
+            "body": body,
+            "sender": sender,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        }).inserted_id
+
+        if self.worker == WORKER_THREAD:
+            self._ensure_worker()
+            self._wake.set()
+        return message_id
+
+    def claim_batch(self):
+        """
+        Claim up to batch_size due messages (pending and due for an
+        attempt, or sending with an expired lease) and return them.
+        The claim token keeps two workers from taking the same message.
+        """
+        now = datetime.now(timezone.utc)
+        due = {
+            "$or": [
+                {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": SENDING, "lease_until": {"$lte": now}}
+            ]
+        }
+
+        message_ids = [
+            message["_id"] for message in
+            mongo.db.mail_outbox.find(due, {"_id": 1})
+            .sort("next_attempt_at", 1)
+            .limit(self.batch_size)
+        ]
+        if not message_ids:
+            return []
+
+        claim = ObjectId()
+        mongo.db.mail_outbox.update_many(
+            {"_id": {"$in": message_ids}, **due},
+            {"$set": {
+                "status": SENDING,
+                "claim": claim,
+                "lease_until": now + timedelta(seconds=self.lease)
+            }}
+        )
+        return list(mongo.db.mail_outbox.find({"claim": claim}))
+
+    def deliver_batch(self):
+        """
+        Claim a batch and send it over one SMTP connection. Returns the
+        number of messages sent and the number that will be retried or
+        have failed for good.
+        """
+        messages = self.claim_batch()
+        if not messages:
+            return 0, 0
+
+        sent = []
+        unsent = []
+
+        try:
+            with mailing.connect() as connection:
+                for index, message in enumerate(messages):
+                    try:
+                        connection.send(Message(
+                            message["subject"],
+                            recipients=[message["to"]],
+                            body=message["body"],
+                            sender=message.get("sender")
+                        ))
+                        sent.append(message)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                            smtplib.SMTPDataError) as e:
+                        # Refused by the server; the connection is still good.
+                        unsent.append((message, e))
+                    except OSError as e:
+                        # The connection is gone (SMTPException is an OSError);
+                        # the rest of the batch waits.
+                        unsent.extend((m, e) for m in messages[index:])
+                        break
+        except OSError as e:
+            unsent = [(message, e) for message in messages if message not in sent]
+
+        if sent:
+            mongo.db.mail_outbox.update_many(
+                {"_id": {"$in": [message["_id"] for message in sent]}},
+                {
+                    "$set": {"status": SENT, "sent_at": datetime.now(timezone.utc)},
+                    "$unset": {"claim": "", "lease_until": ""}
+                }
+            )
+        for message, error in unsent:
+            self._retry_later(message, error)
+        return len(sent), len(unsent)
+
+    def drain(self):
+        """
+        Deliver batches until nothing is due. Returns the number of
+        messages sent and the number that weren't.
+        """
+        total_sent = total_unsent = 0
+        while True:
+            sent, unsent = self.deliver_batch()
+            total_sent += sent
+            total_unsent += unsent
+            if sent + unsent == 0:
+                return total_sent, total_unsent
+
+    def stop(self):
+        """Stop this process's worker thread, if it is running."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join()
+        self._thread = None
+        self._stopping.clear()
+
+    def _retry_later(self, message, error):
+        attempts = message.get("attempts", 0) + 1
+        update = {
+            "status": FAILED if attempts >= self.max_attempts else PENDING,
+            "attempts": attempts,
+            "next_attempt_at": datetime.now(timezone.utc)
+            + timedelta(seconds=self.backoff * 2 ** (attempts - 1)),
+            "last_error": str(error)
+        }
+        mongo.db.mail_outbox.update_one(
+            {"_id": message["_id"], "claim": message["claim"]},
+            {"$set": update, "$unset": {"claim": "", "lease_until": ""}}
+        )
+        if update["status"] == FAILED:
+            logger.warning("Giving up on email %s to %s: %s",
+                           message["_id"], message["to"], error)
+
+    def _ensure_worker(self):
+        # Started on first use, so each gunicorn worker starts its own
+        # thread rather than inheriting a dead one across the fork.
+        with self._lock:
+            if (self._thread is None or self._thread_pid != os.getpid()
+                    or not self._thread.is_alive()):
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._app,), daemon=True,
+                    name="mail-outbox")
+                self._thread_pid = os.getpid()
+                self._thread.start()
+
+    def _run(self, app):
+        while not self._stopping.is_set():
+            try:
+                with app.app_context():
+                    sent, unsent = self.deliver_batch()
+            except Exception:
+                logger.exception("Mail outbox worker failed to deliver a batch")
+                sent = unsent = 0
+
+            if sent + unsent < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+mail_outbox = MailOutbox()
+
+
+@click.command("mail-outbox")
+@click.option("--watch", is_flag=True,
+              help="Keep delivering as messages come in, until interrupted.")
+@with_appcontext
+def mail_outbox_command(watch):
+    """Send the messages waiting in the email outbox."""
+    while True:
+        sent, unsent = mail_outbox.drain()
+        click.echo(f"Sent {sent} messages; {unsent} to retry or failed.")
+        if not watch:
+            return
+        time.sleep(mail_outbox.poll_interval)
@@ -0,0 +1,124 @@
+"""
+Access token refresh.
+
+An access token within JWT_REFRESH_WINDOW seconds of expiring is
+replaced by a fresh one, set as the access cookie on the response. This
+runs once for the whole app, after every request, rather than in each
+blueprint.
+
+A token is rotated at most once per process: its jti is remembered
+until the token expires, so a client polling with the same token isn't
+sent a newly signed token on every response. Responses to requests
+without a verified JWT are passed through untouched.
+
+Minted tokens are counted per minute for the last
+JWT_REFRESH_STATS_MINUTES minutes, see stats, and exported as the
+jwt_refresh_total metric.
+"""
+
+import threading
+import time
+from collections import deque
+
+from flask_jwt_extended import (
+    create_access_token,
+    get_jwt,
+    get_jwt_identity,
+    set_access_cookies
+)
+
+from application.users.identity import current_user_claims
+from application.metrics import metrics
+
+
+class TokenRefresher:
+    """Rotates expiring access tokens, once per token."""
+
+    def __init__(self, app=None):
+        self.window = 1800
+        self.stats_minutes = 60
+        self.prune_size = 1000
+        self.minted = 0
+        self.skipped = 0
+        self._rotated = {}
+        self._prune_at = self.prune_size
+        self._minutes = deque()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.window = app.config.get("JWT_REFRESH_WINDOW", self.window)
+        self.stats_minutes = app.config.get("JWT_REFRESH_STATS_MINUTES", self.stats_minutes)
+        app.after_request(self.refresh_expiring_jwt)
+
+    def refresh_expiring_jwt(self, response):
+        """Set a fresh access cookie if the request's token is about to expire."""
+        try:
+            claims = get_jwt()
+        except RuntimeError:
+            # No JWT was verified for this request.
+            return response
+        if claims.get("type") != "access" or "exp" not in claims:
+            return response
+
+        now = time.time()
+        if claims["exp"] - now > self.window:
+            return response
+        if not self._claim_rotation(claims.get("jti"), claims["exp"], now):
+            metrics.count_jwt_refresh("skipped")
+            return response
+
+        access_token = create_access_token(
+            identity=get_jwt_identity(),
+            additional_claims=current_user_claims())
+        set_access_cookies(response, access_token)
+        metrics.count_jwt_refresh("minted")
+        return response
+
+    def stats(self):
+        """
+        Return the number of tokens minted and rotations skipped, and the
+        tokens minted in each of the recent minutes, oldest first.
+        """
+        with self._lock:
+            self._expire_minutes(time.time())
+            return {
+                "minted": self.minted,
+                "skipped": self.skipped,
+                "minted_per_minute": [count for _, count in self._minutes],
+                "tracked_tokens": len(self._rotated)
+            }
+
+    def _claim_rotation(self, jti, expires, now):
+        # True for the first request to rotate this token; the marker
+        # lasts until the token expires, after which it can't be used.
+        with self._lock:
+            if jti in self._rotated:
+                self.skipped += 1
+                return False
+
+            if len(self._rotated) >= self._prune_at:
+                self._rotated = {
+                    key: exp for key, exp in self._rotated.items() if exp > now
+                }
+                self._prune_at = max(self.prune_size, 2 * len(self._rotated))
+            self._rotated[jti] = expires
+            self.minted += 1
+
+            minute = int(now // 60)
+            if self._minutes and self._minutes[-1][0] == minute:
+                self._minutes[-1][1] += 1
+            else:
+                self._minutes.append([minute, 1])
+            self._expire_minutes(now)
+            return True
+
+    def _expire_minutes(self, now):
+        oldest = int(now // 60) - self.stats_minutes
+        while self._minutes and self._minutes[0][0] <= oldest:
+            self._minutes.popleft()
+
+
+token_refresher = TokenRefresher()
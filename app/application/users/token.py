@@ -1,23 +1,57 @@
-from itsdangerous import URLSafeTimedSerializer
-import os
+"""
+Email confirmation tokens.
+
+token_service is set up once by create_app from the app's config:
+SECRET_KEY signs new tokens, and tokens signed with any key listed in
+SECRET_KEY_FALLBACKS still verify, so the key can be rotated without
+invalidating confirmation links already sent. SECURITY_PASSWORD_SALT
+is the salt, and EMAIL_TOKEN_MAX_AGE (seconds) how long a token lasts.
+"""
+
+from itsdangerous import URLSafeTimedSerializer, BadData
+
+
+class TokenService:
+    """Signs and verifies email confirmation tokens with one serializer."""
+
+    def __init__(self, app=None):
+        self.max_age = 3600
+        self._serializer = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # itsdangerous signs with the last key and verifies with any of them.
+        secret_keys = [
+            *app.config.get("SECRET_KEY_FALLBACKS", []),
+            app.config["SECRET_KEY"]
+        ]
+        self._serializer = URLSafeTimedSerializer(
+            secret_keys, salt=app.config.get("SECURITY_PASSWORD_SALT"))
+        self.max_age = app.config.get("EMAIL_TOKEN_MAX_AGE", self.max_age)
+
+    def generate(self, email):
+        return self._serializer.dumps(email)
+
+    def confirm(self, token, max_age=None):
+        """
+        Return the email a token was generated for, or False if the token
+        is invalid or older than max_age (default EMAIL_TOKEN_MAX_AGE).
+        """
+        try:
+            return self._serializer.loads(
+                token, max_age=max_age if max_age is not None else self.max_age)
+        except BadData:
+            return False
+
+
+token_service = TokenService()
+
 
 def generate_token(email):
-    serializer = URLSafeTimedSerializer(os.environ.get("SECRET_KEY"))
-    return serializer.dumps(
-        email,
-        salt=os.environ.get("SECURITY_PASSWORD_SALT")
-    )
-
-
-def confirm_token(token, expiration=3600):
-    serializer = URLSafeTimedSerializer(os.environ.get("SECRET_KEY"))
-    
-    try:
-        email = serializer.loads(
-            token,
-            salt=os.environ.get("SECURITY_PASSWORD_SALT"),
-            max_age=expiration
-        )
-        return email
-    except Exception:
-        return False
+    return token_service.generate(email)
+
+
+def confirm_token(token, expiration=None):
+    return token_service.confirm(token, max_age=expiration)
@@ -1,15 +1,18 @@
 from flask import Blueprint, request, jsonify, session, make_response
-from werkzeug.exceptions import HTTPException
 from flask_cors import CORS
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
     jwt_required,
     get_jwt_identity,
-    get_jwt,
     set_access_cookies
     )
 from application.users.models import User
+from application.users.identity import (
+    identity_cache,
+    user_id_claims,
+    current_user_claims
+    )
 from exceptions.handlers import (
     EmailExistsError,
     EmailValidationError,
@@ -17,17 +20,14 @@ from exceptions.handlers import (
     PasswordCharacterCaseError,
     PasswordDigitError,
     PasswordSpecialCharacterError,
-    InvalidAPIUsage
+    PasswordHashingBusyError
     )
+from application.users.hashing import password_hasher
 from application.users.messaging import send_email
 
-from application.helpers import parse_json
 
 from application.users.token import generate_token, confirm_token
-from application.database import mongo
-
 
-from datetime import datetime, timezone, timedelta
 
 
 users = Blueprint("users", __name__)
@@ -35,20 +35,13 @@ users = Blueprint("users", __name__)
 CORS(users, supports_credentials=True, resources=r"*")
 
 
-@users.after_request
-def refresh_expiring_jwts(response):
-    try:
-        exp_timestamp = get_jwt()["exp"]
-        now = datetime.now(timezone.utc)
-        target_timestamp = datetime.timestamp(now + timedelta(minutes=30))
-        if target_timestamp > exp_timestamp:
-            access_token = create_access_token(identity=get_jwt_identity())
-            set_access_cookies(response, access_token)
-        return response
-    except (RuntimeError, KeyError):
-        return response
-
-
+@users.errorhandler(PasswordHashingBusyError)
+def password_hashing_busy(e):
+    """503 when the password hashing pool has no room; try again shortly."""
+    response = jsonify(msg=e.description)
+    response.status_code = e.code
+    response.headers["Retry-After"] = "1"
+    return response
 
 
 @users.route('/')
@@ -60,7 +53,8 @@ def index():
 @jwt_required(refresh=True)
 def refresh_jwt():
     current_user = get_jwt_identity()
-    new_token = create_access_token(identity=current_user)
+    new_token = create_access_token(
+        identity=current_user, additional_claims=current_user_claims())
 
     return jsonify({
         "access_token": new_token
@@ -70,9 +64,8 @@ def refresh_jwt():
 @users.route('/user_profile', methods=['GET'])
 @jwt_required()
 def user_profile():
-    user_email = get_jwt_identity()
-    user = User.find_user_no_password(user_email)
-    return parse_json(user), 200
+    user = identity_cache.current_profile()
+    return jsonify(user), 200
 
 
 @users.route('/register', methods=["POST"])
@@ -98,11 +91,12 @@ def register():
 
             confirm_url = f"127.0.0.1:8000/confirm_email/{token}"
             subject = 'Please confirm your email address.'
-            # send_email(
-            #     new_user.email,
-            #     subject,
-            #     url=confirm_url
-            # )
+            # Only queued here; the outbox worker sends it.
+            send_email(
+                new_user.email,
+                subject,
+                url=confirm_url
+            )
 
         except EmailValidationError:
             error_msg = jsonify(msg="Email address is invalid.")
@@ -138,16 +132,16 @@ def confirm_email(token):
     confirm_token should return the email address associated with the user
     who owns the token.
 
-    If so, update the 'is_confirmed' status of the user object in DB.
+    If so, set the 'is_confirmed' status of the user in a single
+    update, and return the user (without the password hash). Confirming
+    again returns the user as well.
     If not, return 400 error.
     """
     email = confirm_token(token)
+    user = User.confirm_email(email) if email else None
 
-    user = mongo.db.users.find_one({"email": email})
-
-    if user and user['email'] == email:
-        User.update_email_verification_status(user['_id'])
-        return parse_json(user), 200
+    if user is not None:
+        return jsonify(user), 200
     else:
         return jsonify({
             'msg': 'The link is either invalid or has expired.'
@@ -175,8 +169,13 @@ def login():
         if user:
             password_check = User.check_password(user['password'], password)
             if password_check:
-                token = create_access_token(identity=email)
-                refresh_token = create_refresh_token(identity=email)
+                if password_hasher.needs_rehash(user['password']):
+                    User.rehash_password(user["_id"], user['password'], password)
+                claims = user_id_claims(user["_id"])
+                token = create_access_token(
+                    identity=email, additional_claims=claims)
+                refresh_token = create_refresh_token(
+                    identity=email, additional_claims=claims)
                 response = jsonify({
                     "token": token
                 })
@@ -0,0 +1,88 @@
+"""
+Compare two benchmark suite results.
+
+Prints, for every workload in both files, the throughput and the
+p50/p95/p99 latency of each and the change from the first to the
+second. A change for the worse beyond --threshold percent (lower
+throughput, higher latency) is flagged, and makes the exit status 1,
+so a script can fail on a regression:
+
+    python -m benchmarks.compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+Results are only comparable when taken on the same machine with the
+same parameters; a difference in either is reported first.
+"""
+
+import argparse
+import json
+import sys
+
+
+# (field, label, True if higher is better)
+FIELDS = (
+    ("throughput", "req/s", True),
+    ("p50_ms", "p50 ms", False),
+    ("p95_ms", "p95 ms", False),
+    ("p99_ms", "p99 ms", False),
+)
+
+
+def change(base, head):
+    """The relative change from base to head, in percent."""
+    if base == 0:
+        return 0.0 if head == 0 else float("inf")
+    return (head - base) / base * 100
+
+
+def compare(base, head, threshold):
+    """Return the report lines and the number of regressions."""
+    lines = []
+    regressions = 0
+
+    for key in ("machine", "transport", "task_storage", "parameters"):
+        if base.get(key) != head.get(key):
+            lines.append(f"Note: {key} differs: {base.get(key)} vs {head.get(key)}")
+
+    lines.append(f"{'':<11} {'':<7} {base.get('commit') or 'base':>12} "
+                 f"{head.get('commit') or 'head':>12} {'change':>9}")
+    for workload, base_summary in base["workloads"].items():
+        head_summary = head["workloads"].get(workload)
+        if head_summary is None:
+            continue
+        for field, label, higher_is_better in FIELDS:
+            delta = change(base_summary[field], head_summary[field])
+            worse = -delta if higher_is_better else delta
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            lines.append(
+                f"{workload:<11} {label:<7} {base_summary[field]:12.2f} "
+                f"{head_summary[field]:12.2f} {delta:+8.1f}%{flag}")
+        if head_summary["errors"] > base_summary["errors"]:
+            lines.append(f"{workload:<11} errors  {base_summary['errors']:12d} "
+                         f"{head_summary['errors']:12d}  REGRESSION")
+            regressions += 1
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark suite results.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="Percent change for the worse reported as a regression.")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    lines, regressions = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Synthetic users and boards for the benchmark suite.
+
+generate creates USERS users, each with BOARDS boards of COLUMNS
+columns, each column holding TASKS tasks of SUBTASKS subtasks. Titles
+and descriptions come from a seeded random generator, so the same
+arguments always produce the same data. Boards are written with the
+import path (BoardImporter), so they land in whichever task storage
+layout BOARD_TASK_STORAGE selects.
+
+Generated users have emails under @bench.example.com and the password
+PASSWORD. clear removes them with their boards and tasks.
+
+Run from the app directory, with the usual MONGODB_* / MAIL_*
+environment and a reachable server, to leave a data set in place:
+
+    python -m benchmarks.datagen --users 8 --boards 2 --columns 4 --tasks 50 --subtasks 3
+    python -m benchmarks.datagen --clear
+"""
+
+import argparse
+import random
+
+from bson.objectid import ObjectId
+
+from application import create_app
+from application.boards.models import Board
+from application.boards.transfer import BoardImporter
+from application.database import mongo
+from application.users.hashing import password_hasher
+
+
+EMAIL_DOMAIN = "bench.example.com"
+PASSWORD = "benchPass123!"
+
+WORDS = (
+    "review", "deploy", "design", "fix", "write", "plan", "test", "update", "refactor",
+    "migrate", "document", "measure", "release", "triage", "profile", "cache", "index",
+    "board", "column", "task", "login", "export", "import", "mobile", "layout", "api"
+)
+
+
+def email(index):
+    return f"user{index}@{EMAIL_DOMAIN}"
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count)).capitalize()
+
+
+def board_records(rng, name, columns, tasks, subtasks):
+    """The records of one board, in the export format read by BoardImporter."""
+    board_id = ObjectId()
+    yield {"type": "board", "_id": board_id, "name": name}
+
+    column_ids = [ObjectId() for _ in range(columns)]
+    for number, column_id in enumerate(column_ids, 1):
+        yield {"type": "column", "board_id": board_id, "_id": column_id,
+               "name": f"Column {number}"}
+
+    for number, column_id in enumerate(column_ids, 1):
+        for _ in range(tasks):
+            yield {
+                "type": "task",
+                "board_id": board_id,
+                "column_id": column_id,
+                "title": words(rng, rng.randint(2, 5)),
+                "description": words(rng, rng.randint(5, 30)),
+                "status": f"Column {number}",
+                "subtasks": [
+                    {"_id": ObjectId(), "title": words(rng, rng.randint(2, 4)),
+                     "isCompleted": rng.random() < 0.5}
+                    for _ in range(subtasks)
+                ]
+            }
+
+
+def generate(users, boards, columns, tasks, subtasks, seed=0, chunk_size=1000):
+    """
+    Create the data set and return it as a list of users, each with
+    its email and boards. A board lists its columns with their _id,
+    name and tasks, as stored.
+    """
+    rng = random.Random(seed)
+    password_hash = password_hasher.hash(PASSWORD)
+    dataset = []
+
+    for user_index in range(users):
+        user_id = mongo.db.users.insert_one({
+            "username": f"Benchmark User {user_index}",
+            "email": email(user_index),
+            "password": password_hash,
+            "is_confirmed": True
+        }).inserted_id
+
+        importer = BoardImporter(user_id, chunk_size)
+        for board_index in range(boards):
+            for record in board_records(
+                    rng, f"Board {board_index}", columns, tasks, subtasks):
+                importer.add(record)
+        importer.finish()
+
+        dataset.append({"email": email(user_index), "boards": read_boards(user_id)})
+    return dataset
+
+
+def read_boards(user_id):
+    """A user's boards as generate returns them."""
+    boards = []
+    for board in Board.export_boards(user_id, 100):
+        columns = {
+            column["_id"]: {"_id": column["_id"], "name": column["name"], "tasks": []}
+            for column in board["columns"]
+        }
+        for task in Board.export_tasks(board["_id"], 1000):
+            columns[task.pop("column_id")]["tasks"].append(task)
+        boards.append({"_id": board["_id"], "columns": list(columns.values())})
+    return boards
+
+
+def clear():
+    """Remove the generated users, their boards and their tasks."""
+    user_ids = [
+        user["_id"] for user in
+        mongo.db.users.find({"email": {"$regex": f"@{EMAIL_DOMAIN}$"}}, {"_id": 1})
+    ]
+    board_ids = [
+        board["_id"] for board in
+        mongo.db.boards.find({"user": {"$in": user_ids}}, {"_id": 1})
+    ]
+    mongo.db.tasks.delete_many({"board_id": {"$in": board_ids}})
+    mongo.db.boards.delete_many({"_id": {"$in": board_ids}})
+    mongo.db.users.delete_many({"_id": {"$in": user_ids}})
+
+
+def add_arguments(parser):
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--boards", type=int, default=2)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--subtasks", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark users and boards.")
+    add_arguments(parser)
+    parser.add_argument("--clear", action="store_true",
+                        help="Remove the generated data instead.")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        clear()
+        if not args.clear:
+            dataset = generate(args.users, args.boards, args.columns, args.tasks,
+                               args.subtasks, args.seed)
+            task_count = sum(
+                len(column["tasks"]) for user in dataset
+                for board in user["boards"] for column in board["columns"])
+            print(f"Generated {len(dataset)} users, "
+                  f"{sum(len(user['boards']) for user in dataset)} boards "
+                  f"and {task_count} tasks.")
+
+
+if __name__ == "__main__":
+    main()
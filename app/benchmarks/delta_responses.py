@@ -0,0 +1,113 @@
+"""
+Compare full-board and delta responses from the mutating endpoints.
+
+For boards of increasing size, times add_task and update_task through
+the Flask test client, once answered with the whole board and once with
+Prefer: return=minimal, and reports the response size and the p50/p99
+latency of each.
+
+Requires the usual MONGODB_* / MAIL_* environment and a reachable server.
+Run from the app directory:
+
+    python -m benchmarks.delta_responses
+"""
+
+import json
+import time
+
+from bson.objectid import ObjectId
+from flask_jwt_extended import create_access_token
+
+from application import create_app
+from application.boards.models import Board
+from application.database import mongo
+
+
+# (columns, tasks per column)
+BOARD_SIZES = ((3, 10), (5, 200), (10, 1000))
+REQUESTS = 200
+EMAIL = "benchmark@example.com"
+
+
+def seed_board(columns, tasks):
+    board_columns = [
+        {
+            "_id": ObjectId(),
+            "name": f"Column {c}",
+            "tasks": [
+                {
+                    "_id": ObjectId(),
+                    "title": f"Task {t}",
+                    "description": "Lorem ipsum dolor sit amet " * 4,
+                    "status": f"Column {c}",
+                    "subtasks": [
+                        {"_id": ObjectId(), "title": f"Subtask {s}", "isCompleted": False}
+                        for s in range(3)
+                    ]
+                }
+                for t in range(tasks)
+            ]
+        }
+        for c in range(columns)
+    ]
+    board_id = Board(ObjectId(), "Benchmark Board", board_columns).add_board()
+    return str(board_id), board_columns[0]["tasks"][0]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def run(client, method, url, payload, headers):
+    timings = []
+    size = 0
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        res = client.open(url, method=method, headers=headers,
+                          data=json.dumps(payload), content_type="application/json")
+        timings.append(time.perf_counter() - start)
+        size = len(res.data)
+    return size, percentile(timings, 0.5) * 1000, percentile(timings, 0.99) * 1000
+
+
+def main():
+    app = create_app()
+    client = app.test_client()
+
+    with app.test_request_context():
+        token = create_access_token(identity=EMAIL)
+    with client.session_transaction() as session:
+        session["user_email"] = EMAIL
+
+    for columns, tasks in BOARD_SIZES:
+        board_id, task = seed_board(columns, tasks)
+        task_id = str(task["_id"])
+        new_task = {"title": "New Task", "description": "", "status": "Column 0", "subtasks": []}
+        update = {
+            "title": "Renamed Task",
+            "description": task["description"],
+            "status": "Column 0",
+            "subtasks": []
+        }
+
+        for label, headers in (("full", {}), ("minimal", {"Prefer": "return=minimal"})):
+            headers = dict(headers, Authorization=f"Bearer {token}")
+            results = {
+                "add_task": run(client, "POST", f"/api/add_task/{board_id}/Column 0",
+                                new_task, headers),
+                "update_task": run(client, "PATCH",
+                                   f"/api/update_task/{board_id}/Column 0/{task_id}",
+                                   update, headers)
+            }
+            for endpoint, (size, p50, p99) in results.items():
+                print(
+                    f"{columns * tasks:>6} tasks {endpoint:<12} {label:<8} "
+                    f"{size:>10} bytes  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+                )
+
+        mongo.db.boards.delete_one({"_id": ObjectId(board_id)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Email confirmation token throughput.
+
+Times generating and then confirming TOKENS tokens with the token
+service's single serializer, against building a URLSafeTimedSerializer
+and reading SECRET_KEY and SECURITY_PASSWORD_SALT from os.environ on
+every call, as generate_token and confirm_token used to.
+
+Requires the usual MONGODB_* / MAIL_* environment, which the app's
+config reads on import, but no reachable server. Run from the app
+directory:
+
+    python -m benchmarks.email_tokens
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+from itsdangerous import URLSafeTimedSerializer
+
+from application.users.token import TokenService
+
+
+TOKENS = 20000
+
+
+def per_call_generate(email):
+    serializer = URLSafeTimedSerializer(os.environ.get("SECRET_KEY"))
+    return serializer.dumps(email, salt=os.environ.get("SECURITY_PASSWORD_SALT"))
+
+
+def per_call_confirm(token, expiration=3600):
+    serializer = URLSafeTimedSerializer(os.environ.get("SECRET_KEY"))
+    try:
+        return serializer.loads(
+            token, salt=os.environ.get("SECURITY_PASSWORD_SALT"), max_age=expiration)
+    except Exception:
+        return False
+
+
+def throughput(generate, confirm):
+    emails = [f"user{i}@example.com" for i in range(TOKENS)]
+
+    start = time.perf_counter()
+    tokens = [generate(email) for email in emails]
+    generated = TOKENS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    assert [confirm(token) for token in tokens] == emails
+    confirmed = TOKENS / (time.perf_counter() - start)
+    return generated, confirmed
+
+
+def main():
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("SECURITY_PASSWORD_SALT", "benchmark-salt")
+
+    service = TokenService(SimpleNamespace(config={
+        "SECRET_KEY": os.environ["SECRET_KEY"],
+        "SECURITY_PASSWORD_SALT": os.environ["SECURITY_PASSWORD_SALT"]
+    }))
+    rotated = TokenService(SimpleNamespace(config={
+        "SECRET_KEY": os.environ["SECRET_KEY"],
+        "SECRET_KEY_FALLBACKS": ["previous-secret-1", "previous-secret-2"],
+        "SECURITY_PASSWORD_SALT": os.environ["SECURITY_PASSWORD_SALT"]
+    }))
+
+    for label, generate, confirm in (
+        ("per call", per_call_generate, per_call_confirm),
+        ("service", service.generate, service.confirm),
+        ("service, 2 fallback keys", rotated.generate, rotated.confirm),
+    ):
+        generated, confirmed = throughput(generate, confirm)
+        print(f"{label:<26} generate {generated:9.0f}/s  confirm {confirmed:9.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
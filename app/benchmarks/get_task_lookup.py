@@ -0,0 +1,92 @@
+"""
+Compare task lookups in columns of 10, 1,000 and 10,000 tasks.
+
+The previous Board.get_task unwound the board's columns and then the
+column's tasks ($match, $unwind, $match, $replaceRoot, $unwind,
+$match, $replaceRoot). The current one is a single find whose
+projection picks the task out with $filter. The task looked up is
+the last of its column, the worst case for both.
+
+Requires the usual MONGODB_* / MAIL_* environment and a reachable server.
+Run from the app directory:
+
+    python -m benchmarks.get_task_lookup
+"""
+
+import timeit
+
+from bson.objectid import ObjectId
+
+from application import create_app
+from application.config import Config
+from application.boards.models import Board
+from application.database import mongo
+
+
+TASK_COUNTS = (10, 1000, 10000)
+
+
+class EmbeddedConfig(Config):
+    BOARD_TASK_STORAGE = "embedded"
+
+
+def unwind_get_task(board_id, column_name, task_id):
+    """Board.get_task as it was before the projected lookup."""
+    return list(mongo.db.boards.aggregate([
+        {"$match": {"_id": ObjectId(board_id)}},
+        {"$unwind": "$columns"},
+        {"$match": {"columns.name": column_name}},
+        {"$replaceRoot": {"newRoot": "$columns"}},
+        {"$unwind": "$tasks"},
+        {"$match": {"tasks._id": ObjectId(task_id)}},
+        {"$replaceRoot": {"newRoot": "$tasks"}}
+    ]))
+
+
+def seed_board(task_count):
+    tasks = [
+        {
+            "_id": ObjectId(),
+            "title": f"Task {t}",
+            "description": "Lorem ipsum dolor sit amet",
+            "status": "Todo",
+            "subtasks": [
+                {"_id": ObjectId(), "title": f"Subtask {s}", "isCompleted": False}
+                for s in range(3)
+            ]
+        }
+        for t in range(task_count)
+    ]
+    columns = [
+        {"_id": ObjectId(), "name": "Todo", "tasks": tasks},
+        {"_id": ObjectId(), "name": "Done", "tasks": []}
+    ]
+    board_id = Board(ObjectId(), "Benchmark Board", columns).add_board()
+    return board_id, tasks[-1]["_id"]
+
+
+def main():
+    app = create_app(EmbeddedConfig)
+    with app.app_context():
+        for task_count in TASK_COUNTS:
+            board_id, task_id = seed_board(task_count)
+            assert (unwind_get_task(board_id, "Todo", task_id)
+                    == Board.get_task(board_id, "Todo", task_id))
+
+            number = 20
+            unwind = min(timeit.repeat(
+                lambda: unwind_get_task(board_id, "Todo", task_id), number=number, repeat=5))
+            projected = min(timeit.repeat(
+                lambda: Board.get_task(board_id, "Todo", task_id), number=number, repeat=5))
+
+            print(
+                f"{task_count:>6} tasks: unwind {unwind / number * 1000:8.2f} ms, "
+                f"projected find {projected / number * 1000:8.2f} ms "
+                f"({unwind / projected:.1f}x)"
+            )
+
+            mongo.db.boards.delete_one({"_id": board_id})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: encoding board documents for a response.
+
+Compares the previous path, parse_json (json_util.dumps then
+json.loads) followed by jsonify's dumps, with MongoJSONProvider,
+which writes the document to Extended JSON in a single pass.
+
+Needs no database (importing the application still reads the usual
+environment for Config). Run from the app directory:
+
+    python -m benchmarks.json_encoding
+"""
+
+import json
+import timeit
+from datetime import datetime, timezone
+
+from bson import json_util
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from application.helpers import MongoJSONProvider
+
+
+# (columns, tasks per column, subtasks per task)
+BOARD_SIZES = ((3, 10, 3), (5, 200, 5), (10, 1000, 5))
+
+
+def synthetic_board(columns, tasks, subtasks):
+    return {
+        "_id": ObjectId(),
+        "user": ObjectId(),
+        "name": "Benchmark Board",
+        "created": datetime.now(timezone.utc),
+        "columns": [
+            {
+                "_id": ObjectId(),
+                "name": f"Column {c}",
+                "tasks": [
+                    {
+                        "_id": ObjectId(),
+                        "title": f"Task {t}",
+                        "description": "Lorem ipsum dolor sit amet " * 4,
+                        "status": f"Column {c}",
+                        "subtasks": [
+                            {
+                                "_id": ObjectId(),
+                                "title": f"Subtask {s}",
+                                "isCompleted": s % 2 == 0
+                            }
+                            for s in range(subtasks)
+                        ]
+                    }
+                    for t in range(tasks)
+                ]
+            }
+            for c in range(columns)
+        ]
+    }
+
+
+def main():
+    app = Flask(__name__)
+    jsonify_provider = DefaultJSONProvider(app)
+    mongo_provider = MongoJSONProvider(app)
+
+    def previous(board):
+        return jsonify_provider.dumps(json.loads(json_util.dumps(board)))
+
+    def single_pass(board):
+        return mongo_provider.dumps(board)
+
+    for size in BOARD_SIZES:
+        board = synthetic_board(*size)
+        assert json.loads(previous(board)) == json.loads(single_pass(board))
+
+        number = max(1, 2000 // (size[0] * size[1]))
+        previous_time = min(timeit.repeat(lambda: previous(board), number=number, repeat=5))
+        single_time = min(timeit.repeat(lambda: single_pass(board), number=number, repeat=5))
+
+        tasks = size[0] * size[1]
+        print(
+            f"{tasks:>6} tasks: parse_json + jsonify {previous_time / number * 1000:8.2f} ms, "
+            f"MongoJSONProvider {single_time / number * 1000:8.2f} ms "
+            f"({previous_time / single_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Board endpoint latency during a login storm.
+
+Stands in for one gunicorn gthread worker: requests are served by a
+fixed pool of THREADS threads through the Flask test client. A storm of
+LOGINS concurrent logins is queued while get_board is requested every
+BOARD_INTERVAL seconds, and the get_board latency (queueing included)
+is reported with password hashing on the request thread
+(PASSWORD_HASH_WORKERS = 0) and in the process pool.
+
+Requires the usual MONGODB_* / MAIL_* environment and a reachable server.
+Run from the app directory:
+
+    python -m benchmarks.login_storm
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+from flask_jwt_extended import create_access_token
+
+from application import create_app
+from application.config import Config
+from application.boards.models import Board
+from application.database import mongo
+
+
+THREADS = 8
+LOGINS = 200
+BOARD_REQUESTS = 100
+BOARD_INTERVAL = 0.01
+EMAIL = "storm@example.com"
+PASSWORD = "stormPass123!"
+
+
+class InlineHashingConfig(Config):
+    PASSWORD_HASH_WORKERS = 0
+
+
+class PooledHashingConfig(Config):
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE = 2
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def measure(config):
+    app = create_app(config)
+    local = threading.local()
+
+    with app.app_context():
+        mongo.db.users.delete_many({"email": EMAIL})
+        app.test_client().post(
+            "/register",
+            data=json.dumps({"username": "Storm", "email": EMAIL, "password": PASSWORD}),
+            content_type="application/json"
+        )
+        board_id = str(Board(ObjectId(), "Benchmark Board", [
+            {"_id": ObjectId(), "name": "Todo", "tasks": []}
+        ]).add_board())
+    with app.test_request_context():
+        token = create_access_token(identity=EMAIL)
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+            with local.client.session_transaction() as session:
+                session["user_email"] = EMAIL
+        return local.client
+
+    def login():
+        return client().post(
+            "/login",
+            data=json.dumps({"email": EMAIL, "password": PASSWORD}),
+            content_type="application/json"
+        ).status_code
+
+    def get_board(queued):
+        client().get(f"/api/get_board/{board_id}",
+                     headers={"Authorization": f"Bearer {token}"})
+        return time.perf_counter() - queued
+
+    with ThreadPoolExecutor(max_workers=THREADS) as server:
+        logins = [server.submit(login) for _ in range(LOGINS)]
+        boards = []
+        for _ in range(BOARD_REQUESTS):
+            boards.append(server.submit(get_board, time.perf_counter()))
+            time.sleep(BOARD_INTERVAL)
+
+        latencies = [future.result() for future in boards]
+        statuses = [future.result() for future in logins]
+
+    with app.app_context():
+        mongo.db.boards.delete_one({"_id": ObjectId(board_id)})
+        mongo.db.users.delete_many({"email": EMAIL})
+
+    return latencies, statuses
+
+
+def main():
+    for label, config in (("inline", InlineHashingConfig), ("pooled", PooledHashingConfig)):
+        latencies, statuses = measure(config)
+        print(
+            f"{label:<7} get_board p50 {percentile(latencies, 0.5) * 1000:8.2f} ms  "
+            f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms  "
+            f"logins ok {statuses.count(200)}, refused (503) {statuses.count(503)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
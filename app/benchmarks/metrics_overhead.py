@@ -0,0 +1,44 @@
+"""
+Per-request cost of recording metrics.
+
+Times REQUESTS passes through the metrics hooks (start_timer, then
+record with a response) inside a request context, without serving the
+request, so the figure is the overhead the metrics add to each request.
+The target is under 50 µs.
+
+prometheus_client picks its storage when it is imported, so run it once
+in each mode, from the app directory, with the usual MONGODB_* / MAIL_*
+environment (no database is used):
+
+    python -m benchmarks.metrics_overhead
+    PROMETHEUS_MULTIPROC_DIR=$(mktemp -d) python -m benchmarks.metrics_overhead
+"""
+
+import os
+import time
+
+from application import create_app
+from application.metrics import metrics
+
+
+REQUESTS = 100000
+
+
+def main():
+    app = create_app()
+    response = app.response_class(b"{}", mimetype="application/json")
+
+    with app.test_request_context("/api/get_board/64b7f0c2e4b0a1a2b3c4d5e6"):
+        app.preprocess_request()
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            metrics.start_timer()
+            metrics.record(response)
+        elapsed = time.perf_counter() - start
+
+    mode = "multiprocess" if "PROMETHEUS_MULTIPROC_DIR" in os.environ else "single process"
+    print(f"{mode:<15} {elapsed / REQUESTS * 1e6:6.2f} µs per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Load test a running server, to compare serving set-ups.
+
+CONCURRENCY clients, each on its own keep-alive connection, request
+LOAD_TEST_PATH (default "/") back to back for DURATION seconds, and
+the throughput and p50/p99 latency are reported. With LOAD_TEST_TOKEN
+set, requests carry it as a Bearer token, so an authenticated endpoint
+such as /api/get_board/<board_id> can be loaded.
+
+To compare the development server with gunicorn, from the app
+directory, with the usual MONGODB_* / MAIL_* environment:
+
+    python run.py                                  # development server
+    LOAD_TEST_URL=https://127.0.0.1:443 python -m benchmarks.serving
+
+    gunicorn -c gunicorn.conf.py run:app           # production profile
+    LOAD_TEST_URL=https://127.0.0.1:443 python -m benchmarks.serving
+
+Run the client on another machine, or pin it to other CPUs
+(taskset), so it doesn't compete with the server it measures.
+"""
+
+import http.client
+import os
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+CONCURRENCY = int(os.environ.get("LOAD_TEST_CONCURRENCY", 32))
+DURATION = float(os.environ.get("LOAD_TEST_DURATION", 10))
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def connect(url):
+    if url.scheme == "https":
+        # The server's certificate is usually self-signed.
+        return http.client.HTTPSConnection(
+            url.hostname, url.port or 443, context=ssl._create_unverified_context())
+    return http.client.HTTPConnection(url.hostname, url.port or 80)
+
+
+def client(url, path, headers, deadline, latencies, errors):
+    connection = connect(url)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            connection.close()
+            connection = connect(url)
+            continue
+        if response.status >= 500:
+            errors.append(response.status)
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main():
+    url = urlsplit(os.environ.get("LOAD_TEST_URL", "http://127.0.0.1:8000"))
+    path = os.environ.get("LOAD_TEST_PATH", "/")
+    headers = {}
+    if os.environ.get("LOAD_TEST_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.environ['LOAD_TEST_TOKEN']}"
+
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + DURATION
+    clients = [
+        threading.Thread(target=client, args=(url, path, headers, deadline, latencies, errors))
+        for _ in range(CONCURRENCY)
+    ]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+    if not latencies:
+        print(f"No successful requests; {len(errors)} errors.")
+        return
+    print(
+        f"{url.geturl()}{path}  {CONCURRENCY} clients  "
+        f"{len(latencies) / DURATION:8.0f} req/s  "
+        f"p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:7.2f} ms  "
+        f"errors {len(errors)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
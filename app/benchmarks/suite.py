@@ -0,0 +1,273 @@
+"""
+Board API benchmark suite.
+
+Generates a data set (see benchmarks.datagen), logs every generated
+user in, and runs scripted workloads with one client per user, all
+clients at once:
+
+    board_open   GET /api/get_board/<board_id> on a random board
+    card_drag    PATCH /api/update_task moving a random task to another column
+    bulk_add     POST /api/boards/<board_id>/tasks:batch creating BATCH tasks
+
+Each client makes --requests requests per workload, on its own user's
+boards, so clients never conflict. The throughput (requests per second
+over the workload's wall time) and the p50/p95/p99 latency of each
+workload are printed and written to a JSON file, by default
+benchmarks/results/<commit>.json, for benchmarks.compare to diff
+against another commit's.
+
+By default the requests go through the Flask test client in this
+process, so only a local mongod is needed. With --url they are sent to
+a running server instead (e.g. gunicorn on this machine) that uses the
+same database.
+
+Run from the app directory, with the usual MONGODB_* / MAIL_*
+environment and a reachable server:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --url https://127.0.0.1:443 --output head.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from bson import json_util
+
+from application import create_app
+from benchmarks import datagen
+
+
+WORKLOADS = ("board_open", "card_drag", "bulk_add")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class TestClientTransport:
+    """Sends requests through the Flask test client of an app in this process."""
+
+    name = "test-client"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.client.open(
+            path, method=method, headers=headers,
+            data=json.dumps(body) if body is not None else None,
+            content_type="application/json")
+        return response.status_code, response.data
+
+
+class HTTPTransport:
+    """Sends requests to a running server over keep-alive connections."""
+
+    def __init__(self, url):
+        import requests
+        import urllib3
+
+        # The server's certificate is usually self-signed.
+        urllib3.disable_warnings()
+        self.name = url
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.session.verify = False
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.session.request(
+            method, self.url + path, json=body, headers=headers)
+        return response.status_code, response.content
+
+
+class Client:
+    """One user's session, and the state of its boards as it changes them."""
+
+    def __init__(self, transport, user, seed):
+        self.transport = transport
+        self.email = user["email"]
+        self.boards = user["boards"]
+        self.rng = random.Random(seed)
+        self.token = None
+
+    def login(self):
+        status, body = self.transport.request(
+            "POST", "/login", {"email": self.email, "password": datagen.PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"Login of {self.email} failed with {status}")
+        self.token = json.loads(body)["token"]
+
+    def board_open(self):
+        board = self.rng.choice(self.boards)
+        return self.transport.request(
+            "GET", f"/api/get_board/{board['_id']}", token=self.token)[0]
+
+    def card_drag(self):
+        board = self.rng.choice(self.boards)
+        source = self.rng.choice([column for column in board["columns"] if column["tasks"]])
+        target = self.rng.choice([column for column in board["columns"] if column is not source])
+        task = source["tasks"].pop(self.rng.randrange(len(source["tasks"])))
+
+        status, _ = self.transport.request(
+            "PATCH",
+            f"/api/update_task/{board['_id']}/{source['name']}/{task['_id']}",
+            {
+                "title": task["title"],
+                "description": task["description"],
+                "status": target["name"],
+                "subtasks": [
+                    {"_id": str(subtask["_id"]), "title": subtask["title"]}
+                    for subtask in task["subtasks"]
+                ]
+            },
+            token=self.token)
+        (target if status == 200 else source)["tasks"].append(task)
+        return status
+
+    def bulk_add(self, batch_size):
+        board = self.rng.choice(self.boards)
+        column = self.rng.choice(board["columns"])
+        operations = [
+            {"op": "create", "column": column["name"], "task": {
+                "title": datagen.words(self.rng, 3),
+                "description": datagen.words(self.rng, 10),
+                "status": column["name"],
+                "subtasks": []
+            }}
+            for _ in range(batch_size)
+        ]
+        status, body = self.transport.request(
+            "POST", f"/api/boards/{board['_id']}/tasks:batch",
+            {"operations": operations}, token=self.token)
+        if status == 200:
+            column["tasks"].extend(
+                result["task"] for result in json_util.loads(body)["results"]
+                if "task" in result)
+        return status
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def run_workload(clients, workload, requests, batch_size):
+    """Run a workload on every client at once; return its summary."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def run(client):
+        operation = getattr(client, workload)
+        args = (batch_size,) if workload == "bulk_add" else ()
+        client_latencies = []
+        client_errors = 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = operation(*args)
+            client_latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                client_errors += 1
+        with lock:
+            latencies.extend(client_latencies)
+            errors.append(client_errors)
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "duration_s": round(duration, 3),
+        "throughput": round(len(latencies) / duration, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3)
+    }
+
+
+def git_commit():
+    """The checked out commit, with -dirty if the tree has changes, or None."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the board API benchmark suite.")
+    datagen.add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Requests per client per workload.")
+    parser.add_argument("--batch", type=int, default=20,
+                        help="Tasks created per bulk_add request.")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--url", help="Load a running server instead of the test client.")
+    parser.add_argument("--output", help="Where to write the results (JSON).")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        datagen.clear()
+        dataset = datagen.generate(
+            args.users, args.boards, args.columns, args.tasks, args.subtasks, args.seed)
+
+    # Each client gets its own transport, as it would its own connection.
+    clients = [
+        Client(HTTPTransport(args.url) if args.url else TestClientTransport(app),
+               user, args.seed + index)
+        for index, user in enumerate(dataset)
+    ]
+    for client in clients:
+        client.login()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "transport": clients[0].transport.name,
+        "task_storage": app.config.get("BOARD_TASK_STORAGE"),
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key not in ("url", "output")},
+        "workloads": {}
+    }
+    try:
+        for workload in args.workloads:
+            summary = run_workload(clients, workload, args.requests, args.batch)
+            results["workloads"][workload] = summary
+            print(f"{workload:<11} {summary['throughput']:9.1f} req/s  "
+                  f"p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                  f"p99 {summary['p99_ms']:8.2f} ms  errors {summary['errors']}")
+    finally:
+        with app.app_context():
+            datagen.clear()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
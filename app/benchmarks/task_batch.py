@@ -0,0 +1,103 @@
+"""
+Compare tasks:batch with one request per task.
+
+For batches of 1, 100 and 1,000 operations, times creating that many
+tasks through the Flask test client, once as one tasks:batch request
+and once as one add_task request per task, and then deleting them the
+same two ways (remove_task per task).
+
+Requires the usual MONGODB_* / MAIL_* environment and a reachable server.
+Run from the app directory:
+
+    python -m benchmarks.task_batch
+"""
+
+import json
+import time
+
+from bson.objectid import ObjectId
+from flask_jwt_extended import create_access_token
+
+from application import create_app
+from application.boards.models import Board
+from application.database import mongo
+
+
+BATCH_SIZES = (1, 100, 1000)
+EMAIL = "benchmark@example.com"
+COLUMN = "Column 0"
+
+
+def new_task(i):
+    return {
+        "title": f"Task {i}",
+        "description": "Lorem ipsum dolor sit amet " * 4,
+        "status": COLUMN,
+        "subtasks": [{"title": f"Subtask {s}", "isCompleted": False} for s in range(3)]
+    }
+
+
+def post(client, url, payload, headers, method="POST"):
+    res = client.open(url, method=method, headers=headers,
+                      data=json.dumps(payload), content_type="application/json")
+    assert res.status_code == 200, res.data
+    return json.loads(res.data)
+
+
+def one_by_one(client, board_id, size, headers):
+    start = time.perf_counter()
+    for i in range(size):
+        board = post(client, f"/api/add_task/{board_id}/{COLUMN}", new_task(i), headers)
+    created = time.perf_counter() - start
+
+    task_ids = [task["_id"]["$oid"] for task in board["columns"][0]["tasks"]]
+    start = time.perf_counter()
+    for task_id in task_ids:
+        post(client, f"/api/remove_task/{board_id}/{COLUMN}", {"task_id": task_id}, headers)
+    return created, time.perf_counter() - start
+
+
+def batched(client, board_id, size, headers):
+    url = f"/api/boards/{board_id}/tasks:batch"
+
+    start = time.perf_counter()
+    result = post(client, url, {"operations": [
+        {"op": "create", "column": COLUMN, "task": new_task(i)} for i in range(size)
+    ]}, headers)
+    created = time.perf_counter() - start
+
+    start = time.perf_counter()
+    post(client, url, {"operations": [
+        {"op": "delete", "column": COLUMN, "task_id": r["task_id"]}
+        for r in result["results"]
+    ]}, headers)
+    return created, time.perf_counter() - start
+
+
+def main():
+    app = create_app()
+    client = app.test_client()
+
+    with app.test_request_context():
+        token = create_access_token(identity=EMAIL)
+    with client.session_transaction() as session:
+        session["user_email"] = EMAIL
+    headers = {"Authorization": f"Bearer {token}"}
+
+    board_id = str(Board(ObjectId(), "Benchmark Board", [
+        {"_id": ObjectId(), "name": COLUMN, "tasks": []}
+    ]).add_board())
+
+    for size in BATCH_SIZES:
+        for label, run in (("one by one", one_by_one), ("batch", batched)):
+            created, deleted = run(client, board_id, size, headers)
+            print(
+                f"{size:>5} operations {label:<10}  create {created * 1000:9.2f} ms  "
+                f"delete {deleted * 1000:9.2f} ms"
+            )
+
+    mongo.db.boards.delete_one({"_id": ObjectId(board_id)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Write latency against board size for both task storage layouts.
+
+For boards of 10, 1,000 and 10,000 tasks, times task writes
+(update_task_meta and add_task_to_column) with tasks embedded in the
+board document and with tasks in their own collection, and reports
+p50/p99 latency and the size of the board document.
+
+Requires the usual MONGODB_* / MAIL_* environment and a reachable server.
+Run from the app directory:
+
+    python -m benchmarks.task_storage
+"""
+
+import time
+
+import bson
+from bson.objectid import ObjectId
+
+from application import create_app
+from application.config import Config
+from application.boards.models import Board
+from application.database import mongo
+
+
+TASK_COUNTS = (10, 1000, 10000)
+COLUMNS = 5
+WRITES = 200
+
+
+class EmbeddedConfig(Config):
+    BOARD_TASK_STORAGE = "embedded"
+
+
+class CollectionConfig(Config):
+    BOARD_TASK_STORAGE = "collection"
+
+
+def synthetic_columns(task_count):
+    columns = []
+    for c in range(COLUMNS):
+        name = f"Column {c}"
+        columns.append({
+            "_id": ObjectId(),
+            "name": name,
+            "tasks": [
+                {
+                    "_id": ObjectId(),
+                    "title": f"Task {t}",
+                    "description": "Lorem ipsum dolor sit amet " * 4,
+                    "status": name,
+                    "subtasks": [
+                        {"_id": ObjectId(), "title": f"Subtask {s}", "isCompleted": False}
+                        for s in range(3)
+                    ]
+                }
+                for t in range(task_count // COLUMNS)
+            ]
+        })
+    return columns
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (timings[len(timings) // 2] * 1000,
+            timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000)
+
+
+def time_writes(write):
+    timings = []
+    for i in range(WRITES):
+        start = time.perf_counter()
+        write(i)
+        timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+def measure(task_count):
+    columns = synthetic_columns(task_count)
+    task = columns[0]["tasks"][0]
+    board_id = Board(ObjectId(), "Benchmark Board", columns).add_board()
+
+    meta = time_writes(lambda i: Board.update_task_meta(
+        board_id, "Column 0", task["_id"], f"Title {i}", task["description"]))
+    add = time_writes(lambda i: Board.add_task_to_column(board_id, "Column 1", {
+        "_id": ObjectId(),
+        "title": f"New Task {i}",
+        "description": "",
+        "status": "Column 1",
+        "subtasks": []
+    }))
+
+    document_size = len(bson.encode(mongo.db.boards.find_one({"_id": board_id})))
+
+    mongo.db.boards.delete_one({"_id": board_id})
+    mongo.db.tasks.delete_many({"board_id": board_id})
+    return meta, add, document_size
+
+
+def main():
+    for label, config in (("embedded", EmbeddedConfig), ("collection", CollectionConfig)):
+        app = create_app(config)
+        with app.app_context():
+            for task_count in TASK_COUNTS:
+                (meta_p50, meta_p99), (add_p50, add_p99), size = measure(task_count)
+                print(
+                    f"{label:<10} {task_count:>6} tasks  board {size / 1024:9.1f} KiB  "
+                    f"update_task_meta p50 {meta_p50:6.2f} ms p99 {meta_p99:6.2f} ms  "
+                    f"add_task_to_column p50 {add_p50:6.2f} ms p99 {add_p99:6.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
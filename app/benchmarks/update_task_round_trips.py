@@ -0,0 +1,141 @@
+"""
+Count the MongoDB round trips made by a single update_task request.
+
+Compares the previous call sequence (one Board method per kind of
+change, plus the get_task lookups) with the task diff engine, which
+applies the same change in one pipeline update.
+
+Requires the usual MONGODB_* / MAIL_* environment and a reachable server.
+Run from the app directory:
+
+    python -m benchmarks.update_task_round_trips
+"""
+
+from pymongo import monitoring
+from bson.objectid import ObjectId
+
+from application.test_helpers import CommandCounter
+
+
+counter = CommandCounter()
+monitoring.register(counter)
+
+from application import create_app  # noqa: E402
+from application.boards.models import Board  # noqa: E402
+from application.boards.diff import TaskDiff  # noqa: E402
+from application.database import mongo  # noqa: E402
+from application.helpers import parse_json  # noqa: E402
+
+
+SUBTASK_COUNTS = (3, 10, 30)
+
+
+def seed_board(subtask_count):
+    """Insert a board holding one task with subtask_count subtasks."""
+    task = {
+        "_id": ObjectId(),
+        "title": "Benchmark Task",
+        "description": "Benchmark Description",
+        "status": "Todo",
+        "subtasks": [
+            {"_id": ObjectId(), "title": f"Subtask {i}", "isCompleted": False}
+            for i in range(subtask_count)
+        ]
+    }
+    columns = [
+        {"_id": ObjectId(), "name": "Todo", "tasks": [task]},
+        {"_id": ObjectId(), "name": "Doing", "tasks": []}
+    ]
+    board_id = Board(ObjectId(), "Benchmark Board", columns).add_board()
+    return board_id, task
+
+
+def build_payload(task):
+    """Rename every subtask, drop the last one, add one and move the task."""
+    subtasks = parse_json(task["subtasks"][:-1])
+    for subtask in subtasks:
+        subtask["title"] += " (renamed)"
+    subtasks.append({"title": "New Subtask", "isCompleted": False})
+
+    return {
+        "title": "Renamed Task",
+        "description": "New Description",
+        "status": "Doing",
+        "subtasks": subtasks
+    }
+
+
+def legacy_update_task(board_id, column_name, task_id, data):
+    """The call sequence update_task made before the task diff engine."""
+    current_task = Board.get_task(board_id, column_name, task_id)
+    current_subtasks = current_task[0]["subtasks"]
+
+    subtasks_to_update = [
+        subtask for subtask in data["subtasks"]
+        for current_subtask in current_subtasks
+        if subtask.get("_id") is not None
+        and ObjectId(subtask["_id"]["$oid"]) == current_subtask["_id"]
+        and subtask["title"] != current_subtask["title"]
+    ]
+    for subtask in subtasks_to_update:
+        Board.update_subtask_title(board_id, column_name, task_id, [subtask])
+
+    if len(current_subtasks) < len(data["subtasks"]):
+        Board.update_task_add_subtasks(
+            board_id, column_name, task_id,
+            [subtask for subtask in data["subtasks"] if "_id" not in subtask])
+
+    if len(current_subtasks) > len(data["subtasks"]):
+        incoming_ids = [
+            ObjectId(subtask["_id"]["$oid"])
+            for subtask in data["subtasks"] if "_id" in subtask
+        ]
+        Board.update_task_remove_subtasks(
+            board_id, column_name, task_id,
+            [subtask["_id"] for subtask in current_subtasks
+             if subtask["_id"] not in incoming_ids])
+
+    updated_board = Board.update_task_meta(
+        board_id, column_name, task_id, data["title"], data["description"])
+
+    if current_task[0]["status"] != data["status"]:
+        moved_task = Board.get_task(board_id, column_name, task_id)[0]
+        updated_board = Board.update_task_status(
+            board_id, task_id, column_name, data["status"], moved_task)
+        Board.get_task(board_id, data["status"], task_id)
+
+    return updated_board
+
+
+def diff_update_task(board_id, column_name, task_id, data):
+    return Board.apply_task_diff(
+        board_id, column_name, task_id, TaskDiff.from_payload(data))
+
+
+def measure(update_task, subtask_count):
+    board_id, task = seed_board(subtask_count)
+    payload = build_payload(task)
+
+    counter.reset()
+    update_task(board_id, "Todo", task["_id"], payload)
+    commands = list(counter.commands)
+
+    mongo.db.boards.delete_one({"_id": board_id})
+    return commands
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        for subtask_count in SUBTASK_COUNTS:
+            legacy = measure(legacy_update_task, subtask_count)
+            diff = measure(diff_update_task, subtask_count)
+            print(
+                f"{subtask_count:>3} subtasks: "
+                f"legacy {len(legacy):>3} round trips, "
+                f"diff engine {len(diff):>3} round trips"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, PreconditionFailed, ServiceUnavailable
 
 
 class EmailExistsError(BadRequest):
@@ -32,6 +32,21 @@ class PasswordSpecialCharacterError(AbstractPasswordValidationException):
     description = "Your password should contain at least one special character."
 
 
+class RevisionMismatchError(PreconditionFailed):
+    code = 412
+    description = "The board has been changed since it was last read."
+
+    def __init__(self, board_id, current_revision):
+        super().__init__()
+        self.board_id = board_id
+        self.current_revision = current_revision
+
+
+class PasswordHashingBusyError(ServiceUnavailable):
+    code = 503
+    description = "Too many sign-ins are in progress. Please try again shortly."
+
+
 # HTTP Error Handler
 class InvalidAPIUsage(Exception):
     status_code = 400
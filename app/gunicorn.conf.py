@@ -0,0 +1,119 @@
+"""
+Gunicorn settings for serving the app in production.
+
+Run from the app directory (gunicorn also picks this file up on its own
+when started there):
+
+    gunicorn -c gunicorn.conf.py run:app
+
+Every setting can be overridden from the environment:
+
+GUNICORN_WORKERS        worker processes (default: CPUs available + 1)
+GUNICORN_WORKER_CLASS   "gthread" (default) or "gevent" (needs gevent installed)
+GUNICORN_THREADS        threads per gthread worker (default 8)
+GUNICORN_CONNECTIONS    concurrent connections per gevent worker (default 1000)
+GUNICORN_BIND           address to listen on (default: 0.0.0.0:443 with TLS
+                        when server.crt and server.key exist, as run.py
+                        did, otherwise 0.0.0.0:APP_PORT)
+
+An open board events stream holds a thread (a greenlet with gevent)
+for as long as the client stays connected. Unless set,
+BOARD_EVENTS_MAX_STREAMS (100 elsewhere) is a quarter of a gthread
+worker's threads, or half a gevent worker's connections, so streams
+can't starve the other requests.
+
+Each worker holds its own MongoClient, identity cache, password hashing
+pool and mail outbox thread. The app is loaded once in the master
+(preload_app), which also ensures the indexes, and post_fork gives every
+worker a fresh MongoClient, since pymongo clients aren't fork-safe.
+
+Set PROMETHEUS_MULTIPROC_DIR so /metrics covers all the workers.
+"""
+
+import os
+
+
+def _cpu_count():
+    try:
+        # The CPUs this process may run on, which respects container limits.
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+WORKER_CLASSES = ("gthread", "gevent")
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class not in WORKER_CLASSES:
+    raise ValueError(
+        f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, "
+        f"not {worker_class!r}")
+
+# Threads (or greenlets) cover requests waiting on MongoDB, so one worker
+# per CPU is enough; more would only add password hashing pools competing
+# for the same CPUs.
+workers = int(os.environ.get("GUNICORN_WORKERS", _cpu_count() + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_connections = int(os.environ.get("GUNICORN_CONNECTIONS", 1000))
+
+os.environ.setdefault("BOARD_EVENTS_MAX_STREAMS", str(
+    worker_connections // 2 if worker_class == "gevent" else max(1, threads // 4)))
+
+certfile = os.environ.get("GUNICORN_CERTFILE", "./server.crt")
+keyfile = os.environ.get("GUNICORN_KEYFILE", "./server.key")
+if os.path.exists(certfile) and os.path.exists(keyfile):
+    bind = [os.environ.get("GUNICORN_BIND", "0.0.0.0:443")]
+else:
+    certfile = keyfile = None
+    bind = [os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('APP_PORT', 8000)}")]
+
+preload_app = True
+
+# Keep connections from the front end open between requests, and recycle
+# workers now and then (staggered, so they don't all restart together)
+# to bound any slow leak.
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+# gthread workers heartbeat from the main thread, so a long board events
+# stream doesn't count against the timeout.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# The metrics directory has to exist before the app is preloaded.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def on_starting(server):
+    """
+    Clear the metrics files left by the previous run, see
+    application.metrics. The master's own files, opened when the app
+    was preloaded, are kept.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        own = f"_{os.getpid()}.db"
+        for name in os.listdir(directory):
+            if name.endswith(".db") and not name.endswith(own):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    """Let /metrics drop the exited worker's live values."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    """Give the new worker a MongoClient of its own."""
+    from application.database import reconnect
+
+    if server.cfg.preload_app:
+        reconnect(server.app.wsgi())
@@ -1,4 +1,13 @@
-"""Entry point to the application"""
+"""
+Entry point to the application.
+
+In production the app is served by gunicorn (see gunicorn.conf.py):
+
+    gunicorn -c gunicorn.conf.py run:app
+
+Running this file starts Flask's development server instead, for local
+work only. APP_DEBUG=1 turns on the debugger and reloader.
+"""
 
 from application import create_app
 import os
@@ -7,7 +16,7 @@ app = create_app()
 
 
 if __name__ == "__main__":
-    ENVIRONMENT_DEBUG = os.environ.get("APP_DEBUG", True)
+    ENVIRONMENT_DEBUG = os.environ.get("APP_DEBUG", "0").lower() in ("1", "true", "yes")
     ENVIRONMENT_PORT = os.environ.get("APP_PORT", 8000)
 
     context = ("./server.crt", "./server.key")
@@ -5,14 +5,36 @@ from application.test_helpers import client_post_helper
 import flask_unittest
 import json
 from unittest.mock import patch
-from application.database import mongo
-
-from werkzeug.security import check_password_hash
+from application.database import mongo, mongo_client_options
+from application.monitoring import MongoMonitor
+from application.metrics import mongo_collector
+from application.profiler import command_profiler
+from application.config import TestConfig
+from application.indexes import ensure_indexes
+from pymongo import monitoring
+from application.users.identity import identity_cache
+from application.users.hashing import password_hasher
+from exceptions.handlers import PasswordHashingBusyError
+from application.users.token import TokenService
+from application.users.refresh import token_refresher
+from flask_jwt_extended import decode_token, create_access_token
+from application.helpers import parse_json
+from bson.objectid import ObjectId
+from datetime import datetime, timezone, timedelta
+
+from werkzeug.security import check_password_hash, generate_password_hash
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
 
 
 class UserAPITests(flask_unittest.ClientTestCase):
 
-    app = create_app()
+    app = create_app(TestConfig)
     def setUp(self, client):
         self.mongo = mongo
     
@@ -215,6 +237,131 @@ class UserAPITests(flask_unittest.ClientTestCase):
         self.assertEqual(res.status_code, 400)
         self.assertEqual(json.loads(res.data)['msg'], 'Your password is invalid.')
     
+    def test_login_rehashes_outdated_password_hash(self, client):
+        """
+        Test logging in with a password hashed with other parameters than
+        PASSWORD_HASH_METHOD stores a new hash made with the current ones.
+        """
+
+        payload = {
+            "username": "Test User",
+            "email": "test16@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, "/register", payload)
+        old_hash = generate_password_hash(payload["password"], "pbkdf2:sha256:1000")
+        self.mongo.db.users.update_one(
+            {"email": payload["email"]}, {"$set": {"password": old_hash}})
+
+        res = client_post_helper(client, "/login", {
+            "email": payload["email"],
+            "password": payload["password"]
+        })
+
+        self.assertEqual(res.status_code, 200)
+        new_hash = self.mongo.db.users.find_one({"email": payload["email"]})["password"]
+        self.assertNotEqual(new_hash, old_hash)
+        self.assertFalse(password_hasher.needs_rehash(new_hash))
+        self.assertTrue(check_password_hash(new_hash, payload["password"]))
+
+    def test_login_password_hashing_busy_error(self, client):
+        """
+        Test a login is refused with 503 and Retry-After, rather than
+        queued, when the password hashing pool has no room.
+        """
+
+        payload = {
+            "username": "Test User",
+            "email": "test17@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, "/register", payload)
+
+        with patch.object(password_hasher, "workers", 1), \
+                patch.object(password_hasher, "_slots", threading.Semaphore(0)):
+            res = client_post_helper(client, "/login", {
+                "email": payload["email"],
+                "password": payload["password"]
+            })
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.headers["Retry-After"], "1")
+
+    def test_password_hashing_timeout_keeps_slot(self, client):
+        """
+        Test a hash that times out while running keeps its slot in the
+        pool until the job finishes.
+        """
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        slots = threading.BoundedSemaphore(1)
+        executor = SimpleNamespace(submit=lambda *args: future)
+
+        with patch.object(password_hasher, "workers", 1), \
+                patch.object(password_hasher, "timeout", 0.01), \
+                patch.object(password_hasher, "_slots", slots), \
+                patch.object(password_hasher, "_get_executor", lambda: executor):
+            with self.assertRaises(PasswordHashingBusyError):
+                password_hasher.hash("testPass123!")
+            self.assertFalse(slots.acquire(blocking=False))
+
+            future.set_result("hash")
+            self.assertTrue(slots.acquire(blocking=False))
+
+    def test_confirm_email(self, client):
+        """
+        Test the token sent on registration confirms the user's email,
+        and a bad token is refused.
+        """
+
+        payload = {
+            "username": "Test User",
+            "email": "test19@email.com",
+            "password": "testPass123!"
+        }
+
+        res = client_post_helper(client, "/register", payload)
+        token = json.loads(res.data)["token"]["token"]
+        message = self.mongo.db.mail_outbox.find_one({"to": payload["email"]})
+        self.assertEqual(message["sender"], self.app.config["MAIL_DEFAULT_SENDER"])
+
+        res = client.get(f"/confirm_email/{token}")
+        self.assertEqual(res.status_code, 200)
+        user = self.mongo.db.users.find_one({"email": payload["email"]})
+        self.assertTrue(user["is_confirmed"])
+        confirmed = json.loads(res.data)
+        self.assertEqual(confirmed["email"], payload["email"])
+        self.assertTrue(confirmed["is_confirmed"])
+        self.assertNotIn("password", confirmed)
+
+        res = client.get(f"/confirm_email/{token}")
+        self.assertEqual(res.status_code, 200)
+
+        res = client.get(f"/confirm_email/{token}x")
+        self.assertEqual(res.status_code, 400)
+
+    def test_confirm_token_key_rotation(self, client):
+        """
+        Test a token signed with the previous SECRET_KEY still verifies
+        while that key is listed in SECRET_KEY_FALLBACKS, and not after.
+        """
+
+        def service(secret_key, fallbacks):
+            return TokenService(SimpleNamespace(config={
+                "SECRET_KEY": secret_key,
+                "SECRET_KEY_FALLBACKS": fallbacks,
+                "SECURITY_PASSWORD_SALT": "salt"
+            }))
+
+        token = service("old-key", []).generate("test20@email.com")
+
+        self.assertEqual(service("new-key", ["old-key"]).confirm(token), "test20@email.com")
+        self.assertFalse(service("new-key", []).confirm(token))
+        self.assertFalse(service("old-key", []).confirm(token, max_age=-1))
+
     def test_get_user_profile(self, client):
         """Test retrieving an authenticated user's profile."""
 
@@ -243,6 +390,373 @@ class UserAPITests(flask_unittest.ClientTestCase):
             if k != "password":
                 self.assertEqual(data[k], v)
     
+    def test_jwt_token_carries_user_id(self, client):
+        """Test the access token identifies the user by _id as well as email."""
+
+        payload = {
+            "username": "Test User",
+            "email": "test12@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, '/register', payload)
+        login_res = client_post_helper(client, '/login', {
+            "email": payload["email"],
+            "password": payload["password"]
+        })
+
+        jwt_token = json.loads(login_res.data)["token"]
+        user = self.mongo.db.users.find_one({"email": payload["email"]})
+
+        with self.app.app_context():
+            claims = decode_token(jwt_token)
+
+        self.assertEqual(claims["sub"], payload["email"])
+        self.assertEqual(claims["uid"], str(user["_id"]))
+
+    def test_get_user_profile_cached(self, client):
+        """Test repeated profile requests are served from the identity cache."""
+
+        payload = {
+            "username": "Test User",
+            "email": "test14@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, '/register', payload)
+        login_res = client_post_helper(client, '/login', {
+            "email": payload["email"],
+            "password": payload["password"]
+        })
+
+        jwt_token = json.loads(login_res.data)["token"]
+        stats_before = identity_cache.stats()
+
+        for _ in range(3):
+            profile_res = client.get('/user_profile', headers={
+                "Authorization": f"Bearer {jwt_token}"
+            })
+            self.assertEqual(profile_res.status_code, 200)
+            self.assertEqual(json.loads(profile_res.data)["email"], payload["email"])
+
+        stats_after = identity_cache.stats()
+        self.assertEqual(stats_after["misses"] - stats_before["misses"], 1)
+        self.assertEqual(stats_after["hits"] - stats_before["hits"], 2)
+
+    def test_user_id_claim_not_counted(self, client):
+        """
+        Test reading the user's _id from the token's uid claim is not
+        counted as an identity cache lookup.
+        """
+
+        payload = {
+            "username": "Test User",
+            "email": "test21@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, '/register', payload)
+        login_res = client_post_helper(client, '/login', {
+            "email": payload["email"],
+            "password": payload["password"]
+        })
+
+        jwt_token = json.loads(login_res.data)["token"]
+        stats_before = identity_cache.stats()
+
+        res = client.get('/api/list_boards', headers={
+            "Authorization": f"Bearer {jwt_token}"
+        })
+        self.assertEqual(res.status_code, 200)
+
+        stats_after = identity_cache.stats()
+        self.assertEqual(stats_after["hits"], stats_before["hits"])
+        self.assertEqual(stats_after["misses"], stats_before["misses"])
+
+        text = client.get('/metrics').data.decode()
+        self.assertIn(f'identity_cache_hits_total {float(stats_after["hits"])}', text)
+        self.assertIn(f'identity_cache_misses_total {float(stats_after["misses"])}', text)
+
+    def test_register_invalidates_cached_profile(self, client):
+        """Test registering a user drops a profile cached for their email."""
+
+        email = "test22@email.com"
+        identity_cache._store(email, {"email": email, "username": "Stale User"})
+
+        client_post_helper(client, '/register', {
+            "username": "Test User",
+            "email": email,
+            "password": "testPass123!"
+        })
+
+        with self.app.test_request_context():
+            self.assertEqual(identity_cache.get_profile(email)["username"], "Test User")
+
+    def test_expiring_token_rotated_once(self, client):
+        """
+        Test a token close to expiry gets a fresh access cookie on the
+        first response only, and a token far from expiry never does.
+        """
+
+        payload = {
+            "username": "Test User",
+            "email": "test15@email.com",
+            "password": "testPass123!"
+        }
+
+        client_post_helper(client, '/register', payload)
+        user = self.mongo.db.users.find_one({"email": payload["email"]})
+
+        with self.app.app_context():
+            expiring_token = create_access_token(
+                identity=payload["email"],
+                additional_claims={"uid": str(user["_id"])},
+                expires_delta=timedelta(minutes=5))
+            fresh_token = create_access_token(
+                identity=payload["email"], expires_delta=timedelta(hours=2))
+
+        minted_before = token_refresher.stats()["minted"]
+
+        cookies = [
+            client.get('/user_profile', headers={
+                "Authorization": f"Bearer {expiring_token}"
+            }).headers.get("Set-Cookie", "")
+            for _ in range(3)
+        ]
+
+        self.assertIn("access_token_cookie=", cookies[0])
+        self.assertEqual(cookies[1:], ["", ""])
+        self.assertEqual(token_refresher.stats()["minted"] - minted_before, 1)
+        self.assertGreaterEqual(token_refresher.stats()["minted_per_minute"][-1], 1)
+
+        new_token = cookies[0].split("access_token_cookie=")[1].split(";")[0]
+        with self.app.app_context():
+            claims = decode_token(new_token)
+        self.assertEqual(claims["sub"], payload["email"])
+        self.assertEqual(claims["uid"], str(user["_id"]))
+
+        fresh_res = client.get('/user_profile', headers={
+            "Authorization": f"Bearer {fresh_token}"
+        })
+        self.assertNotIn("Set-Cookie", fresh_res.headers)
+
+        unauthenticated_res = client.get('/')
+        self.assertNotIn("Set-Cookie", unauthenticated_res.headers)
+        self.assertEqual(token_refresher.stats()["minted"] - minted_before, 1)
+
+    def test_user_email_unique_index(self, client):
+        """Test create_app declares a unique index on users.email."""
+
+        indexes = self.mongo.db.users.index_information()
+
+        self.assertIn("email_unique", indexes)
+        self.assertEqual(indexes["email_unique"]["key"], [("email", 1)])
+        self.assertTrue(indexes["email_unique"]["unique"])
+
+    def test_retired_index_dropped(self, client):
+        """Test ensure_indexes drops an index listed in RETIRED_INDEXES."""
+
+        self.mongo.db.boards.create_index("columns.tasks._id", name="column_task_id")
+
+        ensure_indexes(self.mongo.db, self.app.logger)
+
+        self.assertNotIn("column_task_id", self.mongo.db.boards.index_information())
+        self.assertIn("user_id", self.mongo.db.boards.index_information())
+
+    def test_mongo_client_options(self, client):
+        """
+        Test the MongoClient options follow the MONGO_* settings, leaving
+        out compressors whose module isn't installed.
+        """
+        options = mongo_client_options({
+            "MONGO_MAX_POOL_SIZE": 20,
+            "MONGO_MIN_POOL_SIZE": 2,
+            "MONGO_WAIT_QUEUE_TIMEOUT_MS": 500,
+            "MONGO_COMPRESSORS": ["no-such-compressor", "zlib"],
+            "MONGO_READ_PREFERENCE": "primaryPreferred"
+        })
+
+        self.assertEqual(options["maxPoolSize"], 20)
+        self.assertEqual(options["minPoolSize"], 2)
+        self.assertEqual(options["waitQueueTimeoutMS"], 500)
+        self.assertEqual(options["compressors"], "zlib")
+        self.assertEqual(options["readPreference"], "primaryPreferred")
+        self.assertNotIn("connectTimeoutMS", options)
+
+    def test_mongo_monitor_snapshot(self, client):
+        """Test the pool and command listeners' counters."""
+        monitor = MongoMonitor()
+        pool_listener, command_listener = monitor.listeners
+        address = ("mongodb", 27017)
+
+        pool_listener.connection_created(monitoring.ConnectionCreatedEvent(address, 1))
+        pool_listener.connection_created(monitoring.ConnectionCreatedEvent(address, 2))
+        for connection_id in (1, 2):
+            pool_listener.connection_check_out_started(
+                monitoring.ConnectionCheckOutStartedEvent(address))
+            pool_listener.connection_checked_out(
+                monitoring.ConnectionCheckedOutEvent(address, connection_id))
+        pool_listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 1))
+        pool_listener.connection_check_out_started(
+            monitoring.ConnectionCheckOutStartedEvent(address))
+        pool_listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(
+            address, monitoring.ConnectionCheckOutFailedReason.TIMEOUT))
+
+        command_listener.succeeded(monitoring.CommandSucceededEvent(
+            timedelta(milliseconds=4), {"ok": 1}, "find", 1, address, 1))
+        command_listener.failed(monitoring.CommandFailedEvent(
+            timedelta(milliseconds=10), {"ok": 0}, "find", 2, address, 2))
+
+        snapshot = monitor.snapshot()
+        pool = snapshot["pools"]["mongodb:27017"]
+        self.assertEqual(pool["open"], 2)
+        self.assertEqual(pool["checked_out"], 1)
+        self.assertEqual(pool["max_checked_out"], 2)
+        self.assertEqual(pool["checkout_wait"]["count"], 3)
+        self.assertEqual(pool["checkout_timeouts"], 1)
+
+        find = snapshot["commands"]["find"]
+        self.assertEqual(find["count"], 2)
+        self.assertEqual(find["failures"], 1)
+        self.assertAlmostEqual(find["max_ms"], 10)
+        self.assertAlmostEqual(find["mean_ms"], 7)
+
+        monitor.reset()
+        self.assertEqual(monitor.snapshot(), {"pools": {}, "commands": {}})
+
+    def test_mongo_monitor_metrics(self, client):
+        """Test /metrics exports the monitor's pool and command counters."""
+        address = ("mongodb", 27017)
+        monitor = MongoMonitor()
+        pool_listener, command_listener = monitor.listeners
+        pool_listener.connection_created(monitoring.ConnectionCreatedEvent(address, 1))
+        pool_listener.connection_check_out_started(
+            monitoring.ConnectionCheckOutStartedEvent(address))
+        pool_listener.connection_checked_out(
+            monitoring.ConnectionCheckedOutEvent(address, 1))
+        command_listener.succeeded(monitoring.CommandSucceededEvent(
+            timedelta(milliseconds=4), {"ok": 1}, "find", 1, address, 1))
+        command_listener.failed(monitoring.CommandFailedEvent(
+            timedelta(milliseconds=10), {"ok": 0}, "find", 2, address, 2))
+
+        with patch.object(mongo_collector, "monitor", monitor):
+            text = client.get('/metrics').data.decode()
+
+        self.assertIn('mongodb_pool_connections{address="mongodb:27017"} 1.0', text)
+        self.assertIn('mongodb_pool_checked_out{address="mongodb:27017"} 1.0', text)
+        self.assertIn(
+            'mongodb_pool_checkout_wait_seconds_count{address="mongodb:27017"} 1.0', text)
+        self.assertIn(
+            'mongodb_pool_checkout_failures_total{address="mongodb:27017",reason="timeout"} 0.0',
+            text)
+        self.assertIn('mongodb_command_duration_seconds_count{command="find"} 2.0', text)
+        self.assertIn('mongodb_command_duration_seconds_sum{command="find"} 0.014', text)
+        self.assertIn('mongodb_command_duration_max_seconds{command="find"} 0.01', text)
+        self.assertIn('mongodb_command_failures_total{command="find"} 1.0', text)
+
+    def test_mongo_profiler_server_timing(self, client):
+        """
+        Test the profiler reports a request's commands in a Server-Timing
+        header, and logs a JSON trace of a slow request.
+        """
+
+        class ProfilerConfig(TestConfig):
+            MONGO_PROFILER = True
+            MONGO_PROFILER_SLOW_MS = 0
+
+        app = create_app(ProfilerConfig)
+        listener = command_profiler.listener
+        address = ("mongodb", 27017)
+
+        with app.test_request_context("/api/get_board/1"):
+            command_profiler.start()
+            listener.started(monitoring.CommandStartedEvent(
+                {"find": "boards", "filter": {}}, "flaskdb", 1, address, 1))
+            listener.succeeded(monitoring.CommandSucceededEvent(
+                timedelta(milliseconds=3), {"ok": 1, "cursor": {"firstBatch": []}},
+                "find", 1, address, 1))
+
+            with self.assertLogs("application.profiler", "WARNING") as logs:
+                response = command_profiler.finish(app.response_class())
+
+        timing = response.headers["Server-Timing"]
+        self.assertIn('mongo;dur=3.000;desc="1 commands"', timing)
+        self.assertRegex(timing, r'mongo-1;dur=3.000;desc="find boards \d+B"')
+
+        trace = json.loads(logs.output[0].split("Slow request: ", 1)[1])
+        self.assertEqual(trace["path"], "/api/get_board/1")
+        self.assertEqual(trace["commands"][0]["command"], "find")
+        self.assertEqual(trace["commands"][0]["collection"], "boards")
+
+        # Commands outside a profiled request are ignored, and their
+        # replies never encoded.
+        listener.started(monitoring.CommandStartedEvent(
+            {"find": "boards"}, "flaskdb", 2, address, 2))
+        with patch("application.profiler.encode") as encode:
+            listener.succeeded(monitoring.CommandSucceededEvent(
+                timedelta(milliseconds=3), {"ok": 1}, "find", 2, address, 2))
+        encode.assert_not_called()
+        self.assertIsNone(command_profiler.commands())
+
+        self.assertIn("Server-Timing", app.test_client().get("/").headers)
+        self.assertNotIn("Server-Timing", client.get("/").headers)
+
+    def test_metrics_endpoint(self, client):
+        """
+        Test /metrics reports requests by route rule and status, with
+        their latency and response size.
+        """
+        client.get('/')
+        client.get('/user_profile')
+        client.get('/no-such-page')
+
+        res = client.get('/metrics')
+        self.assertEqual(res.status_code, 200)
+        text = res.data.decode()
+
+        self.assertIn('http_requests_total{method="GET",route="/",status="200"}', text)
+        self.assertIn(
+            'http_requests_total{method="GET",route="/user_profile",status="401"}', text)
+        self.assertIn(
+            'http_requests_total{method="GET",route="<unmatched>",status="404"}', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/"}', text)
+        self.assertIn('http_response_size_bytes_count{method="GET",route="/"}', text)
+        self.assertNotIn('route="/metrics"', text)
+
+    def test_metrics_multiprocess_dir_created_on_import(self, client):
+        """
+        Test importing the metrics module creates a missing
+        PROMETHEUS_MULTIPROC_DIR, as a preloading gunicorn master does
+        before any server hook runs.
+        """
+        with tempfile.TemporaryDirectory() as parent:
+            directory = os.path.join(parent, "prometheus")
+            result = subprocess.run(
+                [sys.executable, "-c", "import application.metrics"],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory},
+                capture_output=True, text=True)
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertTrue(os.path.isdir(directory))
+
+    def test_json_provider_matches_parse_json(self, client):
+        """
+        Test the app's JSON provider writes ObjectIds and datetimes
+        in the same Extended JSON shape as parse_json.
+        """
+        document = {
+            "_id": ObjectId(),
+            "created": datetime(2023, 5, 1, 12, 30, tzinfo=timezone.utc),
+            "columns": [{"_id": ObjectId(), "name": "Test Column", "tasks": []}]
+        }
+
+        encoded = json.loads(self.app.json.dumps(document))
+
+        self.assertEqual(encoded, parse_json(document))
+        self.assertEqual(encoded["_id"], {"$oid": str(document["_id"])})
+        self.assertEqual(encoded["created"], {"$date": "2023-05-01T12:30:00Z"})
+
     def test_get_user_profile_no_token(self, client):
         """Test 401 Error raised if JWT token invalid (user not authenticated.)"""
 
@@ -0,0 +1,125 @@
+"""Unit Tests for the Email Outbox"""
+
+from application import create_app
+from application.config import TestConfig
+from application.test_helpers import client_post_helper, SMTPStandIn
+from application.database import mongo
+from application.users.outbox import mail_outbox, PENDING, SENT, FAILED
+import flask_unittest
+
+import time
+from datetime import datetime, timezone
+
+
+class MailOutboxTests(flask_unittest.AppClientTestCase):
+    """Tests for the email outbox, sending to a local SMTP stand-in."""
+
+    def create_app(self):
+        smtp = SMTPStandIn().start()
+
+        class StandInConfig(TestConfig):
+            MAIL_SERVER = "127.0.0.1"
+            MAIL_PORT = smtp.port
+            MAIL_USE_TLS = False
+            MAIL_USE_SSL = False
+            MAIL_USERNAME = None
+            MAIL_PASSWORD = None
+            MAIL_DEFAULT_SENDER = "boards@example.com"
+            MAIL_SUPPRESS_SEND = False
+            MAIL_OUTBOX_WORKER = "off"
+            MAIL_OUTBOX_BACKOFF = 60
+            MAIL_OUTBOX_MAX_ATTEMPTS = 2
+
+        app = create_app(StandInConfig)
+        app.smtp = smtp
+        yield app
+        smtp.stop()
+
+    def _enqueue(self, count):
+        return [
+            mail_outbox.enqueue(f"test{i}@example.com", "Test Subject", "Test Body")
+            for i in range(count)
+        ]
+
+    def _make_due(self):
+        mongo.db.mail_outbox.update_many(
+            {}, {"$set": {"next_attempt_at": datetime.now(timezone.utc)}})
+
+    def test_register_queues_confirmation_email(self, app, client):
+        """
+        Test registering stores the confirmation email in the outbox
+        without contacting the mail server, and draining sends it.
+        """
+        res = client_post_helper(client, "/register", {
+            "username": "Test User",
+            "email": "test18@example.com",
+            "password": "testPass123!"
+        })
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(app.smtp.connections, 0)
+        message = mongo.db.mail_outbox.find_one({"to": "test18@example.com"})
+        self.assertEqual(message["status"], PENDING)
+
+        self.assertEqual(mail_outbox.drain(), (1, 0))
+
+        self.assertEqual(len(app.smtp.messages), 1)
+        self.assertIn(b"confirm_email", app.smtp.messages[0][2])
+        message = mongo.db.mail_outbox.find_one({"_id": message["_id"]})
+        self.assertEqual(message["status"], SENT)
+
+    def test_batch_sent_over_one_connection(self, app, client):
+        """Test a batch of messages is sent over a single SMTP connection."""
+        with app.app_context():
+            self._enqueue(5)
+
+            self.assertEqual(mail_outbox.drain(), (5, 0))
+
+            self.assertEqual(app.smtp.connections, 1)
+            self.assertEqual(len(app.smtp.messages), 5)
+            self.assertEqual(mongo.db.mail_outbox.count_documents({"status": SENT}), 5)
+
+    def test_retry_with_backoff_then_give_up(self, app, client):
+        """
+        Test a message the server won't take is retried after the backoff,
+        and marked failed after MAIL_OUTBOX_MAX_ATTEMPTS.
+        """
+        with app.app_context():
+            message_id = self._enqueue(1)[0]
+            app.smtp.refuse = 2
+
+            before = time.time()
+            self.assertEqual(mail_outbox.drain(), (0, 1))
+
+            message = mongo.db.mail_outbox.find_one({"_id": message_id})
+            self.assertEqual(message["status"], PENDING)
+            self.assertEqual(message["attempts"], 1)
+            retry_at = message["next_attempt_at"].replace(tzinfo=timezone.utc).timestamp()
+            self.assertGreaterEqual(retry_at, before + 59)
+
+            # Not due yet: nothing is claimed.
+            self.assertEqual(mail_outbox.drain(), (0, 0))
+
+            self._make_due()
+            self.assertEqual(mail_outbox.drain(), (0, 1))
+            message = mongo.db.mail_outbox.find_one({"_id": message_id})
+            self.assertEqual(message["status"], FAILED)
+            self.assertEqual(message["attempts"], 2)
+
+    def test_expired_lease_reclaimed(self, app, client):
+        """Test a message left claimed by a worker that died is sent once its lease runs out."""
+        with app.app_context():
+            message_id = self._enqueue(1)[0]
+            self.assertEqual(len(mail_outbox.claim_batch()), 1)
+            self.assertEqual(mail_outbox.claim_batch(), [])
+
+            mongo.db.mail_outbox.update_one(
+                {"_id": message_id}, {"$set": {"lease_until": datetime.now(timezone.utc)}})
+
+            self.assertEqual(mail_outbox.drain(), (1, 0))
+            self.assertEqual(len(app.smtp.messages), 1)
+
+    def tearDown(self, app, client):
+        with app.app_context():
+            mongo.db.users.delete_many({})
+            mongo.db.mail_outbox.delete_many({})